@@ -30,6 +30,8 @@ _log = None
 
 
 def parse_arguments():
+    from calvin.runtime.north import scheduler
+
     long_description = """
 Start runtime, compile calvinscript and deploy application.
   """
@@ -116,6 +118,16 @@ Start runtime, compile calvinscript and deploy application.
                             help="Set the UUID of the runtime. Does not apply when security is enabled.",
                             dest='uuid')
 
+    argparser.add_argument('--scheduler', metavar='<scheduler>', type=str,
+                           choices=sorted(scheduler.SCHEDULERS),
+                           help="Scheduler to use: %s (default simple)" % ", ".join(sorted(scheduler.SCHEDULERS)),
+                           dest='scheduler', default=None)
+
+    argparser.add_argument('--workers', metavar='<n>', type=int, dest='workers', default=1,
+                           help="Start n runtimes on this host (one per core), the extra runtimes use "
+                                "consecutive port pairs after port/controlport, proxy storage through "
+                                "the first one and connect to each other over unix domain sockets")
+
     return argparser.parse_args()
 
 
@@ -131,6 +143,27 @@ def runtime(uris, control_uri, attributes=None, dispatch=False):
         print "Starting runtime failed:", e
         raise
 
+def start_workers(nbr, host, port, controlport, control_scheme, attributes):
+    """
+    Start nbr - 1 worker runtimes in separate processes, worker i listens on port + 2 * i
+    and has control port controlport + 2 * i. Returns list of processes.
+    """
+    import copy
+    from calvin.runtime.north import calvin_node
+    storage_proxy = _conf.get(None, 'storage_proxy') if _conf.get(None, 'storage_type') == 'proxy' else None
+    storage_proxy = storage_proxy or "calvinipc://%s:%d" % (host, port)
+    processes = []
+    for i in range(1, nbr):
+        worker_port = port + 2 * i
+        uris = ["calvinipc://%s:%d" % (host, worker_port), "calvinip://%s:%d" % (host, worker_port)]
+        control_uri = "%s://%s:%d" % (control_scheme, host, controlport + 2 * i)
+        attr = copy.deepcopy(attributes)
+        node_name = attr["indexed_public"]["node_name"]
+        node_name['name'] = "%s-%d" % (node_name['name'], i)
+        processes.append(calvin_node.start_worker_node(uris, control_uri, storage_proxy, attr))
+    return processes
+
+
 def storage_runtime(uri, control_uri, attributes=None, dispatch=False):
     from calvin.utilities.nodecontrol import dispatch_storage_node, start_storage_node
     kwargs = {}
@@ -467,6 +500,21 @@ def main():
     if not 'name' in runtime_attr.setdefault("indexed_public",{}).setdefault("node_name",{}):
         runtime_attr["indexed_public"]["node_name"]['name'] = "no_name"
 
+    if args.workers > 1:
+        if args.host is None or args.storage:
+            print "Workers need a host (-n) and can't be storage only runtimes"
+            return -1
+        from calvin.utilities.security import security_enabled
+        if security_enabled() or _conf.get("security", "runtime_to_runtime_security") == "tls":
+            # Links between workers are neither authenticated nor encrypted
+            print "Workers can't be used with security or TLS between runtimes enabled"
+            return -1
+        # Runtimes on this host prefer unix domain sockets, other hosts use calvinip
+        _conf.set('global', 'transports', ['calvinipc'] + _conf.get(None, 'transports'))
+        uris.insert(0, "calvinipc://%s:%d" % (args.host, args.port))
+        start_workers(args.workers, args.host, args.port, args.controlport,
+                      "https" if tls_enabled == "tls" else "http", runtime_attr)
+
     if app_info:
         dispatch_and_deploy(app_info, args.wait, uris, control_uri, runtime_attr, credentials_)
     else:
@@ -20,20 +20,35 @@ import time
 import copy
 from calvin.utilities import calvinuuid
 from calvin.actor import actorport
+from calvin.actor.metrics import ActorMetrics
 from calvin.utilities.calvinlogger import get_logger
 from calvin.utilities.utils import enum
 from calvin.runtime.north.calvin_token import Token, ExceptionToken
+from calvin.runtime.north.plugins.port.queue.common import QueueEmpty
 # from calvin.runtime.north import calvincontrol
 from calvin.runtime.north.replicationmanager import ReplicationId
 import calvin.requests.calvinresponse as response
-from calvin.runtime.south.async import async
+from calvin.runtime.south.async import async, threads
 from calvin.runtime.north.plugins.authorization_checks import check_authorization_plugin_list
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.csparser.port_property_syntax import get_port_property_capabilities, get_port_property_runtime
 from calvin.runtime.north.calvinsys import get_calvinsys
 from calvin.runtime.north.calvinlib import get_calvinlib
+from calvin.utilities import calvinconfig
 
 _log = get_logger(__name__)
+_conf = calvinconfig.get()
+
+# Thread pool for @threaded actions, created on first use
+_action_pool = None
+
+
+def _get_action_pool():
+    global _action_pool
+    if _action_pool is None:
+        size = _conf.get(None, 'action_thread_pool_size') or 4
+        _action_pool = threads.create_thread_pool(size, name="calvin-actions")
+    return _action_pool
 
 
 # Tests in test_manage_decorator.py
@@ -77,73 +92,125 @@ def manage(include=None, exclude=None):
     return wrapper
 
 
+def _port_spec(spec, inport=False):
+    """Normalize port given to condition to (name, least, most, batched)"""
+    if isinstance(spec, basestring):
+        return (spec, 1, 1, False)
+    if not isinstance(spec, (tuple, list)) or len(spec) not in (2, 3):
+        raise Exception("@condition decorator: Port must be 'name', ('name', n) or ('name', n, m), got %r" % (spec, ))
+    name, least, most = spec[0], spec[1], spec[-1]
+    if not isinstance(least, int) or not isinstance(most, int) or least < 0 or least > most or most < 1:
+        raise Exception("@condition decorator: Port %r needs 0 <= n <= m and m >= 1, got %r" % (name, spec))
+    if inport and least < 1:
+        raise Exception("@condition decorator: Inport %r must read at least one token, got %r" % (name, spec))
+    return (name, least, most, True)
+
+
 def condition(action_input=[], action_output=[]):
     """
     Decorator condition specifies the required input data and output space.
-    Both parameters are lists of port names
+    Both parameters are lists of ports, a port is given as either
+        'name'          one token, the action gets (returns) the value
+        ('name', n)     exactly n tokens, the action gets (returns) a list of n values
+        ('name', n, m)  at least n and at most m tokens, the action gets (returns) a list of n to m values
+    An inport needs at least n tokens available and an outport m free slots, hence
+    the queue_length of the port must be large enough. A batch is read with a single queue commit.
     Return value is a tuple (did_fire, output_available, exhaust_list)
     """
 
+    inputs = [_port_spec(spec, inport=True) for spec in action_input]
+    outputs = [_port_spec(spec) for spec in action_output]
+    if any(spec[3] for spec in inputs + outputs):
+        return _batch_condition(inputs, outputs)
+
     tokens_produced = len(action_output)
     tokens_consumed = len(action_input)
 
     def wrap(action_method):
 
+        run_in_thread = getattr(action_method, 'threaded', False)
+
         @functools.wraps(action_method)
         def condition_wrapper(self):
             #
-            # Check if input ports have enough tokens. Note that all([]) evaluates to True
+            # Ports, queue methods and metrics of this action, resolved once (see Actor._action_dispatch)
             #
-            input_ok = all(self.inports[portname].tokens_available(1) for portname in action_input)
+            dispatch = self._action_dispatch.get(action_method)
+            if dispatch is None:
+                dispatch = self._resolve_action_dispatch(action_method, action_input, action_output)
+            inports, outports, metrics = dispatch
             #
-            # Check if output port have enough free token slots
+            # Check if input ports have enough tokens and output ports enough free token slots
             #
-            output_ok = all(self.outports[portname].tokens_available(1) for portname in action_output)
+            input_ok = True
+            for _, port_id, tokens_available, _, _ in inports:
+                if not tokens_available(1, port_id):
+                    input_ok = False
+                    break
+            output_ok = True
+            for port_id, slots_available, _ in outports:
+                if not slots_available(1, port_id):
+                    output_ok = False
+                    break
 
             if not input_ok or not output_ok:
+                metrics.failed += 1
+                if input_ok:
+                    # Blocked on full outport
+                    self._metrics.set_blocked()
                 return (False, output_ok, ())
+            if self._metrics.blocked_since is not None:
+                self._metrics.clear_blocked()
             #
             # Build the arguments for the action from the input port(s)
             #
-            exhausted_ports = set()
+            exhausted_ports = ()
             exception = False
             args = []
-            for portname in action_input:
-                port = self.inports[portname]
-                token, exhaust = port.read()
-                is_exception_token = isinstance(token, ExceptionToken)
-                exception = exception or is_exception_token
-                args.append(token if is_exception_token else token.value )
-                if exhaust:
-                   exhausted_ports.add(port)
+            for port, port_id, _, peek, commit in inports:
+                token = peek(port_id)
+                if commit(port_id):
+                    if not exhausted_ports:
+                        exhausted_ports = set()
+                    exhausted_ports.add(port)
+                # Plain tokens are by far the most common, skip the isinstance check for them
+                if type(token) is not Token and isinstance(token, ExceptionToken):
+                    exception = True
+                    args.append(token)
+                else:
+                    args.append(token.value)
             #
             # Check for exceptional conditions
             #
             if exception:
                 # FIXME: Simplify exception handling
+                start_time = time.time()
                 production = self.exception_handler(action_method, args) or ()
+                time_spent = time.time() - start_time
+            elif run_in_thread:
+                #
+                # Run the action in the thread pool, production and time are added when it completes
+                #
+                self._start_threaded_action(action_method, outputs, args)
+                metrics.add_firing(tokens_consumed, 0, 0.0)
+                return (True, True, exhausted_ports)
             else:
                 #
                 # Perform the action (N.B. the method may be wrapped in a decorator)
                 # Action methods not returning a production (i.e. no output ports) returns None
                 # => replace with empty_production constant
                 #
+                start_time = time.time()
                 production = action_method(self, *args) or ()
-
-            valid_production = (tokens_produced == len(production))
-
-            if not valid_production:
-                #
-                # Error condition
-                #
-                action = "%s.%s" % (self._type, action_method.__name__)
-                raise Exception("%s invalid production %s, expected %s" % (action, str(production), str(tuple(action_output))))
+                time_spent = time.time() - start_time
             #
             # Write the results from the action to the output port(s)
             #
-            for portname, retval in zip(action_output, production):
-                port = self.outports[portname]
-                port.write_token(retval if isinstance(retval, Token) else Token(retval))
+            if len(production) != tokens_produced:
+                _invalid_production(self, action_method, outputs, production)
+            for (port_id, _, write), value in zip(outports, production):
+                write(value if isinstance(value, Token) else Token(value), port_id)
+            metrics.add_firing(tokens_consumed, tokens_produced, time_spent)
 
             return (True, True, exhausted_ports)
 
@@ -151,6 +218,142 @@ def condition(action_input=[], action_output=[]):
     return wrap
 
 
+def _batch_condition(inputs, outputs):
+    """Condition with at least one port reading or writing a list of tokens, see condition"""
+
+    input_names = [spec[0] for spec in inputs]
+    output_names = [spec[0] for spec in outputs]
+
+    def wrap(action_method):
+
+        run_in_thread = getattr(action_method, 'threaded', False)
+
+        @functools.wraps(action_method)
+        def batch_condition_wrapper(self):
+            # Ports, queue methods and metrics of this action, resolved once (see Actor._action_dispatch)
+            dispatch = self._action_dispatch.get(action_method)
+            if dispatch is None:
+                dispatch = self._resolve_action_dispatch(action_method, input_names, output_names)
+            inports, outports, metrics = dispatch
+
+            input_ok = True
+            for (_, port_id, tokens_available, _, _), (_, least, _, _) in zip(inports, inputs):
+                if not tokens_available(least, port_id):
+                    input_ok = False
+                    break
+            output_ok = True
+            for (port_id, slots_available, _), (_, _, most, _) in zip(outports, outputs):
+                if not slots_available(most, port_id):
+                    output_ok = False
+                    break
+
+            if not input_ok or not output_ok:
+                metrics.failed += 1
+                if input_ok:
+                    # Blocked on full outport
+                    self._metrics.set_blocked()
+                return (False, output_ok, ())
+            if self._metrics.blocked_since is not None:
+                self._metrics.clear_blocked()
+            #
+            # Build the arguments for the action from the input port(s), a list of values for batched ports,
+            # a batch is read with a single commit
+            #
+            exhausted_ports = set()
+            exception = False
+            consumed = 0
+            args = []
+            for (port, port_id, _, peek, commit), (_, _, most, batched) in zip(inports, inputs):
+                tokens = []
+                try:
+                    for _ in xrange(most):
+                        tokens.append(peek(port_id))
+                except QueueEmpty:
+                    pass
+                if commit(port_id):
+                    exhausted_ports.add(port)
+                values = []
+                for token in tokens:
+                    if isinstance(token, ExceptionToken):
+                        exception = True
+                        values.append(token)
+                    else:
+                        values.append(token.value)
+                args.append(values if batched else values[0])
+                consumed += len(tokens)
+
+            if exception:
+                start_time = time.time()
+                production = self.exception_handler(action_method, args) or ()
+                time_spent = time.time() - start_time
+            elif run_in_thread:
+                self._start_threaded_action(action_method, outputs, args)
+                metrics.add_firing(consumed, 0, 0.0)
+                return (True, True, exhausted_ports)
+            else:
+                start_time = time.time()
+                production = action_method(self, *args) or ()
+                time_spent = time.time() - start_time
+
+            produced = _write_production(self, action_method, outputs, production, outports)
+            metrics.add_firing(consumed, produced, time_spent)
+
+            return (True, True, exhausted_ports)
+
+        return batch_condition_wrapper
+    return wrap
+
+
+def _timed_action(action_method, actor, *args):
+    """Run action in a worker thread, returns (production, wall clock time spent)"""
+    start_time = time.time()
+    production = action_method(actor, *args)
+    return production, time.time() - start_time
+
+
+def _write_production(actor, action_method, outputs, production, outports=None):
+    """
+    Write production to outports, returns number of tokens written.
+    outports are the resolved outports of the action (see Actor._resolve_action_dispatch), if known.
+    """
+    valid_production = len(outputs) == len(production) and \
+        all(least <= len(retval) <= most for (_, least, most, batched), retval in zip(outputs, production) if batched)
+    if not valid_production:
+        _invalid_production(actor, action_method, outputs, production)
+    if outports is None:
+        outports = [(port.id, None, port.queue.write) for port in (actor.outports[spec[0]] for spec in outputs)]
+    #
+    # Write the results from the action to the output port(s)
+    #
+    produced = 0
+    for (port_id, _, write), (_, _, _, batched), retval in zip(outports, outputs, production):
+        for value in (retval if batched else (retval, )):
+            write(value if isinstance(value, Token) else Token(value), port_id)
+            produced += 1
+    return produced
+
+
+def _invalid_production(actor, action_method, outputs, production):
+    action = "%s.%s" % (actor._type, action_method.__name__)
+    raise Exception("%s invalid production %s, expected %s" % (action, str(production), str(tuple(outputs))))
+
+
+def threaded(action_method):
+    """
+    Decorator marking an action as blocking or CPU heavy, the action body is then run in
+    a bounded thread pool (size 'action_thread_pool_size') instead of on the runtime thread.
+    Tokens are consumed when the action starts and the production is written when it
+    completes, until then the actor does not fire again and its outport slots stay reserved.
+    The action must not touch ports or calvinsys, and should leave other actor state alone.
+    Must be placed below @condition:
+        @condition(['in'], ['out'])
+        @threaded
+        def action(self, data):
+    """
+    action_method.threaded = True
+    return action_method
+
+
 def stateguard(action_guard):
     """
     Decorator guard refines the criteria for picking an action to run by stating a function
@@ -354,6 +557,9 @@ class Actor(object):
         self._replication_id = ReplicationId()
         self._exhaust_cb = None
         self._pressure_event = 0  # Time of last pressure event time (not in state only local)
+        self._threaded_action = None  # Deferred of @threaded action in progress
+        self._metrics = ActorMetrics()  # Firing metrics (not in state only local)
+        self._action_dispatch = {}  # action method -> resolved ports, see _resolve_action_dispatch
 
         self.inports = {p: actorport.InPort(p, self, pp) for p, pp in self.inport_properties.items()}
         self.outports = {p: actorport.OutPort(p, self, pp) for p, pp in self.outport_properties.items()}
@@ -403,6 +609,8 @@ class Actor(object):
         if hasattr(self, "will_end") and callable(self.will_end):
             self.will_end()
         get_calvinsys().close_all(self)
+        # Drop the result of a @threaded action still in progress
+        self._threaded_action = None
 
     def did_replicate(self, index):
         """Override in actor subclass if actions need to be taken after replication."""
@@ -525,6 +733,37 @@ class Actor(object):
             self.sec.authorization_runtime_search(self._id, self._signature, callback=CalvinCB(self.set_migration_info))
         return authorized
 
+    def metrics(self):
+        return self._metrics.as_dict()
+
+    def reset_metrics(self):
+        self._metrics.reset()
+
+    def _resolve_action_dispatch(self, action_method, action_input, action_output):
+        """
+        Resolve what the condition of an action needs on each firing attempt: for inports
+        (port, port id, queue.tokens_available, queue.peek, queue.commit), for outports
+        (port id, queue.slots_available, queue.write) and the action metrics.
+        Kept until a port gets a new queue or id, see invalidate_action_dispatch.
+        """
+        inports = []
+        for portname in action_input:
+            port = self.inports[portname]
+            q = port.queue
+            inports.append((port, port.id, q.tokens_available, q.peek, q.commit))
+        outports = []
+        for portname in action_output:
+            port = self.outports[portname]
+            q = port.queue
+            outports.append((port.id, q.slots_available, q.write))
+        dispatch = (tuple(inports), tuple(outports), self._metrics.action(action_method.__name__))
+        self._action_dispatch[action_method] = dispatch
+        return dispatch
+
+    def invalidate_action_dispatch(self):
+        """Called by ports when their queue or id changed"""
+        self._action_dispatch = {}
+
     def _warn_slow_actor(self, time_spent, start_time):
         time_since_warning = start_time - self._last_time_warning
         if time_since_warning < 120.0:
@@ -540,7 +779,7 @@ class Actor(object):
                 port.finished_exhaustion()
             except:
                 _log.exception("FINSIHED EXHAUSTION FAILED")
-        if (output_ok and self._exhaust_cb is not None and
+        if (output_ok and self._exhaust_cb is not None and self._threaded_action is None and
             not any([p.any_outstanding_exhaustion_tokens() for p in self.inports.values()])):
             _log.debug("actor %s exhausted" % self._id)
             # We are in exhaustion, got all exhaustion tokens from peer ports
@@ -556,6 +795,9 @@ class Actor(object):
         Fire an actor.
         Returns tuple (did_fire, output_ok, exhausted)
         """
+        if self._threaded_action is not None:
+            # Waiting for a @threaded action to complete
+            return (False, True, ())
         #
         # Go over the action priority list once
         #
@@ -566,6 +808,42 @@ class Actor(object):
                 break
         return did_fire, output_ok, exhausted
 
+    def _start_threaded_action(self, action_method, outputs, args):
+        self._threaded_action = threads.defer_to_thread_pool(_get_action_pool(), _timed_action, action_method, self, *args)
+        self._threaded_action.addCallbacks(self._threaded_action_done, self._threaded_action_failed,
+                                           callbackArgs=(action_method, outputs), errbackArgs=(action_method,))
+
+    def _threaded_action_done(self, result, action_method, outputs):
+        if self._threaded_action is None:
+            # Actor destroyed while the action was in progress
+            return
+        self._threaded_action = None
+        production, time_spent = result
+        try:
+            produced = _write_production(self, action_method, outputs, production or ())
+            self._metrics.action(action_method.__name__).add_completion(produced, time_spent)
+        except Exception:
+            _log.exception("Threaded action %s.%s failed" % (self._type, action_method.__name__))
+        get_calvinsys().scheduler_wakeup(self)
+
+    def _threaded_action_failed(self, failure, action_method):
+        if self._threaded_action is None:
+            # Actor destroyed while the action was in progress
+            return
+        self._threaded_action = None
+        _log.error("Threaded action %s.%s failed: %s" % (self._type, action_method.__name__, failure.getErrorMessage()))
+        get_calvinsys().scheduler_wakeup(self)
+
+    def after_threaded_action(self, callback):
+        """
+        Call callback() when no @threaded action is in progress, i.e. directly or when the
+        action in progress has written its production. Use before serializing the actor.
+        """
+        if self._threaded_action is None:
+            callback()
+        else:
+            self._threaded_action.addBoth(lambda _: callback())
+
     def enabled(self):
         # We want to run even if not fully connected during exhaustion
         r = self.fsm.state() == Actor.STATUS.ENABLED or self._exhaust_cb is not None
@@ -77,6 +77,9 @@ class Port(object):
         self.queue.set_config(config)
 
     def set_queue(self, new_queue):
+        for endpoint_ in self.endpoints:
+            # The queue might be shared with a local peer, a new connection needs a queue of its own
+            endpoint_.unshare_queue()
         if self.queue is None:
             self.queue = new_queue
         elif isinstance(self.queue, queue.common.QueueNone) and self.queue.queue_type == new_queue.queue_type:
@@ -93,6 +96,17 @@ class Port(object):
         else:
             # Want to replace an existing queue type (e.g. during migration)
             raise NotImplementedError("FIXME Can't swap queue types")
+        self._invalidate_owner()
+
+    def replace_queue(self, new_queue):
+        """Replace the queue unconditionally, tokens in the current queue are left behind"""
+        self.queue = new_queue
+        self._invalidate_owner()
+
+    def _invalidate_owner(self):
+        # The owner's actions keep references to the queue and port id
+        if self.owner is not None:
+            self.owner.invalidate_action_dispatch()
 
     def _state(self):
         """Return port state for serialization."""
@@ -105,6 +119,7 @@ class Port(object):
         self.properties.update(state.get('properties', {}))
         if 'queue' in state:
             self.queue._set_state(state.get('queue'))
+        self._invalidate_owner()
 
     def attach_endpoint(self, endpoint_):
         """
@@ -173,7 +188,7 @@ class InPort(Port):
 
         self.endpoints.append(endpoint_)
         endpoint_.attached()
-        nbr_peers = len(self.queue.get_peers())
+        nbr_peers = len(self.queue.get_peers(self.direction))
         if nbr_peers > self.properties['nbr_peers']:
             # We have more peers due to replication
             self.properties['nbr_peers'] = nbr_peers
@@ -269,7 +284,7 @@ class InPort(Port):
         peers = []
         for ep in self.endpoints:
             peers.append(ep.get_peer())
-        queue_peers = self.queue.get_peers()
+        queue_peers = self.queue.get_peers(self.direction)
         if queue_peers is not None and len(peers) < len(queue_peers):
             all = set(queue_peers)
             all -= set([p[1] for p in peers])
@@ -322,7 +337,7 @@ class OutPort(Port):
 
         self.endpoints.append(endpoint_)
         endpoint_.attached()
-        nbr_peers = len(self.queue.get_peers())
+        nbr_peers = len(self.queue.get_peers(self.direction))
         if nbr_peers > self.properties['nbr_peers']:
             # We have more peers due to replication
             self.properties['nbr_peers'] = nbr_peers
@@ -371,7 +386,7 @@ class OutPort(Port):
         peers = []
         for ep in self.endpoints:
             peers.append(ep.get_peer())
-        queue_peers = self.queue.get_peers()
+        queue_peers = self.queue.get_peers(self.direction)
         if queue_peers is not None and len(peers) < len(queue_peers):
             all = set(queue_peers)
             all -= set([p[1] for p in peers])
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+
+class ActionMetrics(object):
+
+    """
+    Counters for one action, updated by the condition decorator.
+    Times are wall clock seconds spent in the action method (or exception handler), a
+    @threaded action is timed in its worker thread and added when it completes.
+    """
+
+    __slots__ = ('fired', 'failed', 'consumed', 'produced', 'time', 'max_time')
+
+    def __init__(self):
+        super(ActionMetrics, self).__init__()
+        self.reset()
+
+    def reset(self):
+        self.fired = 0
+        self.failed = 0  # Condition checks without enough tokens or outport space
+        self.consumed = 0
+        self.produced = 0
+        self.time = 0.0
+        self.max_time = 0.0
+
+    def add_firing(self, consumed, produced, time_spent):
+        self.fired += 1
+        self.consumed += consumed
+        self.produced += produced
+        self.time += time_spent
+        if time_spent > self.max_time:
+            self.max_time = time_spent
+
+    def add_completion(self, produced, time_spent):
+        """Production and time of a firing that completed later, i.e. a @threaded action"""
+        self.produced += produced
+        self.time += time_spent
+        if time_spent > self.max_time:
+            self.max_time = time_spent
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class ActorMetrics(object):
+
+    """
+    Firing metrics of an actor, always collected and local to the runtime (not part of actor state).
+    Per action counters are kept in 'actions', the scheduler adds the time spent in each
+    scheduling round and the condition decorator tracks time blocked on a full outport.
+    """
+
+    __slots__ = ('actions', 'rounds', 'time', 'max_time', 'blocked_time', 'blocked_since', 'since')
+
+    def __init__(self):
+        super(ActorMetrics, self).__init__()
+        self.actions = {}
+        self.reset()
+
+    def reset(self):
+        for action in self.actions.values():
+            action.reset()
+        self.rounds = 0
+        self.time = 0.0
+        self.max_time = 0.0
+        self.blocked_time = 0.0
+        self.blocked_since = None
+        self.since = time.time()
+
+    def action(self, name):
+        action = self.actions.get(name)
+        if action is None:
+            action = self.actions[name] = ActionMetrics()
+        return action
+
+    def add_round(self, time_spent):
+        self.rounds += 1
+        self.time += time_spent
+        if time_spent > self.max_time:
+            self.max_time = time_spent
+
+    def set_blocked(self):
+        if self.blocked_since is None:
+            self.blocked_since = time.time()
+
+    def clear_blocked(self):
+        self.blocked_time += time.time() - self.blocked_since
+        self.blocked_since = None
+
+    def as_dict(self):
+        now = time.time()
+        blocked_time = self.blocked_time
+        if self.blocked_since is not None:
+            blocked_time += now - self.blocked_since
+        return {
+            'since': self.since,
+            'elapsed': now - self.since,
+            'rounds': self.rounds,
+            'time': self.time,
+            'max_time': self.max_time,
+            'blocked_time': blocked_time,
+            'actions': {name: action.as_dict() for name, action in self.actions.items()}
+        }
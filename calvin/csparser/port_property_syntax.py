@@ -32,6 +32,32 @@ port_property_data = {
                 'doc': """Route each tokens to one peer based on queue length.""",
                 'direction': "out"
             },
+            'balanced-rate': {
+                'doc': """Route each tokens to the peer expected to handle it first, based on queue length,
+                          measured time per token and ACK latency.""",
+                'direction': "out"
+            },
+            'spill': {
+                'doc': """
+                    The default routing of all tokens to all peers, tokens that do not fit
+                    in the queue (queue_length) are kept on disk, up to spill_length tokens.
+                    """,
+                'direction': "inout"
+            },
+            'latest': {
+                'doc': """
+                    Route all tokens to all peers, but keep only the newest tokens (queue_length).
+                    Older unread tokens are dropped instead of blocking the writer.
+                    """,
+                'direction': "inout"
+            },
+            'priority': {
+                'doc': """
+                    Route all tokens to all peers, each peer gets the queued tokens with the highest
+                    priority first. The priority is the number found in the token by priority_key.
+                    """,
+                'direction': "inout"
+            },
             'dispatch-ordered': {
                 'doc': """
                     Dispatch tokens to multiple peers (TESTING).
@@ -91,6 +117,35 @@ port_property_data = {
         'direction': 'inout',
         'capability_type': "ignore"
     },
+    'queue_length_max': {
+        'doc': """
+                Lets a default (fanout) queue grow beyond queue_length, up to this number of tokens,
+                when it is full and shrink again when idle. Growth is limited by the runtime's
+                queue_growth_budget.
+                """,
+        'user-level': True,
+        'type': 'scalar',
+        'direction': 'inout',
+        'capability_type': "ignore"
+    },
+    'priority_key': {
+        'doc': """
+                Specifies where a queue with routing priority finds the priority of a token, a dot separated
+                path of keys and list indexes into the token value, default "priority". Higher numbers are
+                read first, tokens without a number get priority 0.
+                """,
+        'user-level': True,
+        'type': 'string',
+        'direction': 'inout',
+        'capability_type': "ignore"
+    },
+    'spill_length': {
+        'doc': """Specifies the number of tokens a queue with routing spill can keep on disk.""",
+        'user-level': True,
+        'type': 'scalar',
+        'direction': 'inout',
+        'capability_type': "ignore"
+    },
     'nbr_peers': {
         'doc': """
                 Automatically set based on connections in calvinscript. When
@@ -49,6 +49,8 @@ APPLICATION_PATH = '/application/{}'
 APPLICATION_MIGRATE = '/application/{}/migrate'
 ACTOR_PORT = '/actor/{}/port/{}'
 ACTOR_REPORT = '/actor/{}/report'
+ACTOR_METRICS = '/actor/{}/metrics'
+ACTORS_METRICS = '/actors/metrics'
 SET_PORT_PROPERTY = '/set_port_property'
 APPLICATIONS = '/applications'
 DEPLOY = '/deploy'
@@ -306,6 +308,14 @@ class RequestHandler(object):
             r = self._get(rt, timeout, async, path)
         return self.check_response(r)
 
+    def get_actor_metrics(self, rt, actor_id=None, reset=False, timeout=DEFAULT_TIMEOUT, async=False):
+        path = ACTOR_METRICS.format(actor_id) if actor_id else ACTORS_METRICS
+        if reset:
+            r = self._delete(rt, timeout, async, path)
+        else:
+            r = self._get(rt, timeout, async, path)
+        return self.check_response(r)
+
     def get_applications(self, rt, timeout=DEFAULT_TIMEOUT, async=False):
         r = self._get(rt, timeout, async, APPLICATIONS)
         return self.check_response(r)
@@ -235,6 +235,7 @@ class ActorManager(object):
         if terminate == DISCONNECT.EXHAUST:
             actor = self.actors[actor_id]
             actor.exhaust(CalvinCB(self._destroy_with_disconnect_exhausted, actor_id=actor_id, terminate=terminate, callback=callback))
+            self.node.sched.schedule_actor(actor_id)
             # Exhaust first disconnects all inports then all outports after inports exhausted
             self.node.pm.disconnect(callback=CalvinCB(self._destroy_with_disconnect_in_cb, terminate=terminate,
                                                       callback=callback),
@@ -421,8 +422,13 @@ class ActorManager(object):
         self.node.control.log_actor_migrate(actor_id, node_id)
 
     def _migrate_disconnected(self, actor, actor_type, ports, node_id, status, callback = None, **state):
-        """ Actor disconnected, continue migration """
+        """ Actor disconnected, continue migration when any @threaded action has completed """
         _log.analyze(self.node.id, "+ DISCONNECTED", {'actor_name': actor.name, 'actor_id': actor.id, 'status': status})
+        actor.after_threaded_action(CalvinCB(self._migrate_serialize, actor, actor_type, ports, node_id, status,
+                                             callback=callback))
+
+    def _migrate_serialize(self, actor, actor_type, ports, node_id, status, callback=None):
+        """ Actor disconnected and idle, serialize and move it """
         state = actor.serialize()
         self.destroy(actor.id, temporary=True)
         if status:
@@ -533,6 +539,19 @@ class ActorManager(object):
 
         return self.actors[actor_id].report(**(kwargs if kwargs and isinstance(kwargs, dict) else {}))
 
+    def actor_metrics(self, actor_id=None, reset=False):
+        """Return firing metrics of actor (or all actors if actor_id is None), optionally resetting them"""
+        if actor_id is not None and actor_id not in self.actors:
+            self._actor_not_found(actor_id)
+        actors = [self.actors[actor_id]] if actor_id is not None else self.actors.values()
+        metrics = {}
+        for actor in actors:
+            metrics[actor.id] = actor.metrics()
+            metrics[actor.id].update({'name': actor.name, 'type': actor._type})
+            if reset:
+                actor.reset_metrics()
+        return metrics
+
     def enabled_actors(self):
         return [actor for actor in self.actors.values() if actor.enabled()]
 
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compact frames for the token messages sent over token tunnels.
+
+A tunneled token message is a TUNNEL_DATA message with the token message as value, both
+dictionaries keyed by strings and carrying the tunnel, port and runtime ids as UUID strings.
+On a direct link the same message is sent as a frame, a flat list of small integers:
+
+    [tunnel, command, sender's port, receiver's port, sequencenbr, field, ...]
+
+where the fields after the sequence number depend on the command (see FIELDS), and ACK, NACK
+and ABORT values are sent as their index in VALUES. The runtime ids are given by the link.
+The coder of the link serializes the list, with a binary coder (msgpack or cbor) small
+integers are a single byte each.
+
+The tunnel and port ids are numbered per link by an InternTable. Each side numbers its own
+ports and the tunnels, and tells the peer the numbers when a port connection is set up
+over the tunnel, a frame uses the sender's numbers for the tunnel and its port and the
+receiver's number for the receiver's port. Hence a message is only sent as a frame when
+all its ids have been exchanged, other messages and messages to peers not supporting frames
+are sent as before.
+"""
+
+# Commands sent as frames, in frame order
+COMMANDS = ('TOKEN', 'TOKEN_REPLY', 'TOKENS', 'TOKENS_REPLY', 'TOKEN_WINDOW')
+# Fields after the sequence number, per command
+FIELDS = {
+    'TOKEN': ('token', ),
+    'TOKEN_REPLY': ('value', ),
+    'TOKENS': ('tokens', ),
+    'TOKENS_REPLY': ('count', 'value'),
+    'TOKEN_WINDOW': ('credit', 'value'),
+}
+VALUES = ('ACK', 'NACK', 'ABORT')
+# Commands sent from the outport, i.e. port_id is the sender's port
+FROM_OUTPORT = ('TOKEN', 'TOKENS')
+
+_COMMAND_CODES = {cmd: code for code, cmd in enumerate(COMMANDS)}
+_VALUE_CODES = {value: code for code, value in enumerate(VALUES)}
+
+
+class InternTable(object):
+    """
+    Numbers of the ids sent as frames on one link, ours and those the peer told us
+    """
+
+    def __init__(self):
+        # Our numbers, id -> number and number -> id
+        self.numbers = {}
+        self.ids = []
+        # The peer's numbers
+        self.peer_numbers = {}
+        self.peer_ids = {}
+
+    def intern(self, ids):
+        """ Number ids, returns dictionary id -> number to tell the peer """
+        for id_ in ids:
+            if id_ not in self.numbers:
+                self.numbers[id_] = len(self.ids)
+                self.ids.append(id_)
+        return {id_: self.numbers[id_] for id_ in ids}
+
+    def learn(self, numbers):
+        """ Add the peer's numbers, a dictionary id -> number as returned by the peer's intern """
+        for id_, number in numbers.iteritems():
+            self.peer_numbers[id_] = number
+            self.peer_ids[number] = id_
+
+
+def encode_frame(msg, table):
+    """ Returns the TUNNEL_DATA msg as a frame, or None when it can't be sent as a frame """
+    payload = msg['value']
+    try:
+        cmd = payload['cmd']
+        fields = FIELDS[cmd]
+        if len(payload) != 4 + len(fields):
+            # Fields not known by the frame layout
+            return None
+        if cmd in FROM_OUTPORT:
+            src, dst = payload['port_id'], payload['peer_port_id']
+        else:
+            src, dst = payload['peer_port_id'], payload['port_id']
+        frame = [table.numbers[msg['tunnel_id']], _COMMAND_CODES[cmd], table.numbers[src],
+                 table.peer_numbers[dst], payload['sequencenbr']]
+        for field in fields:
+            frame.append(_VALUE_CODES[payload[field]] if field == 'value' else payload[field])
+    except (KeyError, TypeError):
+        return None
+    return frame
+
+
+def decode_frame(frame, table):
+    """ Returns the TUNNEL_DATA message of a frame, raises KeyError or IndexError for unknown numbers """
+    cmd = COMMANDS[frame[1]]
+    src = table.peer_ids[frame[2]]
+    dst = table.ids[frame[3]]
+    if cmd in FROM_OUTPORT:
+        payload = {'cmd': cmd, 'port_id': src, 'peer_port_id': dst, 'sequencenbr': frame[4]}
+    else:
+        payload = {'cmd': cmd, 'port_id': dst, 'peer_port_id': src, 'sequencenbr': frame[4]}
+    for field, value in zip(FIELDS[cmd], frame[5:]):
+        payload[field] = VALUES[value] if field == 'value' else value
+    return {'cmd': 'TUNNEL_DATA', 'tunnel_id': table.peer_ids[frame[0]], 'value': payload}
@@ -18,19 +18,30 @@ import os
 import time
 import glob
 import importlib
+import itertools
+import random
+from collections import deque
 
-from calvin.utilities import calvinuuid
 from calvin.utilities.calvin_callback import CalvinCB
 import calvin.requests.calvinresponse as response
 from calvin.runtime.south.async import async
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinconfig
+from calvin.runtime.north import calvin_frame
+from calvin.runtime.north.timing_wheel import TimingWheel
 _log = calvinlogger.get_logger(__name__)
 _conf = calvinconfig.get()
 
 # FIXME should be read from calvin config
 TRANSPORT_PLUGIN_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), *['south', 'transports'])
 TRANSPORT_PLUGIN_NS = "calvin.runtime.south.transports"
+# Seconds until a request without reply gets a GATEWAY_TIMEOUT
+REPLY_TIMEOUT = 10.0
+
+# Reply timeouts of the requests on all links
+_reply_timeouts = TimingWheel()
+# Message ids of requests, from a random start to not match late replies to an earlier run of the runtime
+_msg_ids = itertools.count(random.getrandbits(32))
 
 
 class CalvinBaseLink(object):
@@ -75,9 +86,21 @@ class CalvinLink(CalvinBaseLink):
         # FIXME replies should also be made independent on the link object,
         # to handle dying transports losing reply callbacks
         self.replies = old_link.replies if old_link else {}
-        self.replies_timeout = old_link.replies_timeout if old_link else {}
+        # Numbers of the ids sent in compact frames, see calvin_frame
+        self.interned = old_link.interned if old_link else calvin_frame.InternTable()
+        # Peer handles MESSAGES frames, told in the join, messages are then collected and sent together when configured
+        self.multi_message = transport.peer_multi_message()
+        self.send_buffer = _conf.get('global', 'link_send_buffer') or 0
+        self.send_delay = _conf.get('global', 'link_send_delay') or 0.0
+        self._outgoing = []
+        self._flush_call = None
+        # Bulk messages held while the transport backs up, see _send
+        self._held = deque()
         self.peer_is_sleeping = False
         self.buffered_msgs = []
+        if old_link and old_link._held:
+            self._held, old_link._held = old_link._held, self._held
+            self.send_resumed()
         if old_link:
             # close old link after a period, since might still receive messages on the transport layer
             # TODO chose the delay based on RTT instead of arbitrary 3 seconds
@@ -86,13 +109,9 @@ class CalvinLink(CalvinBaseLink):
 
     def reply_handler(self, payload):
         """ Gets called when a REPLY messages arrives on this link """
-        try:
-            # Cancel timeout
-            self.replies_timeout.pop(payload['msg_uuid']).cancel()
-        except KeyError:
+        # Cancel timeout
+        if not _reply_timeouts.cancel(payload['msg_uuid']):
             _log.warning("Tried to handle reply for unknown message msgid %s", payload['msg_uuid'])
-            # We ignore any errors in cancelling timeout
-            pass
 
         try:
             # Call the registered callback,for the reply message id, with the reply data as argument
@@ -111,14 +130,6 @@ class CalvinLink(CalvinBaseLink):
 
     def reply_timeout(self, msg_id):
         """ Gets called when a request times out """
-        try:
-            # remove timeout
-            self.replies_timeout.pop(msg_id)
-        except KeyError:
-            _log.warning("Tried to handle reply for unknown message msgid {}".format(msg_id))
-            # We ignore any errors in cancelling timeout
-            pass
-
         try:
             self.replies.pop(msg_id)['callback'](response.CalvinResponse(response.GATEWAY_TIMEOUT))
         except KeyError:
@@ -131,9 +142,9 @@ class CalvinLink(CalvinBaseLink):
         """ Adds a message id to the message and send it,
             also registers the callback for the reply.
         """
-        msg_id = calvinuuid.uuid("MSGID")
+        msg_id = next(_msg_ids)
         self.replies[msg_id] = {'callback': callback, 'send_time': time.time()}
-        self.replies_timeout[msg_id] = async.DelayedCall(10.0, CalvinCB(self.reply_timeout, msg_id))
+        _reply_timeouts.add(msg_id, REPLY_TIMEOUT, CalvinCB(self.reply_timeout, msg_id))
         msg['msg_uuid'] = msg_id
         self.send(msg, dest_peer_id)
 
@@ -143,20 +154,78 @@ class CalvinLink(CalvinBaseLink):
 
             The from and to node ids seems redundant since the link goes only between
             two nodes. But is included for verification and to later allow routing of messages.
+
+            Tunnel data with ids numbered in the link's intern table is sent as a compact frame.
         """
+        if dest_peer_id is None and not self.peer_is_sleeping and msg.get('cmd') == 'TUNNEL_DATA':
+            frame = calvin_frame.encode_frame(msg, self.interned)
+            if frame is not None:
+                self._send(frame)
+                return
         msg['from_rt_uuid'] = self.rt_id
         msg['to_rt_uuid'] = self.peer_id if dest_peer_id is None else dest_peer_id
         if not self.peer_is_sleeping:
             _log.analyze(self.rt_id, "SEND", msg)
-            self.transport.send(msg)
+            self._send(msg)
         else:
             _log.analyze(self.rt_id, "SEND_BUFFERED", msg)
             self.buffered_msgs.append(msg)
 
+    @staticmethod
+    def _is_bulk(msg):
+        """ Token data and migrating actors, as opposed to control messages """
+        if isinstance(msg, list):
+            return calvin_frame.COMMANDS[msg[1]] in calvin_frame.FROM_OUTPORT
+        if msg['cmd'] == 'TUNNEL_DATA':
+            return isinstance(msg['value'], dict) and msg['value'].get('cmd') in calvin_frame.FROM_OUTPORT
+        return msg['cmd'] == 'ACTOR_NEW'
+
+    def _send(self, msg):
+        # While the transport backs up bulk messages are held, control messages are sent ahead of them
+        if self._is_bulk(msg) and (self._held or self.transport.is_send_paused()):
+            self._held.append(msg)
+            return
+        self._write(msg)
+
+    def send_resumed(self):
+        """ Called when the transport takes data again, sends the held bulk messages """
+        while self._held and not self.transport.is_send_paused():
+            self._write(self._held.popleft())
+
+    def _write(self, msg):
+        if not (self.multi_message and self.send_buffer > 1):
+            self.transport.send(msg)
+            return
+        self._outgoing.append(msg)
+        if len(self._outgoing) >= self.send_buffer:
+            self.flush()
+        elif self._flush_call is None:
+            self._flush_call = async.DelayedCall(self.send_delay, self.flush)
+
+    def flush(self):
+        """ Send the collected messages, several in one MESSAGES frame """
+        if self._flush_call is not None:
+            self._flush_call.cancel()
+            self._flush_call = None
+        outgoing, self._outgoing = self._outgoing, []
+        if len(outgoing) == 1:
+            self.transport.send(outgoing[0])
+        elif outgoing:
+            self.transport.send({'cmd': 'MESSAGES', 'messages': outgoing})
+
+    def decode_frame(self, frame):
+        """ Returns the message of a compact frame received on this link """
+        msg = calvin_frame.decode_frame(frame, self.interned)
+        msg['from_rt_uuid'] = self.peer_id
+        msg['to_rt_uuid'] = self.rt_id
+        return msg
+
     def close(self, dest_peer_id=None):
         """ Disconnect the transport and hence the link object won't work anymore """
         _log.analyze(self.rt_id, "+ LINK", {})
         if dest_peer_id is None:
+            # Collected messages are sent before disconnecting, flush also cancels its call
+            self.flush()
             self.transport.disconnect()
 
     def flush_buffered_msgs(self):
@@ -260,7 +329,8 @@ class CalvinNetwork(object):
                                                                          'server_stopped': [CalvinCB(self._server_stopped)],
                                                                          'data_received': [CalvinCB(self._recv_handler)],
                                                                          'peer_connection_failed': [CalvinCB(self._peer_connection_failed)],
-                                                                         'peer_disconnected': [CalvinCB(self._peer_disconnected)]},
+                                                                         'peer_disconnected': [CalvinCB(self._peer_disconnected)],
+                                                                         'send_resumed': [CalvinCB(self._send_resumed)]},
                                                                         schemas, formats)
                 else:
                     del self.transport_modules[m]
@@ -394,6 +464,8 @@ class CalvinNetwork(object):
                 _log.analyze(self.node.id, "+ WAKE_SLEEPING_LINK", {'uri': uri, 'peer_id': peer_id}, peer_node_id=peer_id)
                 self._links[peer_id].peer_is_sleeping = False
                 self._links[peer_id].transport = tp_link
+                self._links[peer_id].multi_message = tp_link.peer_multi_message()
+                self._links[peer_id].send_resumed()
                 self._links[peer_id].flush_buffered_msgs()
             else:
                 # Likely simultaneous join requests, use the one requested by the node with highest id
@@ -451,6 +523,16 @@ class CalvinNetwork(object):
         """ Get a link by node id """
         return self._links.get(peer_id, None)
 
+    def frame_received(self, tp_link, frame):
+        """ Returns the message of a compact frame received on the transport tp_link """
+        for link in self._links.itervalues():
+            if isinstance(link, CalvinLink) and link.transport is tp_link:
+                try:
+                    return link.decode_frame(frame)
+                except (KeyError, IndexError, TypeError):
+                    raise Exception("ERROR_UNKNOWN_FRAME")
+        raise Exception("ERROR_LINK_NOT_ESTABLISHED")
+
     def _callback_link(self, peer_id, callback=None):
         # TODO: Do checks here ?!?
         if callback:
@@ -647,6 +729,12 @@ class CalvinNetwork(object):
                 self.link_remove(rt_id)
         self.control.log_link_disconnected(rt_id)
 
+    def _send_resumed(self, tp_link):
+        for link in self._links.itervalues():
+            if isinstance(link, CalvinLink) and link.transport is tp_link:
+                link.send_resumed()
+                return
+
     def link_remove(self, peer_id):
         """ Removes a link to peer id """
         _log.analyze(self.node.id, "+", {}, peer_node_id=peer_id)
@@ -112,11 +112,9 @@ class Node(object):
         self.rm = replicationmanager.ReplicationManager(self)
         self.control = calvincontrol.get_calvincontrol()
 
-        # _scheduler = scheduler.DebugScheduler if _log.getEffectiveLevel() <= logging.DEBUG else scheduler.Scheduler
-        # _scheduler = scheduler.NonPreemptiveScheduler
-        # _scheduler = scheduler.RoundRobinScheduler
-        _scheduler = scheduler.SimpleScheduler
-        # _scheduler = scheduler.BaselineScheduler
+        # Scheduler is selected by the 'scheduler' option in calvin.conf or csruntime --scheduler
+        _scheduler = scheduler.get_scheduler_class()
+        _log.debug("Using scheduler %s" % _scheduler.__name__)
         self.sched = _scheduler(self, self.am)
         self.async_msg_ids = {}
         calvinsys = get_calvinsys()
@@ -435,3 +433,22 @@ def start_node(uri, control_uri, trace_exec=False, attributes=None):
     p.daemon = True
     p.start()
     return p
+
+
+def create_worker_node(uri, control_uri, storage_proxy, attributes=None):
+    """
+    Same as create_node, but storage is proxied through the runtime at storage_proxy,
+    used for the worker runtimes started with csruntime --workers
+    """
+    _conf.set('global', 'storage_type', 'proxy')
+    _conf.set('global', 'storage_proxy', storage_proxy)
+    create_node(uri, control_uri, attributes)
+
+
+def start_worker_node(uri, control_uri, storage_proxy, attributes=None):
+    if not security_modules_check():
+        raise Exception("Security module missing")
+    p = Process(target=create_worker_node, args=(uri, control_uri, storage_proxy, attributes))
+    p.daemon = True
+    p.start()
+    return p
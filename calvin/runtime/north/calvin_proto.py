@@ -256,6 +256,14 @@ class CalvinProto(CalvinCBClass):
         """
         _log.analyze(self.rt_id, "RECV", payload)
 
+        if isinstance(payload, list):
+            # A compact frame from the peer of a link, see calvin_frame
+            payload = self.network.frame_received(tp_link, payload)
+        elif payload.get('cmd') == 'MESSAGES':
+            # Messages the peer of a link collected and sent together
+            for msg in payload['messages']:
+                self.recv_handler(tp_link, msg)
+            return
         if payload['to_rt_uuid'] == self.rt_id:
             if not ('cmd' in payload and payload['cmd'] in self.callback_valid_names()):
                 raise Exception("ERROR_UNKOWN_COMMAND")
@@ -14,31 +14,53 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# Name of the compact token encoding, advertised when connecting ports (see TunnelConnection)
+COMPACT_ENCODING = 'compact'
+
+
 class Token(object):
 
-    """ Token class """
+    """
+    Token class
+
+    Tokens are encoded as {'type': class name, 'data': value}, which all runtimes
+    understand. With compact set they are encoded as [type_tag, value] where
+    type_tag is a small integer identifying the token class, see _TOKEN_CLASSES.
+    Only use the compact form towards a peer that has advertised COMPACT_ENCODING.
+    Decoding accepts both forms.
+    """
+
+    __slots__ = ('value', )
+
+    type_tag = 0
 
     def __init__(self, value=None):
         self.value = value
 
-    def repr_for_coder(self):
-        return {'type':self.__class__.__name__, 'data':self.value}
+    def repr_for_coder(self, compact=False):
+        if compact:
+            return [self.type_tag, self.value]
+        return {'type': self.__class__.__name__, 'data': self.value}
 
-    def encode(self, coder=None):
+    def encode(self, coder=None, compact=False):
         if not coder:
-            return self.repr_for_coder()
-        return coder.encode(self.repr_for_coder())
+            return self.repr_for_coder(compact)
+        return coder.encode(self.repr_for_coder(compact))
 
     @classmethod
     def decode(cls, data, coder=None):
-        representaton = coder.decode(data) if coder else data
-        token_type = representaton.get('type', '')
-        class_ = {
-            'Token':Token,
-            'ExceptionToken':ExceptionToken,
-            'EOSToken': EOSToken
-        }.get(token_type, ExceptionToken)
-        return class_(representaton.get('data', 'Bad Token'))
+        representation = coder.decode(data) if coder else data
+        if type(representation) is dict:
+            return _LEGACY_TOKEN_CLASSES.get(representation.get('type', ''), ExceptionToken)(
+                representation.get('data', 'Bad Token'))
+        try:
+            type_tag, value = representation
+        except (TypeError, ValueError):
+            return ExceptionToken('Bad Token')
+        # bool is an int subclass, but not a valid tag
+        if type(type_tag) is not int or not 0 <= type_tag < len(_TOKEN_CLASSES):
+            return ExceptionToken(value)
+        return _TOKEN_CLASSES[type_tag](value)
 
     def __str__(self):
         return "<%s> %s" % (self.__class__.__name__, str(self.value))
@@ -51,6 +73,10 @@ class ExceptionToken(Token):
 
     """ Base class for exception tokens """
 
+    __slots__ = ()
+
+    type_tag = 1
+
     def __init__(self, value="Exception"):
         super(ExceptionToken, self).__init__(value)
 
@@ -58,10 +84,24 @@ class EOSToken(ExceptionToken):
 
     """ End of stream token """
 
+    __slots__ = ()
+
+    type_tag = 2
+
     def __init__(self, value="End of stream"):
         super(EOSToken, self).__init__(value)
 
 
+# Indexed by type_tag
+_TOKEN_CLASSES = (Token, ExceptionToken, EOSToken)
+
+_LEGACY_TOKEN_CLASSES = {
+    'Token': Token,
+    'ExceptionToken': ExceptionToken,
+    'EOSToken': EOSToken
+}
+
+
 if __name__ == '__main__':
 
     class Coder(object):
@@ -103,6 +143,10 @@ if __name__ == '__main__':
     print data
     t = Token.decode(data)
     print t
+    data = t.encode(compact=True)
+    print data
+    t = Token.decode(data)
+    print t
 
 
     t = Token(42)
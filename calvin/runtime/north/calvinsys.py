@@ -111,7 +111,10 @@ class CalvinSys(object):
         return obj
 
     def schedule_timer(self, timer, timeout):
-        self._node.sched.insert_task(partial(self._fire_timer, timer=timer), timeout)
+        return self._node.sched.insert_task(partial(self._fire_timer, timer=timer), timeout)
+
+    def cancel_timer(self, handle):
+        self._node.sched.cancel_task(handle)
 
     def _fire_timer(self, timer):
         # Make sure timer is still valid.
@@ -164,6 +164,74 @@ def handle_post_actor_report(self, handle, connection, match, data, hdr):
     self._actor_report(handle, connection, match, data, hdr)
 
 
+@register
+def _actor_metrics(self, handle, connection, actor_id, reset):
+    metrics = None
+    if actor_id is not None and actor_id not in self.node.am.list_actors():
+        status = calvinresponse.NOT_FOUND
+    else:
+        try:
+            metrics = self.node.am.actor_metrics(actor_id, reset=reset)
+            status = calvinresponse.OK
+        except:
+            _log.exception("Actor metrics failed")
+            status = calvinresponse.INTERNAL_ERROR
+    self.send_response(handle, connection, None if metrics is None else json.dumps(metrics), status=status)
+
+
+@handler(method="GET", path="/actors/metrics")
+@authentication_decorator
+def handle_get_actors_metrics(self, handle, connection, match, data, hdr):
+    """
+    GET /actors/metrics
+    Firing metrics of all actors on this runtime, times are wall clock seconds
+    Response status code: OK or INTERNAL_ERROR
+    Response: {<actor-id>: {"name": <name>, "type": <type>, "since": <time of reset>, "elapsed": <seconds since reset>,
+                            "rounds": <times scheduled>, "time": <total time>, "max_time": <longest round>,
+                            "blocked_time": <time blocked on full outport>,
+                            "actions": {<action>: {"fired": <n>, "failed": <failed condition checks>,
+                                                   "consumed": <tokens>, "produced": <tokens>,
+                                                   "time": <total time>, "max_time": <longest firing>}, ...}}, ...}
+    """
+    self._actor_metrics(handle, connection, None, False)
+
+
+@handler(method="DELETE", path="/actors/metrics")
+@authentication_decorator
+def handle_del_actors_metrics(self, handle, connection, match, data, hdr):
+    """
+    DELETE /actors/metrics
+    Reset firing metrics of all actors on this runtime
+    Response status code: OK or INTERNAL_ERROR
+    Response: metrics before reset, see GET /actors/metrics
+    """
+    self._actor_metrics(handle, connection, None, True)
+
+
+@handler(method="GET", path="/actor/{actor_id}/metrics")
+@authentication_decorator
+def handle_get_actor_metrics(self, handle, connection, match, data, hdr):
+    """
+    GET /actor/{actor-id}/metrics
+    Firing metrics of actor, see GET /actors/metrics
+    Response status code: OK, NOT_FOUND or INTERNAL_ERROR
+    Response: {<actor-id>: {...}}
+    """
+    self._actor_metrics(handle, connection, match.group(1), False)
+
+
+@handler(method="DELETE", path="/actor/{actor_id}/metrics")
+@authentication_decorator
+def handle_del_actor_metrics(self, handle, connection, match, data, hdr):
+    """
+    DELETE /actor/{actor-id}/metrics
+    Reset firing metrics of actor
+    Response status code: OK, NOT_FOUND or INTERNAL_ERROR
+    Response: metrics before reset, see GET /actors/metrics
+    """
+    self._actor_metrics(handle, connection, match.group(1), True)
+
+
 @register
 def handle_actor_migrate_proto_cb(self, handle, connection, status, *args, **kwargs):
     self.send_response(handle, connection, None, status=status.status)
@@ -62,13 +62,17 @@ class Event_Monitor(object):
     # FIXME: supply a list of endpoints
     def communicate(self, endpoints):
         """Communicate over all endpoints, return True if at least one send something."""
+        return bool(self.communicate_endpoints(endpoints))
+
+    def communicate_endpoints(self, endpoints):
+        """Communicate over all endpoints, return list of endpoints that did send something."""
         # Update the backoff dictionary containing endpoints that should NOT communicate.
         self._check_backoff()
-        did_comm = False
+        did_comm = []
         # Loop over supplied endpoints, skip those in backoff dictionary
         for endp in endpoints:
-            if not endp in self._backoff:
-                did_comm |= endp.communicate()
+            if not endp in self._backoff and endp.communicate():
+                did_comm.append(endp)
 
         return did_comm
 
@@ -17,6 +17,13 @@
 import cbor
 from message_coder import MessageCoderBase
 
+try:
+    # cbor falls back to a pure python implementation without its C extension
+    import cbor._cbor
+    ACCELERATED = True
+except ImportError:
+    ACCELERATED = False
+
 from calvin.utilities.calvinlogger import get_logger
 
 _log = get_logger(__name__)
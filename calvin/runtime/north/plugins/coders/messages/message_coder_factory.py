@@ -26,26 +26,40 @@ _log = get_logger(__name__)
 _conf = calvinconfig.get()
 
 _coder_priority_list = None
+# Coders are stateless, one instance of each is shared
+_coders = {}
+
+
+def _default_prio_list():
+    # The C implementation of cbor is several times faster than json, the pure python coders are slower
+    # (see calvin/tests/benchmarks/bench_coders.py)
+    return ["cbor", "json", "msgpack"] if cbor_coder.ACCELERATED else ["json", "cbor", "msgpack"]
+
 
 def get_prio_list():
     global _coder_priority_list
-    
+
     if not _coder_priority_list:
-        _coder_priority_list = _conf.get("global", "static_coder") or ["json"]
+        _coder_priority_list = list(_conf.get("global", "static_coder") or _default_prio_list())
         if "json" not in _coder_priority_list:
             _coder_priority_list.append("json")
-        
+
     return _coder_priority_list
 
-def get(t):
-    
-    if t == "cbor":
-        return cbor_coder.MessageCoder()
-        
-    if t == "json":
-        return json_coder.MessageCoder()
 
-    if t == "msgpack":
-        return msgpack_coder.MessageCoder()
+def get(t):
+    try:
+        return _coders[t]
+    except KeyError:
+        pass
 
-    raise Exception("Coder {} requested is not supported".format(t))
+    if t == "cbor":
+        coder = cbor_coder.MessageCoder()
+    elif t == "json":
+        coder = json_coder.MessageCoder()
+    elif t == "msgpack":
+        coder = msgpack_coder.MessageCoder()
+    else:
+        raise Exception("Coder {} requested is not supported".format(t))
+    _coders[t] = coder
+    return coder
@@ -20,8 +20,33 @@ import calvin.requests.calvinresponse as response
 from calvin.utilities import calvinlogger
 from calvin.runtime.north.plugins.port.connection.common import BaseConnection
 from calvin.runtime.north.plugins.port import DISCONNECT
+from calvin.utilities import calvinconfig
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+
+def create_shared_queue(inport, outport):
+    """
+    A fresh one to one fifo connection between local ports can use a single queue for both ports,
+    i.e. tokens written by the outport are directly available to the inport without any copying.
+    The queue is as long as the two queues would have been. When one of the ports disconnects,
+    or gets another connection, the ports get separate queues (see LocalOutEndpoint).
+    Returns the queue or None when the ports need a queue each.
+    """
+    for port in (inport, outport):
+        if port.endpoints or port.properties.get('nbr_peers', 1) != 1:
+            return None
+        # Ports with a queue or state (e.g. after migration) keep it
+        if port.queue is not None and port.queue.queue_type != "none":
+            return None
+    in_queue = queue.get(inport, peer_port=outport)
+    out_queue = queue.get(outport, peer_port=inport)
+    if not (in_queue and out_queue and in_queue.queue_type == out_queue.queue_type == "fanout_fifo"):
+        return None
+    properties = dict(inport.properties)
+    properties['queue_length'] = in_queue.N + out_queue.N - 2
+    return queue.fanout_fifo.FanoutFIFO(properties, outport.properties)
 
 
 class LocalConnection(BaseConnection):
@@ -58,8 +83,15 @@ class LocalConnection(BaseConnection):
     def _connect_via_local(self, inport, outport):
         """ Both connecting ports are local, just connect them """
         _log.analyze(self.node.id, "+", {})
-        inport.set_queue(queue.get(inport, peer_port=outport))
-        outport.set_queue(queue.get(outport, peer_port=inport))
+        shared_queue = None
+        if _conf.get(None, 'shared_local_queues'):
+            shared_queue = create_shared_queue(inport, outport)
+        if shared_queue is not None:
+            inport.set_queue(shared_queue)
+            outport.set_queue(shared_queue)
+        else:
+            inport.set_queue(queue.get(inport, peer_port=outport))
+            outport.set_queue(queue.get(outport, peer_port=inport))
         ein = endpoint.LocalInEndpoint(inport, outport, self.node.sched)
         eout = endpoint.LocalOutEndpoint(outport, inport, self.node.sched)
 
@@ -104,6 +136,8 @@ class LocalConnection(BaseConnection):
 
         self.port.exhausted_tokens(peer_remaining_tokens)
         self.peer_port_meta.port.exhausted_tokens(remaining_tokens)
+        self.node.sched.schedule_actor(self.port.owner.id)
+        self.node.sched.schedule_actor(self.peer_port_meta.port.owner.id)
 
         # Update storage, the ports are disconnected even if an inport during exhaustion still delivers tokens
         if terminate:
@@ -16,7 +16,7 @@
 
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.runtime.north.plugins.port import endpoint
-from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.calvin_token import Token, COMPACT_ENCODING
 from calvin.runtime.north.calvin_proto import CalvinTunnel
 from calvin.runtime.north.plugins.port import queue
 import calvin.requests.calvinresponse as response
@@ -104,9 +104,21 @@ class TunnelConnection(BaseConnection):
                         'tunnel_status': self.token_tunnel.tunnels[self.peer_port_meta.node_id].status},
                         peer_node_id=self.peer_port_meta.node_id)
 
+        kwargs = {}
+        link = self._direct_link()
+        if link is not None:
+            # Numbers for compact frames, see calvin_frame
+            kwargs['interned'] = link.interned.intern([tunnel.id, self.port.id])
         self.node.proto.port_connect(callback=CalvinCB(self._connected_via_tunnel),
                                         port_id=self.port.id, port_properties=self.port.properties,
-                                        peer_port_meta=self.peer_port_meta, tunnel_id=tunnel.id)
+                                        peer_port_meta=self.peer_port_meta, tunnel_id=tunnel.id,
+                                        token_encodings=[COMPACT_ENCODING], token_batching=True,
+                                        token_window=True, **kwargs)
+
+    def _direct_link(self):
+        """ The link to the peer, None when not a direct link """
+        link = self.node.network.link_get(self.peer_port_meta.node_id)
+        return link if hasattr(link, 'interned') else None
 
     def _connected_via_tunnel(self, reply):
         """ Gets called when remote responds to our request for port connection """
@@ -141,6 +153,11 @@ class TunnelConnection(BaseConnection):
         else:
             self.peer_port_meta.properties.update(reply.data.get('port_properties', {}))
 
+        # Absent when the peer does not know compact frames
+        link = self._direct_link()
+        if link is not None:
+            link.interned.learn(reply.data.get('interned', {}))
+
         # Set up the port's endpoint
         tunnel = self.token_tunnel.tunnels[self.peer_port_meta.node_id]
         self.port.set_queue(queue.get(self.port, peer_port_meta=self.peer_port_meta))
@@ -150,7 +167,11 @@ class TunnelConnection(BaseConnection):
                    self.peer_port_meta.node_id,
                    reply.data['port_id'],
                    self.peer_port_meta.properties,
-                   self.node.sched)
+                   self.node.sched,
+                   # Absent when the peer does not know the compact encoding, token batching or windows
+                   token_encoding=reply.data.get('token_encoding'),
+                   token_batching=reply.data.get('token_batching', False),
+                   token_window=reply.data.get('token_window', False))
 
         invalid_endpoint = self.port.attach_endpoint(endp)
         invalid_endpoint.unregister(self.node.sched)
@@ -180,6 +201,15 @@ class TunnelConnection(BaseConnection):
             _log.analyze(self.node.id, "+ WRONG TUNNEL", payload, peer_node_id=self.peer_port_meta.node_id)
             return response.CalvinResponse(response.GONE)
 
+        # Use the compact token encoding only if the peer advertised it
+        token_encoding = COMPACT_ENCODING if COMPACT_ENCODING in payload.get('token_encodings', []) else None
+        token_batching = bool(payload.get('token_batching', False))
+        token_window = bool(payload.get('token_window', False))
+        reply_data = {}
+        link = self._direct_link()
+        if link is not None and 'interned' in payload:
+            link.interned.learn(payload['interned'])
+            reply_data['interned'] = link.interned.intern([tunnel.id, self.port.id])
         self.port.set_queue(queue.get(self.port, peer_port_meta=self.peer_port_meta))
         cls = endpoint.TunnelInEndpoint if self.port.direction == 'in' else endpoint.TunnelOutEndpoint
         endp = cls(self.port,
@@ -187,7 +217,10 @@ class TunnelConnection(BaseConnection):
                    self.peer_port_meta.node_id,
                    self.peer_port_meta.port_id,
                    self.peer_port_meta.properties,
-                   self.node.sched)
+                   self.node.sched,
+                   token_encoding=token_encoding,
+                   token_batching=token_batching,
+                   token_window=token_window)
 
         invalid_endpoint = self.port.attach_endpoint(endp)
         invalid_endpoint.unregister(self.node.sched)
@@ -198,7 +231,11 @@ class TunnelConnection(BaseConnection):
         self.node.storage.add_port(self.port, self.node.id, self.port.owner.id)
 
         _log.analyze(self.node.id, "+ OK", payload, peer_node_id=self.peer_port_meta.node_id)
-        return response.CalvinResponse(response.OK, {'port_id': self.port.id, 'port_properties': self.port.properties})
+        reply_data.update({'port_id': self.port.id, 'port_properties': self.port.properties,
+                           'token_encoding': token_encoding,
+                           'token_batching': token_batching,
+                           'token_window': token_window})
+        return response.CalvinResponse(response.OK, reply_data)
 
     def disconnect(self, terminate=DISCONNECT.TEMPORARY):
         """ Obtain any missing information to enable disconnecting one port peer and make the disconnect"""
@@ -240,6 +277,7 @@ class TunnelConnection(BaseConnection):
             _log.exception("Did not have remaining_tokens")
             remaining_tokens = {}
         self.port.exhausted_tokens(remaining_tokens)
+        self.node.sched.schedule_actor(self.port.owner.id)
         if terminate:
             self.node.storage.add_port(self.port, self.node.id, self.port.owner.id,
                                         exhausting_peers=remaining_tokens.keys())
@@ -264,6 +302,7 @@ class TunnelConnection(BaseConnection):
         remaining_tokens = self._destroy_endpoints(terminate=terminate)
         self._deserialize_remaining_tokens(peer_remaining_tokens)
         self.port.exhausted_tokens(peer_remaining_tokens)
+        self.node.sched.schedule_actor(self.port.owner.id)
         if terminate:
             self.node.storage.add_port(self.port, self.node.id, self.port.owner.id,
                                         exhausting_peers=peer_remaining_tokens.keys())
@@ -341,7 +380,7 @@ class TunnelConnection(BaseConnection):
                 self.pending_tunnels.pop(tunnel_peer_id)
 
         def recv_token_handler(self, tunnel, payload):
-            """ Gets called when a token arrives on any port """
+            """ Gets called when a token (TOKEN) or tokens (TOKENS) arrives on any port """
             try:
                 port = self._get_local_port(port_id=payload['peer_port_id'])
                 for e in port.endpoints:
@@ -349,7 +388,10 @@ class TunnelConnection(BaseConnection):
                     # it is sorted out if we connect again
                     try:
                         if e.peer_id == payload['port_id']:
-                            e.recv_token(payload)
+                            if 'tokens' in payload:
+                                e.recv_tokens(payload)
+                            else:
+                                e.recv_token(payload)
                             break
                     except:
                         pass
@@ -366,7 +408,7 @@ class TunnelConnection(BaseConnection):
                 tunnel.send(reply)
 
         def recv_token_reply_handler(self, tunnel, payload):
-            """ Gets called when a token is (N)ACKed for any port """
+            """ Gets called when a token is (N)ACKed or a window is updated for any port """
             try:
                 port = self._get_local_port(port_id=payload['port_id'])
             except:
@@ -378,7 +420,12 @@ class TunnelConnection(BaseConnection):
                     # it is sorted out if we connect again
                     try:
                         if e.get_peer()[1] == payload['peer_port_id']:
-                            e.reply(payload['sequencenbr'], payload['value'])
+                            if 'credit' in payload:
+                                e.reply_window(payload['sequencenbr'], payload['credit'], payload['value'])
+                            elif 'count' in payload:
+                                e.reply_many(payload['sequencenbr'], payload['count'], payload['value'])
+                            else:
+                                e.reply(payload['sequencenbr'], payload['value'])
                             break
                     except:
                         pass
@@ -386,9 +433,9 @@ class TunnelConnection(BaseConnection):
         def tunnel_recv_handler(self, tunnel, payload):
             """ Gets called when we receive a message over a tunnel """
             if 'cmd' in payload:
-                if 'TOKEN' == payload['cmd']:
+                if payload['cmd'] in ('TOKEN', 'TOKENS'):
                     self.recv_token_handler(tunnel, payload)
-                elif 'TOKEN_REPLY' == payload['cmd']:
+                elif payload['cmd'] in ('TOKEN_REPLY', 'TOKENS_REPLY', 'TOKEN_WINDOW'):
                     self.recv_token_reply_handler(tunnel, payload)
 
     def init(self):
@@ -51,6 +51,10 @@ class Endpoint(object):
         if self.use_monitor():
             registry.unregister_endpoint(self)
 
+    def unshare_queue(self):
+        """Called before the port gets a new queue, see LocalOutEndpoint"""
+        pass
+
     def communicate(self):
         """
         Called by the runtime when it is possible to transfer data to counterpart.
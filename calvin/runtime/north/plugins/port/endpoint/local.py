@@ -17,7 +17,7 @@
 import time
 
 from calvin.runtime.north.plugins.port.endpoint.common import Endpoint
-from calvin.runtime.north.plugins.port.queue.common import QueueEmpty, QueueFull
+from calvin.runtime.north.plugins.port import queue
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities.calvinlogger import get_logger
 
@@ -29,6 +29,27 @@ _log = get_logger(__name__)
 
 PRESSURE_LENGTH = 3
 
+
+def split_shared_queue(outport, inport):
+    """
+    Give outport a queue of its own when it shares the queue with inport (see LocalConnection).
+    The inport keeps the queue and all its tokens. The outport gets a queue where all tokens are
+    read and committed by the inport, i.e. as if LocalOutEndpoint had transferred every token.
+    """
+    if outport.queue is not inport.queue:
+        return
+    state = inport.queue._state()
+    write_pos = state['write_pos']
+    state['read_pos'] = {reader: write_pos for reader in state['readers']}
+    state['tentative_read_pos'] = dict(state['read_pos'])
+    state['reader_offset'] = dict(state['reader_offset'])
+    out_queue = queue.get(outport, peer_port=inport)
+    out_queue._set_state(state)
+    out_queue.add_writer(outport.id, outport.properties)
+    outport.replace_queue(out_queue)
+    _log.debug("Split shared queue %s -> %s" % (outport.id, inport.id))
+
+
 class LocalInEndpoint(Endpoint):
 
     """docstring for LocalEndpoint"""
@@ -45,11 +66,19 @@ class LocalInEndpoint(Endpoint):
     def is_connected(self):
         return True
 
+    def is_shared(self):
+        return self.port.queue is self.peer_port.queue
+
+    def unshare_queue(self):
+        split_shared_queue(self.peer_port, self.port)
+
     def attached(self):
         self.port.queue.add_reader(self.port.id, self.port.properties)
         self.port.queue.add_writer(self.peer_id, self.peer_port.properties)
 
     def detached(self, terminate=DISCONNECT.TEMPORARY):
+        # Each port handles disconnect with a queue of its own
+        self.unshare_queue()
         if terminate == DISCONNECT.TERMINATE:
             self.port.queue.remove_writer(self.peer_port.id)
         elif terminate == DISCONNECT.EXHAUST:
@@ -77,11 +106,19 @@ class LocalOutEndpoint(Endpoint):
     def is_connected(self):
         return True
 
+    def is_shared(self):
+        return self.port.queue is self.peer_port.queue
+
+    def unshare_queue(self):
+        split_shared_queue(self.port, self.peer_port)
+
     def attached(self):
         self.port.queue.add_reader(self.peer_port.id, self.peer_port.properties)
         self.port.queue.add_writer(self.port.id, self.port.properties)
 
     def detached(self, terminate=DISCONNECT.TEMPORARY):
+        # Each port handles disconnect with a queue of its own
+        self.unshare_queue()
         if terminate == DISCONNECT.TEMPORARY:
             # cancel any tentative reads to acked reads
             self.port.queue.cancel(self.peer_port.id)
@@ -102,6 +139,9 @@ class LocalOutEndpoint(Endpoint):
         return True
 
     def communicate(self, *args, **kwargs):
+        if self.port.queue is self.peer_port.queue:
+            # Written tokens are already readable by the peer
+            return False
         if self.peer_endpoint is None:
             for e in self.peer_port.endpoints:
                 if e.peer_id == self.port.id:
@@ -109,17 +149,17 @@ class LocalOutEndpoint(Endpoint):
                     break
         sent = False
         nbr = None
-        while True:
-            try:
-                nbr, token = self.port.queue.com_peek(self.peer_id)
-                self.peer_port.queue.com_write(token, self.port.id, nbr)
-                self.port.queue.com_commit(self.peer_id, nbr)
+        # Move all available tokens at once, as many as fit in the peer's queue
+        first_nbr, tokens = self.port.queue.com_peek_many(self.peer_id)
+        if tokens:
+            count = self.peer_port.queue.com_write_many(tokens, self.port.id, first_nbr)
+            if count:
+                nbr = first_nbr + count - 1
+                self.port.queue.com_commit_upto(self.peer_id, nbr)
                 sent = True
-            except QueueEmpty:
-                # Nothing to read
-                break
-            except QueueFull:
-                # Could not write, rollback read
+            if count < len(tokens):
+                # Could not write all, rollback the rest of the read
+                nbr = first_nbr + count
                 _log.debug("LOCAL QUEUE FULL %d %s" % (self.peer_endpoint.pressure_count, self.peer_id))
                 self.port.queue.com_cancel(self.peer_id, nbr)
                 if (self.peer_endpoint and
@@ -129,7 +169,6 @@ class LocalOutEndpoint(Endpoint):
                     # Inform scheduler about potential pressure event
                     if self.scheduler:
                         self.scheduler.trigger_pressure_event(self.peer_port.owner.id)
-                break
         if self.peer_endpoint and nbr is not None:
             self.peer_endpoint.pressure_last = nbr
         return sent
@@ -16,7 +16,7 @@
 
 import time
 
-from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.calvin_token import Token, COMPACT_ENCODING
 from calvin.runtime.north.plugins.port.endpoint.common import Endpoint
 from calvin.runtime.north.plugins.port.queue.common import COMMIT_RESPONSE, QueueEmpty, QueueFull
 from calvin.runtime.north.plugins.port import DISCONNECT
@@ -29,12 +29,16 @@ _log = get_logger(__name__)
 #
 
 PRESSURE_LENGTH = 3
+# Max number of tokens in a TOKENS message
+BATCH_LENGTH = 32
 
 class TunnelInEndpoint(Endpoint):
 
     """docstring for TunnelInEndpoint"""
 
-    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, scheduler):
+    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, scheduler, token_encoding=None,
+                 token_batching=False, token_window=False):
+        # Incoming tokens are decoded whatever their encoding and batching, these only matter when sending
         super(TunnelInEndpoint, self).__init__(port)
         self.tunnel = tunnel
         self.peer_id = peer_port_id
@@ -44,6 +48,13 @@ class TunnelInEndpoint(Endpoint):
         self.pressure_count = 0
         self.pressure = [(None, 0)] * PRESSURE_LENGTH
         self.pressure_last = (0, 0)
+        # Windowed flow control, tokens are ACKed cumulatively with credit for the free slots in the queue
+        self.token_window = token_window
+        # Sequence number of the next token expected, the end of the window last told the peer
+        # and the largest credit told, i.e. about the queue length
+        self.sequencenbr_expected = None
+        self.window_end = None
+        self.credit_max = 0
 
     def __str__(self):
         str = super(TunnelInEndpoint, self).__str__()
@@ -68,6 +79,7 @@ class TunnelInEndpoint(Endpoint):
             self.remaining_tokens = {self.port.id: tokens}
 
     def recv_token(self, payload):
+        r = None
         try:
             r = self.port.queue.com_write(Token.decode(payload['token']), self.peer_id, payload['sequencenbr'])
             if r == COMMIT_RESPONSE.handled:
@@ -83,13 +95,11 @@ class TunnelInEndpoint(Endpoint):
             # Queue full just send NACK
             _log.debug("REMOTE QUEUE FULL %d %s" % (self.pressure_count, self.port.id))
             ok = False
-            if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH][0] != payload['sequencenbr']:
-                # Log a QueueFull event
-                self.pressure[self.pressure_count % PRESSURE_LENGTH] = (payload['sequencenbr'], time.time())
-                self.pressure_count += 1
-                # Inform scheduler about potential pressure event
-                self.scheduler.trigger_pressure_event(self.port.owner.id)
+            self._queue_full(payload['sequencenbr'])
         self.pressure_last = payload['sequencenbr']
+        if self.token_window:
+            self._reply_window(1 if ok else 0, ok)
+            return
         reply = {
             'cmd': 'TOKEN_REPLY',
             'port_id': payload['port_id'],
@@ -99,6 +109,91 @@ class TunnelInEndpoint(Endpoint):
         }
         self.tunnel.send(reply)
 
+    def recv_tokens(self, payload):
+        """
+        Tokens with consecutive sequence numbers from payload['sequencenbr'], the reply
+        ACKs the count first tokens and, when not all, NACKs the token after them.
+        """
+        sequencenbr = payload['sequencenbr']
+        tokens = [Token.decode(t) for t in payload['tokens']]
+        count = 0
+        r = None
+        try:
+            # The first token tells if the tokens follow what we have, the rest is then written in bulk
+            r = self.port.queue.com_write(tokens[0], self.peer_id, sequencenbr)
+            if r != COMMIT_RESPONSE.invalid:
+                written = self.port.queue.com_write_many(tokens[1:], self.peer_id, sequencenbr + 1)
+                count = 1 + written
+                if r == COMMIT_RESPONSE.handled or written:
+                    # New tokens, trigger loop
+                    self.scheduler.tunnel_rx(self)
+        except QueueFull:
+            pass
+        if count < len(tokens) and r != COMMIT_RESPONSE.invalid:
+            _log.debug("REMOTE QUEUE FULL %d %s" % (self.pressure_count, self.port.id))
+            self._queue_full(sequencenbr + count)
+        self.pressure_last = sequencenbr + count - 1
+        if self.token_window:
+            self._reply_window(count, count == len(tokens))
+            return
+        reply = {
+            'cmd': 'TOKENS_REPLY',
+            'port_id': payload['port_id'],
+            'peer_port_id': payload['peer_port_id'],
+            'sequencenbr': sequencenbr,
+            'count': count,
+            'value': 'ACK' if count == len(tokens) else 'NACK'
+        }
+        self.tunnel.send(reply)
+
+    def _reply_window(self, count, ok):
+        """Reply on a message with count tokens dealt with, ok is False when not all of them were"""
+        # The queue's write position for the peer, never the sequence numbers the peer sent,
+        # tokens not following what we have are NACKed with the position we expect
+        self.sequencenbr_expected = self.port.queue.com_write_pos(self.peer_id)
+        credit = self.port.queue.free_slots(self.peer_id)
+        self.credit_max = max(self.credit_max, credit + count)
+        if ok and credit * 2 < self.credit_max:
+            # Queue filling up, the ACK goes with the window update when the actor has consumed tokens
+            return
+        self._send_window('ACK' if ok else 'NACK', credit)
+
+    def _send_window(self, status, credit):
+        # All tokens before the expected one are ACKed, the peer may send credit more after them
+        self.window_end = self.sequencenbr_expected + credit
+        self.tunnel.send({
+            'cmd': 'TOKEN_WINDOW',
+            'port_id': self.peer_id,
+            'peer_port_id': self.port.id,
+            'sequencenbr': self.sequencenbr_expected,
+            'credit': credit,
+            'value': status
+        })
+
+    def use_monitor(self):
+        # With windowed flow control the peer is told when there are free slots again
+        return self.token_window
+
+    def communicate(self, *args, **kwargs):
+        if self.window_end is None:
+            return False
+        credit = self.port.queue.free_slots(self.peer_id)
+        # Update the window when it has grown by half the queue, the queue still has tokens for
+        # the actor while the update is on its way and the peer sends them in fewer messages
+        if credit - (self.window_end - self.sequencenbr_expected) >= max(1, self.credit_max // 2):
+            _log.debug("Window on port %s/%s [%i+%i]" % (self.port.id, self.port.name, self.sequencenbr_expected, credit))
+            self._send_window('ACK', credit)
+        # No tokens were transferred
+        return False
+
+    def _queue_full(self, sequencenbr):
+        if self.pressure[(self.pressure_count - 1) % PRESSURE_LENGTH][0] != sequencenbr:
+            # Log a QueueFull event
+            self.pressure[self.pressure_count % PRESSURE_LENGTH] = (sequencenbr, time.time())
+            self.pressure_count += 1
+            # Inform scheduler about potential pressure event
+            self.scheduler.trigger_pressure_event(self.port.owner.id)
+
     def set_peer_port_id(self, id):
         if self.peer_id is None:
             # If not set previously set it now
@@ -113,16 +208,26 @@ class TunnelOutEndpoint(Endpoint):
 
     """docstring for TunnelOutEndpoint"""
 
-    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, scheduler):
+    def __init__(self, port, tunnel, peer_node_id, peer_port_id, peer_port_properties, scheduler, token_encoding=None,
+                 token_batching=False, token_window=False):
         super(TunnelOutEndpoint, self).__init__(port)
         self.tunnel = tunnel
         self.peer_id = peer_port_id
         self.peer_node_id = peer_node_id
         self.peer_port_properties = peer_port_properties
         self.scheduler = scheduler
+        # Token encoding negotiated with the peer when connecting, older peers only decode the default
+        self.compact_tokens = token_encoding == COMPACT_ENCODING
+        # Send runs of tokens in TOKENS messages, when the peer knows them
+        self.token_batching = token_batching
         # Keep track of acked tokens, only contains something post call if acks comes out of order
-        self.sequencenbrs_acked = []
+        self.sequencenbrs_acked = set()
         self.bulk = True
+        # Windowed flow control, the peer ACKs cumulatively and tells how many tokens it can take after them
+        self.token_window = token_window
+        # End of the peer's window and the sequence number of the next token to send, None until known
+        self.window_end = None
+        self.sequencenbr_next = None
 
     def __str__(self):
         str = super(TunnelOutEndpoint, self).__str__()
@@ -167,14 +272,38 @@ class TunnelOutEndpoint(Endpoint):
         # Maybe someone can fill the queue again
         self.scheduler.tunnel_tx_ack(self)
         r = self.port.queue.com_commit(self.peer_id, sequencenbr)
-        if r == COMMIT_RESPONSE.handled or r == COMMIT_RESPONSE.invalid:
-            return
-        self.sequencenbrs_acked.append(sequencenbr)
-        self.sequencenbrs_acked.sort()
-        for n in self.sequencenbrs_acked[:]:
-            r = self.port.queue.com_commit(self.peer_id, n)
-            if r == COMMIT_RESPONSE.handled or r == COMMIT_RESPONSE.invalid:
-                self.sequencenbrs_acked.remove(n)
+        if r == COMMIT_RESPONSE.unhandled:
+            # Out of order, committed when the tokens before it are
+            self.sequencenbrs_acked.add(sequencenbr)
+        elif r == COMMIT_RESPONSE.handled:
+            self._commit_acked(sequencenbr + 1)
+
+    def _commit_acked(self, sequencenbr):
+        # Commit tokens acked out of order that now follow the committed ones
+        while sequencenbr in self.sequencenbrs_acked:
+            self.sequencenbrs_acked.discard(sequencenbr)
+            self.port.queue.com_commit(self.peer_id, sequencenbr)
+            sequencenbr += 1
+
+    def reply_many(self, sequencenbr, count, status):
+        """Reply on a TOKENS message, count tokens from sequencenbr are ACKed and on NACK the one following them"""
+        _log.debug("Reply on port %s/%s/%s [%i+%i] %s" % (self.port.owner.name, self.peer_id, self.port.name,
+                                                          sequencenbr, count, status))
+        if count:
+            self._reply_ack_upto(sequencenbr + count - 1)
+        if status == 'NACK':
+            self._reply_nack(sequencenbr + count, status)
+
+    def _reply_ack_upto(self, sequencenbr):
+        # Back to full send speed directly
+        self.bulk = True
+        # Maybe someone can fill the queue again
+        self.scheduler.tunnel_tx_ack(self)
+        # The peer writes tokens in sequence order, hence all tokens up to sequencenbr are received
+        self.port.queue.com_commit_upto(self.peer_id, sequencenbr)
+        if self.sequencenbrs_acked:
+            self.sequencenbrs_acked = set(n for n in self.sequencenbrs_acked if n > sequencenbr)
+            self._commit_acked(sequencenbr + 1)
 
     def _reply_nack(self, sequencenbr, status):
         # Make send only send one token at a time and have increasing time between them
@@ -185,7 +314,32 @@ class TunnelOutEndpoint(Endpoint):
         r = self.port.queue.com_cancel(self.peer_id, sequencenbr)
         if r == COMMIT_RESPONSE.handled:
             # Filter out ACK for later seq nbrs, should not happen but precaution
-            self.sequencenbrs_acked = [n for n in self.sequencenbrs_acked if n < sequencenbr]
+            self.sequencenbrs_acked = set(n for n in self.sequencenbrs_acked if n < sequencenbr)
+
+    def reply_window(self, sequencenbr, credit, status):
+        """
+        Reply or window update from a peer with windowed flow control: the tokens before sequencenbr
+        are received, credit tokens from it can be sent and on NACK the tokens from it are resent.
+        """
+        _log.debug("Window on port %s/%s/%s [%i+%i] %s" % (self.port.owner.name, self.peer_id, self.port.name,
+                                                           sequencenbr, credit, status))
+        if sequencenbr > 0:
+            self.port.queue.com_commit_upto(self.peer_id, sequencenbr - 1)
+        self.window_end = sequencenbr + credit
+        if status == 'NACK' and self.port.queue.com_cancel(self.peer_id, sequencenbr) == COMMIT_RESPONSE.handled:
+            self.sequencenbr_next = sequencenbr
+            if credit:
+                # Not for lack of slots (e.g. tokens out of sequence), resend in a while
+                self.scheduler.tunnel_tx_nack(self)
+                return
+        # Maybe someone can fill the queue again and the window might allow sending
+        self.scheduler.tunnel_tx_ack(self)
+
+    def _window_room(self):
+        if self.window_end is None or self.sequencenbr_next is None:
+            # Window not known yet, one token at a time until the peer has told its credit
+            return 1 if self.port.queue.com_is_committed(self.peer_id) else 0
+        return self.window_end - self.sequencenbr_next
 
     def _send_one_token(self):
         sequencenbr_sent, token = self.port.queue.com_peek(self.peer_id)
@@ -196,11 +350,25 @@ class TunnelOutEndpoint(Endpoint):
                                                        "BULK" if self.bulk else "THROTTLE"))
         self.tunnel.send({
             'cmd': 'TOKEN',
-            'token': token.encode(),
+            'token': token.encode(compact=self.compact_tokens),
             'peer_port_id': self.peer_id,
             'sequencenbr': sequencenbr_sent,
             'port_id': self.port.id
         })
+        self.sequencenbr_next = sequencenbr_sent + 1
+
+    def _send_tokens(self, max_tokens=BATCH_LENGTH):
+        sequencenbr, tokens = self.port.queue.com_peek_many(self.peer_id, max_tokens)
+        _log.debug("Send on port  %s/%s/%s [%i+%i] BULK" % (self.port.owner.name, self.peer_id, self.port.name,
+                                                            sequencenbr, len(tokens)))
+        self.tunnel.send({
+            'cmd': 'TOKENS',
+            'tokens': [token.encode(compact=self.compact_tokens) for token in tokens],
+            'peer_port_id': self.peer_id,
+            'sequencenbr': sequencenbr,
+            'port_id': self.port.id
+        })
+        self.sequencenbr_next = sequencenbr + len(tokens)
 
     def use_monitor(self):
         return True
@@ -208,7 +376,27 @@ class TunnelOutEndpoint(Endpoint):
     def communicate(self, *args, **kwargs):
         # FIXME uses internal queue attributes
         sent = False
-        if self.bulk:
+        if getattr(self.port.queue, 'conflating', False):
+            # Latest value queue, send the next token when the previous is acked, until then it may be superseded
+            if self.port.queue.tokens_available(1, self.peer_id) and self.port.queue.com_is_committed(self.peer_id):
+                self._send_one_token()
+                sent = True
+        elif self.token_window:
+            # Send what fits in the peer's window, never more than it has told it has room for
+            room = self._window_room()
+            while room > 0 and self.port.queue.tokens_available(1, self.peer_id):
+                sent = True
+                if self.token_batching:
+                    self._send_tokens(min(room, BATCH_LENGTH))
+                else:
+                    self._send_one_token()
+                room = self._window_room()
+        elif self.bulk and self.token_batching:
+            # Send all we have, a run of tokens per message
+            while self.port.queue.tokens_available(1, self.peer_id):
+                sent = True
+                self._send_tokens()
+        elif self.bulk:
             # Send all we have, since other side seems to keep up
             while self.port.queue.tokens_available(1, self.peer_id):
                 sent = True
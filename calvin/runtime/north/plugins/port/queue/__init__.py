@@ -24,7 +24,11 @@ _MODULES = {'fanout_fifo': 'FanoutFIFO',
             'fanout_round_robin_fifo': "FanoutRoundRobinFIFO",
             'fanout_random_fifo': "FanoutRandomFIFO",
             'fanout_balanced_fifo': "FanoutBalancedFIFO",
-            'fanout_mapped_fifo': 'FanoutMappedFIFO'}
+            'fanout_mapped_fifo': 'FanoutMappedFIFO',
+            'fanout_spill_fifo': 'FanoutSpillFIFO',
+            'fanout_latest_fifo': 'FanoutLatestFIFO',
+            'fanout_rate_balanced_fifo': 'FanoutRateBalancedFIFO',
+            'fanout_priority_fifo': 'FanoutPriorityFIFO'}
 
 from calvin.utilities.calvinlogger import get_logger
 
@@ -53,6 +57,14 @@ def get(port, peer_port=None, peer_port_meta=None):
             selected_queue = 'fanout_mapped_fifo'
         elif 'balanced' == routing_prop:
             selected_queue = "fanout_balanced_fifo"
+        elif 'balanced-rate' == routing_prop:
+            selected_queue = "fanout_rate_balanced_fifo"
+        elif 'spill' == routing_prop:
+            selected_queue = "fanout_spill_fifo"
+        elif 'latest' == routing_prop:
+            selected_queue = "fanout_latest_fifo"
+        elif 'priority' == routing_prop:
+            selected_queue = "fanout_priority_fifo"
         elif routing_prop == 'collect-unordered':
             selected_queue = "collect_unordered"
         elif routing_prop == 'collect-tagged':
@@ -201,7 +201,7 @@ class CollectBase(object):
             exhausted_tokens.pop(0)
         return not bool(exhausted_tokens)
 
-    def get_peers(self):
+    def get_peers(self, direction=None):
         return self.writers
 
     def write(self, data, metadata):
@@ -218,6 +218,12 @@ class CollectBase(object):
             raise Exception("No writer %s in %s" % (metadata, self.writers))
         return length < self.N and (self.write_pos[metadata] - self.read_pos[metadata]) < (self.N - length)
 
+    def free_slots(self, metadata):
+        """Number of tokens that can be written now by the writer metadata"""
+        if metadata not in self.writers:
+            raise Exception("No writer %s in %s" % (metadata, self.writers))
+        return self.N - 1 - (self.write_pos[metadata] - self.read_pos[metadata])
+
     def tokens_available(self, length, metadata):
         raise NotImplementedError("Sub-class must override")
 
@@ -261,6 +267,10 @@ class CollectBase(object):
     # Queue operations used by communication which utilize a sequence number
     #
 
+    def com_write_pos(self, metadata):
+        """Sequence number of the next token to write from the writer metadata"""
+        return self.write_pos[metadata]
+
     def com_write(self, data, metadata, sequence_nbr):
         write_pos = self.write_pos[metadata]
         if sequence_nbr == write_pos:
@@ -271,12 +281,36 @@ class CollectBase(object):
         else:
             return COMMIT_RESPONSE.invalid
 
+    def com_write_many(self, tokens, metadata, sequence_nbr):
+        """ Write tokens with consecutive sequence numbers starting at sequence_nbr
+            return number of tokens dealt with, i.e. written or (as com_write) unhandled or invalid,
+            the remaining tokens did not fit in the queue.
+        """
+        write_pos = self.write_pos[metadata]
+        skip = write_pos - sequence_nbr
+        if skip < 0 or skip >= len(tokens):
+            # All invalid or all already in queue
+            return len(tokens)
+        count = min(len(tokens) - skip, self.N - (write_pos - self.read_pos[metadata]) - 1)
+        fifo = self.fifo[metadata]
+        N = self.N
+        for i in xrange(count):
+            fifo[(write_pos + i) % N] = tokens[skip + i]
+        self.write_pos[metadata] = write_pos + count
+        return skip + count
+
     def com_peek(self, metadata):
         raise NotImplementedError("The unordered fanin queue should not be used on an outport")
 
+    def com_peek_many(self, metadata, max_tokens=None):
+        raise NotImplementedError("The unordered fanin queue should not be used on an outport")
+
     def com_commit(self, reader, sequence_nbr):
         raise NotImplementedError("The unordered fanin queue should not be used on an outport")
 
+    def com_commit_upto(self, reader, sequence_nbr):
+        raise NotImplementedError("The unordered fanin queue should not be used on an outport")
+
     def com_cancel(self, reader, sequence_nbr):
         raise NotImplementedError("The unordered fanin queue should not be used on an outport")
 
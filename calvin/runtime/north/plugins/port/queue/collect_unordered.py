@@ -69,6 +69,7 @@ class CollectUnordered(CollectBase):
         return super(CollectUnordered, self).commit(metadata)
 
     def cancel(self, metadata):
-        self.turn_pos = self.peek_turn_pos
+        if self.peek_turn_pos != -1:
+            self.turn_pos = self.peek_turn_pos
         self.peek_turn_pos = -1
         super(CollectUnordered, self).cancel(metadata)
\ No newline at end of file
@@ -14,10 +14,52 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import weakref
+
 from calvin.utilities.utils import enum
+from calvin.utilities import calvinconfig
+
+_conf = calvinconfig.get()
 
 COMMIT_RESPONSE = enum('handled', 'unhandled', 'invalid')
 
+# Budget shared by all adaptive queues in the runtime, created on first use
+_queue_budget = None
+
+
+def get_queue_budget():
+    global _queue_budget
+    if _queue_budget is None:
+        _queue_budget = QueueBudget(_conf.get(None, 'queue_growth_budget') or 65536)
+    return _queue_budget
+
+
+class QueueBudget(object):
+    """
+    Number of token slots that adaptive queues (port property queue_length_max) may grow
+    beyond their queue_length, in total for the runtime. Queues are tracked weakly, a
+    discarded queue gives back its slots.
+    """
+    def __init__(self, slots):
+        super(QueueBudget, self).__init__()
+        self.slots = slots
+        self._queues = weakref.WeakSet()
+
+    def used(self):
+        return sum(q.grown_slots for q in self._queues)
+
+    def reserve(self, queue, slots):
+        """Reserve slots more for queue, returns False when the budget does not allow it"""
+        if self.used() + slots > self.slots:
+            return False
+        self._queues.add(queue)
+        return True
+
+    def register(self, queue):
+        """Account for a queue that already has grown, e.g. after migration"""
+        self._queues.add(queue)
+
+
 class QueueNone(object):
     def __init__(self):
         super(QueueNone, self).__init__()
@@ -14,7 +14,10 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from calvin.runtime.north.plugins.port.queue.common import QueueFull
+import heapq
+import itertools
+
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
 from calvin.utilities import calvinlogger
 from calvin.runtime.north.plugins.port.queue.fanout_ordered_fifo import FanoutOrderedFIFO
 
@@ -25,11 +28,17 @@ class FanoutBalancedFIFO(FanoutOrderedFIFO):
 
     """
     A queue which routes tokens trying to keep to peers equally busy
+
+    Readers are kept in a heap ordered by cost, the number of queued tokens, so picking the
+    reader for a token is O(log readers). Entries are updated lazily, a reader's entry is
+    replaced when its cost changes and outdated entries are discarded when they surface.
+    Subclasses can route on another cost, see _cost.
     """
 
     def __init__(self, port_properties, peer_port_properties):
         super(FanoutBalancedFIFO, self).__init__(port_properties, peer_port_properties)
         self._type = "dispatch:balanced"
+        self._reset_heap()
 
     def _set_turn(self):
         self._update_turn = lambda self: True
@@ -37,30 +46,102 @@ class FanoutBalancedFIFO(FanoutOrderedFIFO):
     def _reset_turn(self):
         pass
 
-    def write(self, data, metadata):
-        slots = []
-        full = True
+    def _set_state(self, state):
+        super(FanoutBalancedFIFO, self)._set_state(state)
+        self._reset_heap()
+
+    #
+    # Reader heap, entries are [cost, entry id, reader] and only the latest entry of a reader is valid
+    #
+    def _reset_heap(self):
+        self._heap = []
+        self._entry = {}
+        self._entry_ids = itertools.count()
+        self._queued = 0
         for reader in self.readers:
-            s = self.N - (self.write_pos[reader] - self.read_pos[reader]) - 1
-            slots.append((s, reader))
-            if s > 0:
-                full = False
-        if full:
+            self._queued += self.write_pos[reader] - self.read_pos[reader]
+            self._update(reader)
+
+    def _cost(self, reader):
+        """Cost of routing the next token to reader, lowest cost is picked"""
+        return self.write_pos[reader] - self.read_pos[reader]
+
+    def _update(self, reader):
+        if self.write_pos[reader] - self.read_pos[reader] >= self.N - 1:
+            # Full, back in the heap when it has read
+            self._entry.pop(reader, None)
+            return
+        entry_id = next(self._entry_ids)
+        self._entry[reader] = entry_id
+        heapq.heappush(self._heap, [self._cost(reader), entry_id, reader])
+        if len(self._heap) > 4 * len(self.readers) + 16:
+            # Too many outdated entries
+            self._heap = [e for e in self._heap if self._entry.get(e[2]) == e[1]]
+            heapq.heapify(self._heap)
+
+    def _select(self):
+        heap = self._heap
+        while heap:
+            _, entry_id, reader = heap[0]
+            if self._entry.get(reader) == entry_id:
+                return reader
+            heapq.heappop(heap)
+        return None
+
+    def _written(self, reader):
+        """A token has been routed to reader"""
+        self._queued += 1
+        self._update(reader)
+
+    def _committed(self, reader, count):
+        """reader has committed count tokens"""
+        self._queued -= count
+        self._update(reader)
+
+    def add_reader(self, reader, properties):
+        new = reader not in self.readers
+        super(FanoutBalancedFIFO, self).add_reader(reader, properties)
+        if new:
+            self._update(reader)
+
+    def remove_reader(self, reader):
+        if reader in self.readers:
+            self._queued -= self.write_pos[reader] - self.read_pos[reader]
+            self._entry.pop(reader, None)
+        return super(FanoutBalancedFIFO, self).remove_reader(reader)
+
+    def write(self, data, metadata):
+        peer = self._select()
+        if peer is None:
             raise QueueFull()
-        # Write token in peer with most slots FIFO
-        peer = max(slots)[1]
         write_pos = self.write_pos[peer]
         self.fifo[peer][write_pos % self.N] = data
         self.write_pos[peer] = write_pos + 1
+        self._written(peer)
         return True
 
     def slots_available(self, length, metadata):
         if length >= self.N:
             return False
-        # Sum slots from all reader FIFOs when more than length OK
-        slots = 0
-        for reader in self.readers:
-            slots += self.N - (self.write_pos[reader] - self.read_pos[reader]) - 1
-            if slots >= length:
-                return True
+        # Sum of slots in all reader FIFOs
+        return len(self.readers) * (self.N - 1) - self._queued >= length
+
+    def commit(self, metadata):
+        count = self.tentative_read_pos[metadata] - self.read_pos[metadata]
+        super(FanoutBalancedFIFO, self).commit(metadata)
+        if count:
+            self._committed(metadata, count)
         return False
+
+    def com_commit(self, reader, sequence_nbr):
+        r = super(FanoutBalancedFIFO, self).com_commit(reader, sequence_nbr)
+        if r == COMMIT_RESPONSE.handled:
+            self._committed(reader, 1)
+        return r
+
+    def com_commit_upto(self, reader, sequence_nbr):
+        read_pos = self.read_pos[reader]
+        r = super(FanoutBalancedFIFO, self).com_commit_upto(reader, sequence_nbr)
+        if r == COMMIT_RESPONSE.handled:
+            self._committed(reader, self.read_pos[reader] - read_pos)
+        return r
@@ -15,7 +15,7 @@
 # limitations under the License.
 
 from calvin.runtime.north.calvin_token import Token
-from calvin.runtime.north.plugins.port.queue.common import QueueEmpty, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.common import QueueEmpty, QueueFull, COMMIT_RESPONSE
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities import calvinlogger
 
@@ -128,7 +128,7 @@ class FanoutBase(object):
         self.nbr_peers -= 1
         return True
     
-    def get_peers(self):
+    def get_peers(self, direction=None):
         return self.readers
     
     def set_exhausted_tokens(self, tokens):
@@ -156,6 +156,13 @@ class FanoutBase(object):
         else:
             self.remove_reader(peer_id)
         return []
+
+    def free_slots(self, metadata):
+        """Number of tokens that can be written now, i.e. the longest run slots_available allows"""
+        free = 0
+        while free < self.N - 1 and self.slots_available(free + 1, metadata):
+            free += 1
+        return free
         
     def tokens_available(self, length, metadata):
         if metadata not in self.readers:
@@ -184,6 +191,10 @@ class FanoutBase(object):
     # Queue operations used by communication which utilize a sequence number
     #
 
+    def com_write_pos(self, metadata):
+        """Sequence number of the next token to write"""
+        return self.write_pos[self.readers[self.reader_turn[self.turn_pos % self.N]]]
+
     def com_write(self, data, metadata, sequence_nbr):
         peer = self.readers[self.reader_turn[self.turn_pos % self.N]]
         write_pos = self.write_pos[peer]
@@ -195,6 +206,17 @@ class FanoutBase(object):
         else:
             return COMMIT_RESPONSE.invalid
 
+    def com_write_many(self, tokens, metadata, sequence_nbr):
+        """ Write tokens with consecutive sequence numbers starting at sequence_nbr
+            return number of tokens dealt with (as com_write), the remaining tokens did not fit.
+        """
+        for i, token in enumerate(tokens):
+            try:
+                self.com_write(token, metadata, sequence_nbr + i)
+            except QueueFull:
+                return i
+        return len(tokens)
+
     def com_peek(self, metadata):
         pos = self.tentative_read_pos[metadata]
         #_log.debug("COM_PEEK %s read_pos: %d" % (metadata, pos))
@@ -202,6 +224,22 @@ class FanoutBase(object):
         #_log.debug("COM_PEEK2 %s read_pos: %d" % (metadata, pos))
         return r
 
+    def com_peek_many(self, metadata, max_tokens=None):
+        """ Tentatively read up to max_tokens (default all available) tokens
+            return tuple (sequence_nbr of first token, list of tokens)
+        """
+        if metadata not in self.readers:
+            raise Exception("No reader %s in %s" % (metadata, self.readers))
+        pos = self.tentative_read_pos[metadata]
+        count = self.write_pos[metadata] - pos
+        if max_tokens is not None and max_tokens < count:
+            count = max_tokens
+        fifo = self.fifo[metadata]
+        N = self.N
+        tokens = [fifo[i % N] for i in xrange(pos, pos + count)]
+        self.tentative_read_pos[metadata] = pos + count
+        return (pos, tokens)
+
     def com_commit(self, reader, sequence_nbr):
         """ Will commit one token when the sequence_nbr matches
             return COMMIT_RESPONSE for action on token sequence_nbr.
@@ -218,14 +256,27 @@ class FanoutBase(object):
             else:
                 return COMMIT_RESPONSE.unhandled
 
+    def com_commit_upto(self, reader, sequence_nbr):
+        """ Will commit all tokens up to and including sequence_nbr
+            return COMMIT_RESPONSE for action on the tokens, unhandled when already committed.
+            reader: peer_id
+            sequence_nbr: token sequence_nbr
+        """
+        if sequence_nbr >= self.tentative_read_pos[reader]:
+            return COMMIT_RESPONSE.invalid
+        if sequence_nbr < self.read_pos[reader]:
+            return COMMIT_RESPONSE.unhandled
+        self.read_pos[reader] = sequence_nbr + 1
+        return COMMIT_RESPONSE.handled
+
     def com_cancel(self, reader, sequence_nbr):
         """ Will cancel tokens from the sequence_nbr to end
             return COMMIT_RESPONSE for action on tokens.
             reader: peer_id
             sequence_nbr: token sequence_nbr
         """
-        if (sequence_nbr >= self.tentative_read_pos[reader] and
-            sequence_nbr < self.reader_pos[reader]):
+        if (sequence_nbr >= self.tentative_read_pos[reader] or
+            sequence_nbr < self.read_pos[reader]):
             return COMMIT_RESPONSE.invalid
         self.tentative_read_pos[reader] = sequence_nbr
         return COMMIT_RESPONSE.handled
@@ -15,7 +15,7 @@
 # limitations under the License.
 
 from calvin.runtime.north.calvin_token import Token
-from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE, get_queue_budget
 from calvin.runtime.north.plugins.port import DISCONNECT
 from calvin.utilities import calvinlogger
 
@@ -25,6 +25,10 @@ class FanoutFIFO(object):
 
     """
     Default FIFO, all tokens to all peers
+
+    With port property queue_length_max larger than queue_length the queue is adaptive,
+    it doubles its length (within the runtime's queue budget) instead of being full and
+    halves it when it has been emptied without using more than a quarter of it.
     """
 
     def __init__(self, port_properties, peer_port_properties):
@@ -48,6 +52,16 @@ class FanoutFIFO(object):
         self.writer = None  # Not part of state, assumed not needed in migrated information
         self.exhausted_tokens = {}
         self.termination = {}
+        # Slowest reader, kept up to date by _set_read_pos so slot checks don't scan all readers
+        self._min_read_pos = 0
+        # Number of readers at each read position (modulo N)
+        self._read_counts = [0] * self.N
+        # Adaptive length, N is between _base_N and _max_N
+        self._base_N = length
+        self._max_N = max(port_properties.get('queue_length_max', 0) + 1, length)
+        self._adaptive = self._max_N > length
+        # Most tokens in the queue since last emptied
+        self._peak = 0
 
     def __str__(self):
         return "Tokens: %s, w:%i, r:%s, tr:%s" % (self.fifo, self.write_pos, self.read_pos, self.tentative_read_pos)
@@ -74,11 +88,21 @@ class FanoutFIFO(object):
         self.read_pos = state['read_pos']
         self.tentative_read_pos = state['tentative_read_pos']
         self.reader_offset = state.get('reader_offset', {pid: 0 for pid in self.readers})
+        self._reset_min_read_pos()
+        if self.N > self._base_N:
+            # Grew before migration, keep the tokens but account for the slots
+            self._max_N = max(self._max_N, self.N)
+            self._adaptive = True
+            get_queue_budget().register(self)
 
     @property
     def queue_type(self):
         return self._type
 
+    @property
+    def grown_slots(self):
+        return self.N - self._base_N
+
     def add_writer(self, writer, properties):
         self.writer = writer
 
@@ -103,6 +127,7 @@ class FanoutFIFO(object):
             self.reader_offset[reader] = 0
             self.read_pos[reader] = 0
             self.tentative_read_pos[reader] = 0
+        self._reset_min_read_pos()
 
     def remove_reader(self, reader):
         if reader not in self.readers:
@@ -112,6 +137,59 @@ class FanoutFIFO(object):
         del self.reader_offset[reader]
         self.readers.discard(reader)
         self.nbr_peers -= 1
+        self._reset_min_read_pos()
+
+    def _reset_min_read_pos(self):
+        self._read_counts = [0] * self.N
+        for pos in self.read_pos.values():
+            self._read_counts[pos % self.N] += 1
+        self._min_read_pos = min(self.read_pos.values() or [0])
+
+    def _set_read_pos(self, reader, pos):
+        """Move reader's (committed) read position forward to pos, keeping track of the slowest reader"""
+        old_pos = self.read_pos[reader]
+        if pos == old_pos:
+            return
+        if self._adaptive:
+            self._peak = max(self._peak, self.write_pos - self._min_read_pos)
+        self.read_pos[reader] = pos
+        counts = self._read_counts
+        counts[old_pos % self.N] -= 1
+        counts[pos % self.N] += 1
+        if old_pos == self._min_read_pos:
+            # Readers are at most N-1 positions apart, the reader itself stops the search at pos
+            while not counts[old_pos % self.N]:
+                old_pos += 1
+            self._min_read_pos = old_pos
+            if self._adaptive and old_pos == self.write_pos:
+                self._emptied()
+
+    def _emptied(self):
+        """All readers have read all tokens, shrink when a quarter of the queue was enough"""
+        if self.N > self._base_N and self._peak * 4 <= self.N - 1:
+            self._resize(max(self._base_N, (self.N - 1) // 2 + 1))
+        self._peak = 0
+
+    def _grow(self, length):
+        """Try to make room for length more tokens, up to the max length, returns True when there is room"""
+        needed = self.write_pos - self._min_read_pos + length + 1
+        N = self.N
+        while N < needed:
+            N = (N - 1) * 2 + 1
+        N = min(N, self._max_N)
+        if N == self.N or not get_queue_budget().reserve(self, N - self.N):
+            return False
+        self._resize(N)
+        return N >= needed
+
+    def _resize(self, N):
+        """Change the queue length to N, tokens keep their (monotonous) positions"""
+        fifo = [Token(0)] * N
+        for pos in xrange(self._min_read_pos, self.write_pos):
+            fifo[pos % N] = self.fifo[pos % self.N]
+        self.fifo = fifo
+        self.N = N
+        self._reset_min_read_pos()
 
     def is_exhausting(self, peer_id=None):
         if peer_id is None:
@@ -126,9 +204,7 @@ class FanoutFIFO(object):
             return []
         if terminate in [DISCONNECT.EXHAUST_PEER_SEND, DISCONNECT.EXHAUST_OUTPORT]:
             # Retrive remaining tokens to be returned
-            tokens = []
-            for read_pos in range(self.read_pos[peer_id], self.write_pos):
-                tokens.append([read_pos, self.fifo[read_pos % self.N]])
+            tokens = self._remaining_tokens(peer_id)
             # Remove the peer, so no more waiting for this peer to read
             self.remove_reader(peer_id)
             _log.debug("Send exhaust tokens %s" % tokens)
@@ -136,6 +212,10 @@ class FanoutFIFO(object):
             return tokens
         return []
 
+    def _remaining_tokens(self, peer_id):
+        """Tokens not yet read by peer_id, as [position, token] pairs"""
+        return [[pos, self.fifo[pos % self.N]] for pos in xrange(self.read_pos[peer_id], self.write_pos)]
+
     def any_outstanding_exhaustion_tokens(self):
         # Between having asked actor to exhaust and receiving exhaustion tokens we don't want to assume that
         # the exhaustion is done.
@@ -160,7 +240,7 @@ class FanoutFIFO(object):
         # If fully consumed remove peer_ids in tokens
         for peer_id in tokens.keys():
             if (self.termination.get(peer_id, (-1,))[0] in [DISCONNECT.EXHAUST_PEER_RECV, DISCONNECT.EXHAUST_INPORT] and
-                min(self.read_pos.values() or [0]) == self.write_pos):
+                self._min_read_pos == self.write_pos):
                 del self.termination[peer_id]
                 # Acting as inport then only one reader, remove it if still around
                 try:
@@ -182,10 +262,15 @@ class FanoutFIFO(object):
             exhausted_tokens.pop(0)
         return not bool(exhausted_tokens)
 
-    def get_peers(self):
-        if self.direction == "out":
+    def get_peers(self, direction=None):
+        """
+        Peers of the port using the queue, direction is the direction of that port which
+        differs from the queue's own direction when shared by a local in- and outport.
+        """
+        direction = direction or self.direction
+        if direction == "out":
             return self.readers
-        elif self.direction == "in" and self.writer is not None:
+        elif direction == "in" and self.writer is not None:
             return set([self.writer])
         else:
             return None
@@ -199,8 +284,16 @@ class FanoutFIFO(object):
         return True
 
     def slots_available(self, length, metadata):
-        last_readpos = min(self.read_pos.values() or [0])
-        return (self.N - ((self.write_pos - last_readpos) % self.N) - 1) >= length
+        if (self.N - ((self.write_pos - self._min_read_pos) % self.N) - 1) >= length:
+            return True
+        return self._adaptive and self._grow(length)
+
+    def free_slots(self, metadata):
+        """Number of tokens that can be written now, a full adaptive queue tries to grow first"""
+        free = self.N - (self.write_pos - self._min_read_pos) - 1
+        if free < 1 and self._adaptive and self._grow(1):
+            free = self.N - (self.write_pos - self._min_read_pos) - 1
+        return free
 
     def tokens_available(self, length, metadata):
         if not self.readers:
@@ -224,7 +317,7 @@ class FanoutFIFO(object):
 
     def commit(self, metadata):
         _log.debug("COMMIT EXHAUSTING???")
-        self.read_pos[metadata] = self.tentative_read_pos[metadata]
+        self._set_read_pos(metadata, self.tentative_read_pos[metadata])
         remove = []
         for peer_id, exhausted_tokens in self.exhausted_tokens.items():
             if self._transfer_exhaust_tokens(peer_id, self.exhausted_tokens[peer_id]):
@@ -237,7 +330,7 @@ class FanoutFIFO(object):
         if self.termination:
             _log.debug("COMMIT %s %s" % (metadata, {k:DISCONNECT.reverse_mapping[v[0]] for k, v in self.termination.items()}))
         if (self.termination.get(metadata, (-1,))[0] in [DISCONNECT.EXHAUST_PEER_RECV, DISCONNECT.EXHAUST_INPORT] and
-            min(self.read_pos.values() or [0]) == self.write_pos and
+            self._min_read_pos == self.write_pos and
             self.termination.get(metadata, (-1, False))[1]):
             del self.termination[metadata]
             terminated = True
@@ -256,6 +349,10 @@ class FanoutFIFO(object):
     # Queue operations used by communication which utilize a sequence number
     #
 
+    def com_write_pos(self, metadata):
+        """Sequence number of the next token to write"""
+        return self.write_pos
+
     def com_write(self, data, metadata, sequence_nbr):
         if sequence_nbr == self.write_pos:
             self.write(data, metadata)
@@ -269,6 +366,43 @@ class FanoutFIFO(object):
         pos = self.tentative_read_pos[metadata]
         return (pos - self.reader_offset[metadata], self.peek(metadata))
 
+    def com_write_many(self, tokens, metadata, sequence_nbr):
+        """ Write tokens with consecutive sequence numbers starting at sequence_nbr
+            return number of tokens dealt with, i.e. written or (as com_write) unhandled or invalid,
+            the remaining tokens did not fit in the queue.
+        """
+        skip = self.write_pos - sequence_nbr
+        if skip < 0 or skip >= len(tokens):
+            # All invalid or all already in queue
+            return len(tokens)
+        if self._adaptive:
+            # Grows if possible, otherwise write what fits
+            self.slots_available(len(tokens) - skip, metadata)
+        write_pos = self.write_pos
+        count = min(len(tokens) - skip, self.N - (write_pos - self._min_read_pos) - 1)
+        fifo = self.fifo
+        N = self.N
+        for i in xrange(count):
+            fifo[(write_pos + i) % N] = tokens[skip + i]
+        self.write_pos = write_pos + count
+        return skip + count
+
+    def com_peek_many(self, metadata, max_tokens=None):
+        """ Tentatively read up to max_tokens (default all available) tokens
+            return tuple (sequence_nbr of first token, list of tokens)
+        """
+        if metadata not in self.readers:
+            raise Exception("Unknown reader: '%s'" % metadata)
+        pos = self.tentative_read_pos[metadata]
+        count = self.write_pos - pos
+        if max_tokens is not None and max_tokens < count:
+            count = max_tokens
+        fifo = self.fifo
+        N = self.N
+        tokens = [fifo[i % N] for i in xrange(pos, pos + count)]
+        self.tentative_read_pos[metadata] = pos + count
+        return (pos - self.reader_offset[metadata], tokens)
+
     def com_commit(self, reader, sequence_nbr):
         """ Will commit one token when the sequence_nbr matches
             return COMMIT_RESPONSE for action on token sequence_nbr.
@@ -281,11 +415,25 @@ class FanoutFIFO(object):
             return COMMIT_RESPONSE.invalid
         if self.read_pos[reader] < self.tentative_read_pos[reader]:
             if sequence_nbr == self.read_pos[reader]:
-                self.read_pos[reader] += 1
+                self._set_read_pos(reader, sequence_nbr + 1)
                 return COMMIT_RESPONSE.handled
             else:
                 return COMMIT_RESPONSE.unhandled
 
+    def com_commit_upto(self, reader, sequence_nbr):
+        """ Will commit all tokens up to and including sequence_nbr
+            return COMMIT_RESPONSE for action on the tokens, unhandled when already committed.
+            reader: peer_id
+            sequence_nbr: token sequence_nbr
+        """
+        sequence_nbr += self.reader_offset[reader]
+        if sequence_nbr >= self.tentative_read_pos[reader]:
+            return COMMIT_RESPONSE.invalid
+        if sequence_nbr < self.read_pos[reader]:
+            return COMMIT_RESPONSE.unhandled
+        self._set_read_pos(reader, sequence_nbr + 1)
+        return COMMIT_RESPONSE.handled
+
     def com_cancel(self, reader, sequence_nbr):
         """ Will cancel tokens from the sequence_nbr to end
             return COMMIT_RESPONSE for action on tokens.
@@ -293,8 +441,8 @@ class FanoutFIFO(object):
             sequence_nbr: token sequence_nbr
         """
         sequence_nbr += self.reader_offset[reader]
-        if (sequence_nbr >= self.tentative_read_pos[reader] and
-            sequence_nbr < self.reader_pos[reader]):
+        if (sequence_nbr >= self.tentative_read_pos[reader] or
+            sequence_nbr < self.read_pos[reader]):
             return COMMIT_RESPONSE.invalid
         self.tentative_read_pos[reader] = sequence_nbr
         return COMMIT_RESPONSE.handled
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from calvin.runtime.north.plugins.port.queue.common import QueueFull
+from calvin.runtime.north.plugins.port.queue.fanout_fifo import FanoutFIFO
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+
+class FanoutLatestFIFO(FanoutFIFO):
+
+    """
+    Conflating FIFO, all tokens to all peers but only the newest queue_length of them
+
+    Writing to a full queue drops the oldest token of the readers holding it back, instead
+    of failing. Tokens a reader has tentatively read (e.g. sent over a tunnel and not yet
+    acked) are never dropped, then the oldest token no reader has read is dropped, and the
+    queue is only full when every token has been read by some reader. Sequence numbers
+    stay continuous, so a tunnel peer sees no gaps and superseded tokens are never sent.
+    """
+
+    # Tunnel endpoints keep one token in flight, so the rest can still be superseded
+    conflating = True
+
+    def __init__(self, port_properties, peer_port_properties):
+        super(FanoutLatestFIFO, self).__init__(port_properties, peer_port_properties)
+        self._type = "fanout_latest_fifo"
+        # Conflating replaces growing
+        self._adaptive = False
+        self.dropped = 0
+
+    def __str__(self):
+        return "%s, dropped:%i" % (super(FanoutLatestFIFO, self).__str__(), self.dropped)
+
+    def _state(self):
+        state = super(FanoutLatestFIFO, self)._state()
+        state['dropped'] = self.dropped
+        return state
+
+    def _set_state(self, state):
+        super(FanoutLatestFIFO, self)._set_state(state)
+        self.dropped = state.get('dropped', 0)
+
+    def _lagging_readers(self):
+        """Readers holding back the oldest token, or None when one of them has read it tentatively"""
+        pos = self._min_read_pos
+        readers = [r for r in self.readers if self.read_pos[r] == pos]
+        if any(self.tentative_read_pos[r] != pos for r in readers):
+            return None
+        return readers
+
+    def _oldest_unread(self):
+        """Position of the oldest token no reader has read, even tentatively, or None"""
+        pos = max(self.tentative_read_pos.values() or [self.write_pos])
+        return pos if pos < self.write_pos else None
+
+    def _drop_oldest(self):
+        readers = self._lagging_readers()
+        if readers:
+            pos = self._min_read_pos + 1
+            for reader in readers:
+                self.tentative_read_pos[reader] = pos
+                # Keep the sequence numbers seen by the reader's peer continuous
+                self.reader_offset[reader] += 1
+                self._set_read_pos(reader, pos)
+        else:
+            # The oldest token is in flight, drop the oldest one nobody has seen instead
+            pos = self._oldest_unread()
+            if pos is None:
+                raise QueueFull()
+            fifo, N = self.fifo, self.N
+            for p in xrange(pos, self.write_pos - 1):
+                fifo[p % N] = fifo[(p + 1) % N]
+            self.write_pos -= 1
+        self.dropped += 1
+
+    def write(self, data, metadata):
+        if (self.write_pos - self._min_read_pos) >= self.N - 1:
+            self._drop_oldest()
+        write_pos = self.write_pos
+        self.fifo[write_pos % self.N] = data
+        self.write_pos = write_pos + 1
+        return True
+
+    def slots_available(self, length, metadata):
+        if (self.N - (self.write_pos - self._min_read_pos) - 1) >= length:
+            return True
+        # Room can be made by dropping tokens not read yet
+        return length <= self.N - 1 and (bool(self._lagging_readers()) or self._oldest_unread() is not None)
+
+    def free_slots(self, metadata):
+        free = self.N - (self.write_pos - self._min_read_pos) - 1
+        # When full, a token not read yet can make room for one more
+        return free if free > 0 else int(self.slots_available(1, metadata))
+
+    def com_write_many(self, tokens, metadata, sequence_nbr):
+        skip = self.write_pos - sequence_nbr
+        if skip < 0 or skip >= len(tokens):
+            # All invalid or all already in queue
+            return len(tokens)
+        count = 0
+        for token in tokens[skip:]:
+            try:
+                self.write(token, metadata)
+            except QueueFull:
+                break
+            count += 1
+        return skip + count
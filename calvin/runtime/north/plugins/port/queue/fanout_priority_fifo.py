@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+from numbers import Number
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty
+from calvin.runtime.north.plugins.port.queue.fanout_fifo import FanoutFIFO
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+
+class FanoutPriorityFIFO(FanoutFIFO):
+
+    """
+    All tokens to all peers, each peer reads its tokens highest priority first
+
+    The priority is found in the token value by the port property priority_key, a dot separated
+    path of dictionary keys and list indexes, e.g. "header.priority". Tokens without a numeric
+    priority get priority 0, tokens with equal priority are read in the order written.
+
+    Positions work as in the FanoutFIFO, a reader's sequence numbers count the tokens it has
+    read, but which token a sequence number refers to is decided when the reader peeks it.
+    Peeked tokens keep their sequence numbers until committed, a cancel (e.g. a NACK on a
+    tunnel) makes the same tokens be read again in the same order.
+    """
+
+    def __init__(self, port_properties, peer_port_properties):
+        super(FanoutPriorityFIFO, self).__init__(port_properties, peer_port_properties)
+        self._type = "fanout_priority_fifo"
+        key = port_properties.get('priority_key', "priority")
+        self.priority_key = [int(k) if k.lstrip('-').isdigit() else k for k in key.split('.')] if key else []
+        # Length is fixed, the tokens are kept in the heaps and not in the fifo ring
+        self._max_N = self.N
+        self._adaptive = False
+        self.fifo = []
+        # Unread tokens per reader as a heap of (-priority, write position, token)
+        self.pending = {}
+        # Tokens per reader that have been read (peeked) but not committed, in sequence order
+        self.peeked = {}
+        # Tokens written while there are no readers, for the first reader
+        self._orphans = []
+
+    def __str__(self):
+        return "Tokens: %s, w:%i, r:%s, tr:%s" % (
+            {r: [str(e[2]) for e in self.peeked[r] + sorted(self.pending[r])] for r in self.readers},
+            self.write_pos, self.read_pos, self.tentative_read_pos)
+
+    def priority(self, token):
+        value = getattr(token, 'value', token)
+        try:
+            for key in self.priority_key:
+                value = value[key]
+        except (KeyError, IndexError, TypeError):
+            return 0
+        if isinstance(value, bool) or not isinstance(value, Number):
+            return 0
+        return value
+
+    def _state(self):
+        state = super(FanoutPriorityFIFO, self)._state()
+        state['pending'] = {r: [[p, pos, t.encode()] for p, pos, t in entries] for r, entries in self.pending.items()}
+        state['peeked'] = {r: [[p, pos, t.encode()] for p, pos, t in entries] for r, entries in self.peeked.items()}
+        state['orphans'] = [[p, pos, t.encode()] for p, pos, t in self._orphans]
+        return state
+
+    def _set_state(self, state):
+        super(FanoutPriorityFIFO, self)._set_state(state)
+        self._max_N = self.N
+        self._adaptive = False
+        self.pending = {r: [(p, pos, Token.decode(t)) for p, pos, t in entries] for r, entries in state['pending'].items()}
+        for entries in self.pending.values():
+            heapq.heapify(entries)
+        self.peeked = {r: [(p, pos, Token.decode(t)) for p, pos, t in entries] for r, entries in state['peeked'].items()}
+        self._orphans = [(p, pos, Token.decode(t)) for p, pos, t in state.get('orphans', [])]
+
+    def add_reader(self, reader, properties):
+        if reader in self.readers:
+            return
+        if self.readers:
+            # A reader starts with the slowest reader's tokens, as a replicated reader does in the FanoutFIFO
+            slowest = min(self.readers, key=lambda r: self.read_pos[r])
+            entries = self.peeked[slowest] + self.pending[slowest]
+            start = self.read_pos[slowest]
+        else:
+            entries = self._orphans
+            start = self.write_pos - len(entries)
+            self._orphans = []
+        super(FanoutPriorityFIFO, self).add_reader(reader, properties)
+        delta = start - self.read_pos[reader]
+        if delta:
+            self.read_pos[reader] += delta
+            self.tentative_read_pos[reader] += delta
+            self.reader_offset[reader] += delta
+            self._reset_min_read_pos()
+        self.pending[reader] = list(entries)
+        heapq.heapify(self.pending[reader])
+        self.peeked[reader] = []
+
+    def remove_reader(self, reader):
+        if reader not in self.readers:
+            return
+        super(FanoutPriorityFIFO, self).remove_reader(reader)
+        del self.pending[reader]
+        del self.peeked[reader]
+
+    def _set_read_pos(self, reader, pos):
+        del self.peeked[reader][:pos - self.read_pos[reader]]
+        super(FanoutPriorityFIFO, self)._set_read_pos(reader, pos)
+
+    def _remaining_tokens(self, peer_id):
+        entries = self.peeked[peer_id] + sorted(self.pending[peer_id])
+        pos = self.read_pos[peer_id]
+        return [[pos + i, e[2]] for i, e in enumerate(entries)]
+
+    def write(self, data, metadata):
+        if not self.slots_available(1, metadata):
+            raise QueueFull()
+        entry = (-self.priority(data), self.write_pos, data)
+        if not self.readers:
+            self._orphans.append(entry)
+        for entries in self.pending.itervalues():
+            heapq.heappush(entries, entry)
+        self.write_pos += 1
+        return True
+
+    def slots_available(self, length, metadata):
+        return self.N - (self.write_pos - self._min_read_pos) - 1 >= length
+
+    def peek(self, metadata):
+        if metadata not in self.readers:
+            raise Exception("Unknown reader: '%s'" % metadata)
+        if not self.tokens_available(1, metadata):
+            raise QueueEmpty(reader=metadata)
+        read_pos = self.tentative_read_pos[metadata]
+        peeked = self.peeked[metadata]
+        index = read_pos - self.read_pos[metadata]
+        if index == len(peeked):
+            peeked.append(heapq.heappop(self.pending[metadata]))
+        self.tentative_read_pos[metadata] = read_pos + 1
+        return peeked[index][2]
+
+    def com_write_many(self, tokens, metadata, sequence_nbr):
+        """ Write tokens with consecutive sequence numbers starting at sequence_nbr
+            return number of tokens dealt with, i.e. written or (as com_write) unhandled or invalid,
+            the remaining tokens did not fit in the queue.
+        """
+        skip = self.write_pos - sequence_nbr
+        if skip < 0 or skip >= len(tokens):
+            # All invalid or all already in queue
+            return len(tokens)
+        count = min(len(tokens) - skip, self.N - (self.write_pos - self._min_read_pos) - 1)
+        for token in tokens[skip:skip + count]:
+            self.write(token, metadata)
+        return skip + count
+
+    def com_peek_many(self, metadata, max_tokens=None):
+        """ Tentatively read up to max_tokens (default all available) tokens
+            return tuple (sequence_nbr of first token, list of tokens)
+        """
+        if metadata not in self.readers:
+            raise Exception("Unknown reader: '%s'" % metadata)
+        pos = self.tentative_read_pos[metadata]
+        count = self.write_pos - pos
+        if max_tokens is not None and max_tokens < count:
+            count = max_tokens
+        return (pos - self.reader_offset[metadata], [self.peek(metadata) for _ in xrange(count)])
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import time
+
+from calvin.runtime.north.plugins.port.queue.common import COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.fanout_balanced_fifo import FanoutBalancedFIFO
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+# Weight of a new sample in the moving averages
+EWMA_ALPHA = 0.2
+
+
+def _ewma(average, sample):
+    return sample if average is None else average + EWMA_ALPHA * (sample - average)
+
+
+class FanoutRateBalancedFIFO(FanoutBalancedFIFO):
+
+    """
+    A queue which routes each token to the peer expected to be done with it first
+
+    For each reader the time per token (between commits while it had tokens queued) and,
+    for readers behind a tunnel, the ACK latency (from sending a token to its commit) are
+    tracked as moving averages. The expected completion time of one more token is
+    (queued + 1) * time per token + ACK latency. Readers without measurements yet cost
+    nothing, so new and replicated peers get tokens and are measured.
+    """
+
+    def __init__(self, port_properties, peer_port_properties):
+        super(FanoutRateBalancedFIFO, self).__init__(port_properties, peer_port_properties)
+        self._type = "dispatch:balanced-rate"
+
+    def _reset_heap(self):
+        # Measurements are not part of the state, a migrated queue measures again
+        self.token_time = {}
+        self.ack_latency = {}
+        self._last_commit = {}
+        self._sent = {}
+        super(FanoutRateBalancedFIFO, self)._reset_heap()
+
+    def _cost(self, reader):
+        token_time = self.token_time.get(reader) or 0.0
+        queued = self.write_pos[reader] - self.read_pos[reader]
+        return (queued + 1) * token_time + (self.ack_latency.get(reader) or 0.0)
+
+    def _committed(self, reader, count):
+        now = time.time()
+        last = self._last_commit.get(reader)
+        if last is not None:
+            # Only busy periods tell how fast the reader is
+            self.token_time[reader] = _ewma(self.token_time.get(reader), (now - last) / count)
+        queued = self.write_pos[reader] - self.read_pos[reader]
+        self._last_commit[reader] = now if queued else None
+        super(FanoutRateBalancedFIFO, self)._committed(reader, count)
+
+    def _written(self, reader):
+        if self.write_pos[reader] - self.read_pos[reader] == 1:
+            # The token starts a busy period for an idle reader
+            self._last_commit[reader] = time.time()
+        super(FanoutRateBalancedFIFO, self)._written(reader)
+
+    def remove_reader(self, reader):
+        for measurements in (self.token_time, self.ack_latency, self._last_commit, self._sent):
+            measurements.pop(reader, None)
+        return super(FanoutRateBalancedFIFO, self).remove_reader(reader)
+
+    #
+    # ACK latency of tokens sent over a tunnel
+    #
+    def com_peek(self, metadata):
+        r = super(FanoutRateBalancedFIFO, self).com_peek(metadata)
+        self._sent.setdefault(metadata, {})[r[0]] = time.time()
+        return r
+
+    def com_peek_many(self, metadata, max_tokens=None):
+        r = super(FanoutRateBalancedFIFO, self).com_peek_many(metadata, max_tokens)
+        sent = self._sent.setdefault(metadata, {})
+        now = time.time()
+        for sequence_nbr in xrange(r[0], r[0] + len(r[1])):
+            sent[sequence_nbr] = now
+        return r
+
+    def _acked(self, reader, sequence_nbr):
+        sent = self._sent.get(reader, {})
+        sent_at = sent.get(sequence_nbr)
+        for n in [n for n in sent if n <= sequence_nbr]:
+            del sent[n]
+        if sent_at is not None:
+            self.ack_latency[reader] = _ewma(self.ack_latency.get(reader), time.time() - sent_at)
+
+    def com_commit(self, reader, sequence_nbr):
+        if self.read_pos[reader] == sequence_nbr < self.tentative_read_pos[reader]:
+            self._acked(reader, sequence_nbr)
+        return super(FanoutRateBalancedFIFO, self).com_commit(reader, sequence_nbr)
+
+    def com_commit_upto(self, reader, sequence_nbr):
+        if self.read_pos[reader] <= sequence_nbr < self.tentative_read_pos[reader]:
+            self._acked(reader, sequence_nbr)
+        return super(FanoutRateBalancedFIFO, self).com_commit_upto(reader, sequence_nbr)
+
+    def com_cancel(self, reader, sequence_nbr):
+        r = super(FanoutRateBalancedFIFO, self).com_cancel(reader, sequence_nbr)
+        if r == COMMIT_RESPONSE.handled:
+            sent = self._sent.get(reader, {})
+            for n in [n for n in sent if n >= sequence_nbr]:
+                del sent[n]
+        return r
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import cPickle
+import struct
+import tempfile
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue.fanout_fifo import FanoutFIFO
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+# Length of a record in the spill file
+_RECORD_LENGTH = struct.Struct(">I")
+
+
+class FanoutSpillFIFO(FanoutFIFO):
+
+    """
+    FIFO, all tokens to all peers, which spills tokens that do not fit in memory to disk
+
+    The in-memory ring (queue_length) holds the oldest tokens and is what readers see.
+    Later tokens, up to spill_length, are appended to a temporary file and moved into the
+    ring in order as readers commit. Sequence numbers continue over both parts, so tunnel
+    and exhaust handling are the same as for the fanout_fifo.
+    """
+
+    def __init__(self, port_properties, peer_port_properties):
+        super(FanoutSpillFIFO, self).__init__(port_properties, peer_port_properties)
+        self._type = "fanout_spill_fifo"
+        # The ring has a fixed length, overflow goes to disk
+        self._adaptive = False
+        self.spill_length = port_properties.get('spill_length', 100000)
+        # Tokens in the spill file, they follow the ring i.e. have positions from write_pos
+        self.spilled = 0
+        self._spill_file = None
+        self._spill_read_offset = 0
+
+    def __str__(self):
+        return "%s, spilled:%i" % (super(FanoutSpillFIFO, self).__str__(), self.spilled)
+
+    def _state(self):
+        state = super(FanoutSpillFIFO, self)._state()
+        state['spill_length'] = self.spill_length
+        state['spilled'] = [t.encode() for t in self._read_spilled(self.spilled, consume=False)]
+        return state
+
+    def _set_state(self, state):
+        super(FanoutSpillFIFO, self)._set_state(state)
+        self.spill_length = state.get('spill_length', self.spill_length)
+        self._truncate_spill()
+        self._append_spilled([Token.decode(d) for d in state.get('spilled', [])])
+
+    #
+    # Spill file, one pickled compact encoded token per record prefixed by its length,
+    # i.e. binary data and str values are kept as they are
+    #
+    def _append_spilled(self, tokens):
+        if not tokens:
+            return
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="calvin-spill-")
+        self._spill_file.seek(0, 2)
+        records = []
+        for token in tokens:
+            record = cPickle.dumps(token.encode(compact=True), cPickle.HIGHEST_PROTOCOL)
+            records.append(_RECORD_LENGTH.pack(len(record)))
+            records.append(record)
+        self._spill_file.write("".join(records))
+        self.spilled += len(tokens)
+
+    def _read_record(self):
+        length, = _RECORD_LENGTH.unpack(self._spill_file.read(_RECORD_LENGTH.size))
+        return cPickle.loads(self._spill_file.read(length))
+
+    def _read_spilled(self, count, consume=True):
+        if not count:
+            return []
+        self._spill_file.seek(self._spill_read_offset)
+        tokens = [Token.decode(self._read_record()) for _ in xrange(count)]
+        if consume:
+            self._spill_read_offset = self._spill_file.tell()
+            self.spilled -= count
+            if not self.spilled:
+                self._truncate_spill()
+        return tokens
+
+    def _truncate_spill(self):
+        self.spilled = 0
+        self._spill_read_offset = 0
+        if self._spill_file is not None:
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+
+    def _refill(self):
+        """Move spilled tokens into the free part of the ring"""
+        count = min(self.spilled, self.N - (self.write_pos - self._min_read_pos) - 1)
+        write_pos = self.write_pos
+        for token in self._read_spilled(count):
+            self.fifo[write_pos % self.N] = token
+            write_pos += 1
+        self.write_pos = write_pos
+
+    def _set_read_pos(self, reader, pos):
+        super(FanoutSpillFIFO, self)._set_read_pos(reader, pos)
+        if self.spilled:
+            self._refill()
+
+    def _remaining_tokens(self, peer_id):
+        tokens = super(FanoutSpillFIFO, self)._remaining_tokens(peer_id)
+        spilled = self._read_spilled(self.spilled, consume=False)
+        tokens.extend([self.write_pos + i, token] for i, token in enumerate(spilled))
+        return tokens
+
+    def write(self, data, metadata):
+        write_pos = self.write_pos
+        if not self.spilled and (write_pos - self._min_read_pos) < self.N - 1:
+            self.fifo[write_pos % self.N] = data
+            self.write_pos = write_pos + 1
+        elif self.spilled < self.spill_length:
+            self._append_spilled([data])
+        else:
+            raise QueueFull()
+        return True
+
+    def slots_available(self, length, metadata):
+        free = self.N - (self.write_pos - self._min_read_pos) - 1
+        return free + self.spill_length - self.spilled >= length
+
+    def free_slots(self, metadata):
+        return self.N - (self.write_pos - self._min_read_pos) - 1 + self.spill_length - self.spilled
+
+    #
+    # Sequence numbers continue into the spilled tokens
+    #
+    def com_write_pos(self, metadata):
+        return self.write_pos + self.spilled
+
+    def com_write(self, data, metadata, sequence_nbr):
+        write_pos = self.write_pos + self.spilled
+        if sequence_nbr == write_pos:
+            self.write(data, metadata)
+            return COMMIT_RESPONSE.handled
+        elif sequence_nbr < write_pos:
+            return COMMIT_RESPONSE.unhandled
+        else:
+            return COMMIT_RESPONSE.invalid
+
+    def com_write_many(self, tokens, metadata, sequence_nbr):
+        skip = self.write_pos + self.spilled - sequence_nbr
+        if skip < 0 or skip >= len(tokens):
+            # All invalid or all already in queue
+            return len(tokens)
+        count = 0
+        for token in tokens[skip:]:
+            if not self.slots_available(1, metadata):
+                break
+            self.write(token, metadata)
+            count += 1
+        return skip + count
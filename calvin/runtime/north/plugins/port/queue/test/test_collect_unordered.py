@@ -89,6 +89,14 @@ class TestCollectUnorderedFIFO(unittest.TestCase):
             for i in range(10):
                 self.inport.write("fillme", "writer-1")
     
+    def testComWriteMany(self):
+        self.setup_writers(2)
+        self.assertEqual(self.inport.com_write_many([1, 2, 3], "writer-1", 0), 3)
+        # Already written tokens are skipped, only one slot left
+        self.assertEqual(self.inport.com_write_many([2, 3, 4, 5], "writer-1", 1), 3)
+        self.assertEqual(self.inport.fifo["writer-1"][:4], [1, 2, 3, 4])
+        self.assertEqual(self.inport.write_pos, {"writer-1": 4, "writer-2": 0})
+
     def testTokensAvailable_Normal(self):
         self.setup_writers(5)
         self.inport.write(Token("data-1"), "writer-1")
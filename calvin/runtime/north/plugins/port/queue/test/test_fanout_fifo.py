@@ -5,7 +5,8 @@ pytest_unittest = pytest.mark.unittest
 
 from calvin.runtime.north.calvin_token import Token
 from calvin.runtime.north.plugins.port import queue, DISCONNECT
-from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE
+from calvin.runtime.north.plugins.port.queue import common
 
 class DummyPort(object):
     pass
@@ -155,6 +156,67 @@ class TestFanoutFIFO(unittest.TestCase):
         self.outport.commit("reader-2")
         self.assertEqual(d_1, d_2)
 
+    def testSlotsAvailable_SlowestReader(self):
+        for i in [1,2,3]:
+            self.outport.add_reader("reader-%d" % i, {})
+        for i in range(4):
+            self.outport.write("data-%d" % i, None)
+        self.assertFalse(self.outport.slots_available(1, None))
+        # Slots are freed only when the slowest reader commits
+        for reader, count in [("reader-1", 3), ("reader-2", 1), ("reader-3", 4)]:
+            for _ in range(count):
+                self.outport.peek(reader)
+            self.outport.commit(reader)
+        self.assertTrue(self.outport.slots_available(1, None))
+        self.assertFalse(self.outport.slots_available(2, None))
+        for _ in range(2):
+            self.outport.peek("reader-2")
+        self.outport.commit("reader-2")
+        self.assertTrue(self.outport.slots_available(3, None))
+        self.assertFalse(self.outport.slots_available(4, None))
+        self.outport.remove_reader("reader-1")
+        self.assertFalse(self.outport.slots_available(4, None))
+        self.outport.remove_reader("reader-2")
+        self.assertTrue(self.outport.slots_available(4, None))
+
+    def testComBulk(self):
+        self.outport.add_reader("reader", {})
+        for i in range(3):
+            self.outport.write("data-%d" % i, None)
+        nbr, tokens = self.outport.com_peek_many("reader", 2)
+        self.assertEqual((nbr, tokens), (0, ["data-0", "data-1"]))
+        nbr, tokens = self.outport.com_peek_many("reader")
+        self.assertEqual((nbr, tokens), (2, ["data-2"]))
+        self.assertEqual(self.outport.com_peek_many("reader"), (3, []))
+        self.assertEqual(self.outport.com_commit_upto("reader", 3), COMMIT_RESPONSE.invalid)
+        self.assertEqual(self.outport.com_commit_upto("reader", 1), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.outport.com_commit_upto("reader", 0), COMMIT_RESPONSE.unhandled)
+        self.assertTrue(self.outport.slots_available(3, None))
+        self.assertFalse(self.outport.slots_available(4, None))
+
+        inport = self.create_port()
+        inport.add_reader("reader", {})
+        # All fit, first is already in queue
+        inport.write("data-0", None)
+        self.assertEqual(inport.com_write_many(["data-0", "data-1"], "writer", 0), 2)
+        # Only two slots left
+        self.assertEqual(inport.com_write_many(["data-2", "data-3", "data-4"], "writer", 2), 2)
+        self.assertEqual(inport.com_write_many(["data-4"], "writer", 4), 0)
+        self.assertEqual([inport.peek("reader") for _ in range(4)], ["data-%d" % i for i in range(4)])
+
+    def testComCancel(self):
+        self.outport.add_reader("reader", {})
+        for i in range(3):
+            self.outport.write("data-%d" % i, None)
+        for i in range(3):
+            self.outport.com_peek("reader")
+        self.assertEqual(self.outport.com_commit("reader", 0), COMMIT_RESPONSE.handled)
+        # Already committed or not sent
+        self.assertEqual(self.outport.com_cancel("reader", 0), COMMIT_RESPONSE.invalid)
+        self.assertEqual(self.outport.com_cancel("reader", 3), COMMIT_RESPONSE.invalid)
+        self.assertEqual(self.outport.com_cancel("reader", 1), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.outport.com_peek("reader"), (1, "data-1"))
+
     def testSerialize(self):
         self.outport.add_reader("reader-1", {})
         self.outport.add_reader("reader-2", {})
@@ -219,4 +281,92 @@ class TestFanoutFIFO(unittest.TestCase):
         # terminate reason not applicable
         exhausted_tokens = self.outport.exhaust("reader-1", DISCONNECT.EXHAUST_INPORT)
         self.assertEqual(exhausted_tokens, [])
-                
\ No newline at end of file
+                
+
+@pytest_unittest
+class TestAdaptiveFanoutFIFO(unittest.TestCase):
+
+    def setUp(self):
+        self.budget = common._queue_budget
+        common._queue_budget = common.QueueBudget(64)
+        port = DummyPort()
+        port.properties = {'routing': "default", 'direction': "out", 'nbr_peers': 1, 'queue_length': 4, 'queue_length_max': 32}
+        self.queue = queue.get(port)
+        self.queue.add_reader("reader", {})
+
+    def tearDown(self):
+        common._queue_budget = self.budget
+
+    def write(self, n):
+        for i in range(n):
+            self.queue.write("data-%d" % i, None)
+
+    def read(self, n):
+        tokens = [self.queue.peek("reader") for _ in range(n)]
+        self.queue.commit("reader")
+        return tokens
+
+    def testGrowsWhenFull(self):
+        self.write(4)
+        self.queue.peek("reader")
+        self.queue.commit("reader")
+        # Positions wrap around when the tokens are moved to the longer queue
+        self.write(5)
+        self.assertEqual(self.queue.N, 9)
+        self.write(7)
+        self.assertEqual(self.queue.N, 17)
+        self.assertEqual(self.read(15), ["data-%d" % i for i in range(1, 4) + range(5) + range(7)])
+        self.assertEqual(self.queue.queue_type, "fanout_fifo")
+
+    def testMaxLength(self):
+        self.write(32)
+        self.assertEqual(self.queue.N, 33)
+        self.assertFalse(self.queue.slots_available(1, None))
+        with self.assertRaises(QueueFull):
+            self.queue.write("data", None)
+
+    def testShrinksWhenIdle(self):
+        self.write(16)
+        self.read(16)
+        # Queue was full when emptied, keeps its length
+        self.assertEqual(self.queue.N, 17)
+        self.write(2)
+        self.read(2)
+        self.assertEqual(self.queue.N, 9)
+        self.write(1)
+        self.read(1)
+        self.assertEqual(self.queue.N, 5)
+        self.assertEqual(common.get_queue_budget().used(), 0)
+
+    def testBudget(self):
+        common._queue_budget = common.QueueBudget(4)
+        self.write(8)
+        self.assertEqual(self.queue.N, 9)
+        self.assertFalse(self.queue.slots_available(1, None))
+        # A discarded queue gives back its slots
+        self.queue = None
+        self.assertEqual(common.get_queue_budget().used(), 0)
+
+    def testFreeSlots(self):
+        self.write(3)
+        self.assertEqual(self.queue.free_slots(None), 1)
+        self.write(1)
+        # A full queue grows to have free slots to tell a tunnel peer
+        self.assertEqual(self.queue.free_slots(None), 4)
+        self.assertEqual(self.queue.N, 9)
+
+    def testComWriteMany(self):
+        self.assertEqual(self.queue.com_write_many(["data-%d" % i for i in range(40)], None, 0), 32)
+        self.assertEqual(self.queue.N, 33)
+
+    def testSerialize(self):
+        for i in range(6):
+            self.queue.write(Token(i), None)
+        state = self.queue._state()
+        port = DummyPort()
+        port.properties = {'routing': "default", 'direction': "out", 'nbr_peers': 1, 'queue_length': 4}
+        queue_ = queue.get(port)
+        queue_._set_state(state)
+        self.assertEqual(queue_.N, 9)
+        self.assertEqual(common.get_queue_budget().used(), 8)
+        self.assertEqual([queue_.peek("reader").value for _ in range(6)], range(6))
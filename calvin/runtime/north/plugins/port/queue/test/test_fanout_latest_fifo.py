@@ -0,0 +1,95 @@
+import unittest
+import pytest
+
+pytest_unittest = pytest.mark.unittest
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port import queue
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
+
+from calvin.runtime.north.plugins.port.queue.test.test_fanout_fifo import DummyPort
+
+
+@pytest_unittest
+class TestFanoutLatestFIFO(unittest.TestCase):
+
+    def setUp(self):
+        port = DummyPort()
+        port.properties = {'routing': "latest", "direction": "out", 'nbr_peers': 2, 'queue_length': 2}
+        self.outport = queue.get(port)
+        for i in [1, 2]:
+            self.outport.add_reader("reader-%d" % i, {})
+
+    def write(self, values):
+        for i in values:
+            self.outport.write(Token(i), None)
+
+    def read(self, reader, n):
+        values = [self.outport.peek(reader).value for _ in range(n)]
+        self.outport.commit(reader)
+        return values
+
+    def testType(self):
+        self.assertEqual(self.outport.queue_type, "fanout_latest_fifo")
+
+    def testKeepsNewest(self):
+        self.write(range(5))
+        self.assertTrue(self.outport.slots_available(2, None))
+        self.assertFalse(self.outport.slots_available(3, None))
+        self.assertEqual(self.read("reader-1", 2), [3, 4])
+        self.assertEqual(self.outport.dropped, 3)
+        self.write([5])
+        # Only reader-2 held back token 3
+        self.assertEqual(self.outport.dropped, 4)
+        self.assertEqual(self.read("reader-1", 1), [5])
+        self.assertEqual(self.read("reader-2", 2), [4, 5])
+
+    def testTentativeReadNotDropped(self):
+        self.write(range(2))
+        self.outport.com_peek("reader-1")
+        self.read("reader-2", 2)
+        self.assertFalse(self.outport.slots_available(1, None))
+        with self.assertRaises(QueueFull):
+            self.write([2])
+        self.assertEqual(self.outport.com_commit("reader-1", 0), COMMIT_RESPONSE.handled)
+        # Token 1 not yet sent is dropped
+        self.write([2])
+        self.write([3])
+        self.assertEqual(self.outport.dropped, 1)
+        self.assertEqual(self.outport.com_peek("reader-1")[1].value, 2)
+
+    def testSequenceNumbers(self):
+        # Peers see continuous sequence numbers whatever was dropped
+        self.write(range(4))
+        seq = [self.outport.com_peek("reader-1")[0] for _ in range(2)]
+        self.assertEqual(seq, [0, 1])
+        self.assertEqual(self.outport.com_commit("reader-1", 0), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.outport.com_commit("reader-1", 1), COMMIT_RESPONSE.handled)
+        self.write(range(4, 8))
+        sequence_nbr, token = self.outport.com_peek("reader-1")
+        self.assertEqual((sequence_nbr, token.value), (2, 6))
+
+    def testInFlightNotDropped(self):
+        self.write(range(2))
+        self.outport.com_peek("reader-1")
+        self.outport.com_peek("reader-2")
+        # Token 0 is in flight to both, token 1 is superseded
+        self.write([2])
+        self.assertEqual(self.outport.dropped, 1)
+        self.assertEqual(self.outport.com_commit("reader-1", 0), COMMIT_RESPONSE.handled)
+        sequence_nbr, token = self.outport.com_peek("reader-1")
+        self.assertEqual((sequence_nbr, token.value), (1, 2))
+
+    def testComWriteMany(self):
+        self.assertEqual(self.outport.com_write_many([Token(i) for i in range(5)], None, 0), 5)
+        self.assertEqual(self.outport.com_write(Token(5), None, 5), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.read("reader-1", 2), [4, 5])
+
+    def testSerialize(self):
+        self.write(range(4))
+        state = self.outport._state()
+        self.assertEqual(state['dropped'], 2)
+        self.setUp()
+        self.outport._set_state(state)
+        self.assertEqual(self.outport.dropped, 2)
+        self.assertEqual(self.read("reader-2", 2), [2, 3])
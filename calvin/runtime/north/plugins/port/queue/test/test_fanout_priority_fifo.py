@@ -0,0 +1,148 @@
+import unittest
+import pytest
+
+pytest_unittest = pytest.mark.unittest
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port import queue, DISCONNECT
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
+
+from calvin.runtime.north.plugins.port.queue.test.test_fanout_fifo import TestFanoutFIFO, DummyPort
+
+
+@pytest_unittest
+class TestFanoutPriorityFIFO(TestFanoutFIFO):
+
+    # Tokens without priority are read in the order written
+    routing = "priority"
+    queue_type = "fanout_priority_fifo"
+
+    def testWrite_Normal(self):
+        # Tokens are kept per reader, not in the fifo ring
+        self.outport.write("data-1", None)
+        self.outport.write("data-2", None)
+        self.outport.add_reader("reader", {})
+        self.assertEqual([self.outport.peek("reader") for _ in range(2)], ["data-1", "data-2"])
+
+
+@pytest_unittest
+class TestFanoutPriorityFIFOOrdering(unittest.TestCase):
+
+    def setUp(self):
+        port = DummyPort()
+        port.properties = {'routing': "priority", "direction": "out", 'nbr_peers': 2, 'queue_length': 4,
+                           'priority_key': "header.level"}
+        self.outport = queue.get(port)
+        for i in [1, 2]:
+            self.outport.add_reader("reader-%d" % i, {})
+
+    def token(self, value, level=None):
+        header = {} if level is None else {'level': level}
+        return Token({'header': header, 'value': value})
+
+    def write(self, tokens):
+        for token in tokens:
+            self.outport.write(token, None)
+
+    def read(self, reader, n):
+        values = [self.outport.peek(reader).value['value'] for _ in range(n)]
+        self.outport.commit(reader)
+        return values
+
+    def testPriority(self):
+        self.write([self.token("bulk-1"), self.token("alarm", 10), self.token("bulk-2"), self.token("control", 5)])
+        self.assertEqual(self.read("reader-1", 4), ["alarm", "control", "bulk-1", "bulk-2"])
+        self.assertEqual(self.read("reader-2", 1), ["alarm"])
+        self.write([self.token("alarm-2", 10)])
+        self.assertEqual(self.read("reader-2", 2), ["alarm-2", "control"])
+
+    def testPriorityKey(self):
+        self.assertEqual(self.outport.priority(self.token("x", 3)), 3)
+        self.assertEqual(self.outport.priority(self.token("x", -1.5)), -1.5)
+        self.assertEqual(self.outport.priority(self.token("x")), 0)
+        self.assertEqual(self.outport.priority(self.token("x", "high")), 0)
+        self.assertEqual(self.outport.priority(self.token("x", True)), 0)
+        self.assertEqual(self.outport.priority(Token(7)), 0)
+        port = DummyPort()
+        port.properties = {'routing': "priority", 'priority_key': "1.0"}
+        self.assertEqual(queue.get(port).priority(Token(["a", [4]])), 4)
+
+    def testQueueFull(self):
+        self.write([self.token(i) for i in range(4)])
+        self.assertFalse(self.outport.slots_available(1, None))
+        with self.assertRaises(QueueFull):
+            self.write([self.token("alarm", 10)])
+        self.read("reader-1", 1)
+        self.assertFalse(self.outport.slots_available(1, None))
+        self.read("reader-2", 1)
+        self.write([self.token("alarm", 10)])
+
+    def testRetransmitKeepsSequence(self):
+        self.write([self.token("bulk-1"), self.token("bulk-2")])
+        self.assertEqual(self.outport.com_peek("reader-1")[0], 0)
+        self.assertEqual(self.outport.com_peek("reader-1")[0], 1)
+        # An alarm arriving while tokens are in flight is not given their sequence numbers
+        self.write([self.token("alarm", 10)])
+        self.assertEqual(self.outport.com_cancel("reader-1", 0), COMMIT_RESPONSE.handled)
+        resent = [self.outport.com_peek("reader-1") for _ in range(3)]
+        self.assertEqual([(s, t.value['value']) for s, t in resent], [(0, "bulk-1"), (1, "bulk-2"), (2, "alarm")])
+        self.assertEqual(self.outport.com_commit("reader-1", 1), COMMIT_RESPONSE.unhandled)
+        self.assertEqual(self.outport.com_commit("reader-1", 0), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.outport.com_commit("reader-1", 0), COMMIT_RESPONSE.unhandled)
+        self.assertEqual(self.outport.com_commit_upto("reader-1", 2), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.outport.com_commit("reader-1", 3), COMMIT_RESPONSE.invalid)
+        self.assertTrue(self.outport.com_is_committed("reader-1"))
+
+    def testComPeekMany(self):
+        self.write([self.token("bulk"), self.token("alarm", 10), self.token("control", 5)])
+        sequence_nbr, tokens = self.outport.com_peek_many("reader-1", 2)
+        self.assertEqual((sequence_nbr, [t.value['value'] for t in tokens]), (0, ["alarm", "control"]))
+        self.outport.com_cancel("reader-1", 1)
+        sequence_nbr, tokens = self.outport.com_peek_many("reader-1")
+        self.assertEqual((sequence_nbr, [t.value['value'] for t in tokens]), (1, ["control", "bulk"]))
+
+    def testComWrite(self):
+        # As an inport, sequence numbers are the writer's
+        port = DummyPort()
+        port.properties = {'routing': "priority", "direction": "in", 'queue_length': 4, 'priority_key': "header.level"}
+        inport = queue.get(port)
+        inport.add_reader("reader", {})
+        self.assertEqual(inport.com_write(self.token("bulk"), "writer", 0), COMMIT_RESPONSE.handled)
+        self.assertEqual(inport.com_write(self.token("bulk"), "writer", 0), COMMIT_RESPONSE.unhandled)
+        self.assertEqual(inport.com_write(self.token("alarm", 1), "writer", 2), COMMIT_RESPONSE.invalid)
+        self.assertEqual(inport.com_write_many([self.token("bulk"), self.token("alarm", 1), self.token("c", 2)],
+                                               "writer", 0), 3)
+        self.assertEqual([inport.peek("reader").value['value'] for _ in range(3)], ["c", "alarm", "bulk"])
+
+    def testExhaust(self):
+        self.write([self.token("bulk"), self.token("alarm", 10), self.token("control", 5)])
+        self.outport.peek("reader-1")
+        self.outport.commit("reader-1")
+        self.outport.peek("reader-1")
+        tokens = self.outport.exhaust("reader-1", DISCONNECT.EXHAUST_PEER_SEND)
+        self.assertEqual([(s, t.value['value']) for s, t in tokens], [(1, "control"), (2, "bulk")])
+        self.assertNotIn("reader-1", self.outport.readers)
+
+    def testAddReader_Replication(self):
+        self.write([self.token("bulk"), self.token("alarm", 10)])
+        self.read("reader-1", 1)
+        self.outport.add_reader("reader-3", {})
+        self.assertEqual(self.read("reader-3", 2), ["alarm", "bulk"])
+
+    def testSerialize(self):
+        self.write([self.token("bulk"), self.token("alarm", 10), self.token("control", 5)])
+        self.outport.peek("reader-1")
+        self.outport.peek("reader-1")
+        self.outport.commit("reader-1")
+        self.outport.peek("reader-1")
+        state = self.outport._state()
+        port = DummyPort()
+        port.properties = {'routing': "priority", "direction": "out", 'nbr_peers': 2, 'queue_length': 4,
+                           'priority_key': "header.level"}
+        outport = queue.get(port)
+        outport._set_state(state)
+        outport.cancel("reader-1")
+        self.assertEqual([outport.peek("reader-1").value['value'] for _ in range(1)], ["bulk"])
+        outport.write(self.token("alarm-2", 20), None)
+        self.assertEqual([outport.peek("reader-2").value['value'] for _ in range(4)],
+                         ["alarm-2", "alarm", "control", "bulk"])
@@ -0,0 +1,76 @@
+import pytest
+
+pytest_unittest = pytest.mark.unittest
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port.queue import fanout_rate_balanced_fifo
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
+
+from calvin.runtime.north.plugins.port.queue.test.test_fanout_balanced_fifo import TestFanoutBalancedFIFO
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self):
+        return self.now
+
+
+@pytest_unittest
+class TestFanoutRateBalancedFIFO(TestFanoutBalancedFIFO):
+
+    routing = "balanced-rate"
+    queue_type = "dispatch:balanced-rate"
+    num_peers = 3
+
+    def setUp(self):
+        self.clock = Clock()
+        self.time = fanout_rate_balanced_fifo.time
+        fanout_rate_balanced_fifo.time = self.clock
+        super(TestFanoutRateBalancedFIFO, self).setUp()
+
+    def tearDown(self):
+        fanout_rate_balanced_fifo.time = self.time
+
+    def consume(self, reader, seconds):
+        self.clock.now += seconds
+        self.outport.peek(reader)
+        self.outport.commit(reader)
+
+    def testRoutesToFastReader(self):
+        for i in range(3):
+            self.outport.write(Token(i), None)
+        # reader-1 takes 1 s per token, reader-2 0.1 s and reader-3 0.5 s
+        for reader, seconds in [("reader-2", 0.1), ("reader-3", 0.4), ("reader-1", 0.5)]:
+            self.consume(reader, seconds)
+        self.assertEqual(self.outport.token_time, {"reader-1": 1.0, "reader-2": 0.1, "reader-3": 0.5})
+        # Four more tokens to reader-2 are expected done before one more to reader-3
+        for i in range(6):
+            self.outport.write(Token(i), None)
+        queued = [self.outport.write_pos[r] - self.outport.read_pos[r] for r in ["reader-1", "reader-2", "reader-3"]]
+        self.assertEqual(queued, [1, 4, 1])
+
+    def testAckLatency(self):
+        self.outport.write(Token(0), None)
+        reader = next(r for r in self.outport.readers if self.outport.tokens_available(1, r))
+        sequence_nbr, _ = self.outport.com_peek(reader)
+        self.clock.now += 2.0
+        self.assertEqual(self.outport.com_commit(reader, sequence_nbr), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.outport.ack_latency, {reader: 2.0})
+        # A slow link makes the reader expensive
+        for i in range(2):
+            self.outport.write(Token(i), None)
+        self.assertEqual(self.outport.write_pos[reader], 1)
+
+    def testFull(self):
+        for i in range(12):
+            self.outport.write(Token(i), None)
+        self.assertFalse(self.outport.slots_available(1, None))
+        with self.assertRaises(QueueFull):
+            self.outport.write(Token(12), None)
+        self.consume("reader-2", 1.0)
+        self.assertTrue(self.outport.slots_available(1, None))
+        self.outport.write(Token(12), None)
+        self.assertEqual(self.outport.write_pos["reader-2"], 5)
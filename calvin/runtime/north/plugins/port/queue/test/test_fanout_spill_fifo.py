@@ -0,0 +1,112 @@
+import unittest
+import pytest
+
+pytest_unittest = pytest.mark.unittest
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port import queue, DISCONNECT
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, COMMIT_RESPONSE
+
+from calvin.runtime.north.plugins.port.queue.test.test_fanout_fifo import TestFanoutFIFO, DummyPort
+
+
+@pytest_unittest
+class TestFanoutSpillFIFO(TestFanoutFIFO):
+
+    routing = "spill"
+    queue_type = "fanout_spill_fifo"
+    # Without spilling it is a fanout_fifo
+    spill_length = 0
+
+    def create_port(self):
+        port = DummyPort()
+        port.properties = {'routing': self.routing, "direction": self.direction,
+                           'nbr_peers': self.num_peers, 'spill_length': self.spill_length}
+        return queue.get(port)
+
+
+@pytest_unittest
+class TestFanoutSpillFIFOSpilling(unittest.TestCase):
+
+    def setUp(self):
+        port = DummyPort()
+        port.properties = {'routing': "spill", "direction": "out", 'nbr_peers': 2, 'spill_length': 6}
+        self.outport = queue.get(port)
+        for i in [1, 2]:
+            self.outport.add_reader("reader-%d" % i, {})
+
+    def write(self, values):
+        for i in values:
+            self.outport.write(Token(i), None)
+
+    def read(self, reader, n):
+        values = [self.outport.peek(reader).value for _ in range(n)]
+        self.outport.commit(reader)
+        return values
+
+    def testSerialize(self):
+        self.write(range(8))
+        self.read("reader-1", 2)
+        state = self.outport._state()
+        self.assertEqual(len(state['spilled']), 4)
+        self.setUp()
+        self.outport._set_state(state)
+        self.assertEqual(self.read("reader-1", 2), range(2, 4))
+        self.assertEqual(self.read("reader-2", 4), range(4))
+        self.assertEqual(self.read("reader-1", 4), range(4, 8))
+
+    def testSpill(self):
+        self.write(range(10))
+        self.assertEqual(self.outport.spilled, 6)
+        self.assertFalse(self.outport.slots_available(1, None))
+        with self.assertRaises(QueueFull):
+            self.outport.write(Token(10), None)
+        # Readers only see the ring
+        self.assertFalse(self.outport.tokens_available(5, "reader-1"))
+        self.assertEqual(self.read("reader-1", 4), range(4))
+        self.assertEqual(self.read("reader-2", 2), range(2))
+        # The slowest reader's commit moves spilled tokens into the ring
+        self.assertEqual(self.outport.spilled, 4)
+        self.assertEqual(self.read("reader-1", 2), range(4, 6))
+        self.assertEqual(self.read("reader-2", 4), range(2, 6))
+        self.assertEqual(self.read("reader-1", 4), range(6, 10))
+        self.assertEqual(self.read("reader-2", 4), range(6, 10))
+        self.assertEqual(self.outport.spilled, 0)
+        # Spill file is reused
+        self.write(range(10, 20))
+        self.assertEqual(self.read("reader-1", 4), range(10, 14))
+        self.assertEqual(self.read("reader-2", 4), range(10, 14))
+        self.assertEqual(self.read("reader-1", 4), range(14, 18))
+
+    def testComWrite(self):
+        for i in range(10):
+            self.assertEqual(self.outport.com_write(Token(i), None, i), COMMIT_RESPONSE.handled)
+        self.assertEqual(self.outport.com_write(Token(5), None, 5), COMMIT_RESPONSE.unhandled)
+        self.assertEqual(self.outport.com_write(Token(11), None, 11), COMMIT_RESPONSE.invalid)
+        self.read("reader-1", 4)
+        self.read("reader-2", 4)
+        self.assertEqual(self.outport.com_write_many([Token(i) for i in range(8, 16)], None, 8), 6)
+        self.assertEqual(self.read("reader-1", 4), range(4, 8))
+        sequence_nbr, token = self.outport.com_peek("reader-2")
+        self.assertEqual((sequence_nbr, token.value), (4, 4))
+
+    def testExhaust_Spilled(self):
+        self.write(range(8))
+        self.read("reader-1", 4)
+        self.read("reader-2", 1)
+        tokens = self.outport.exhaust("reader-1", DISCONNECT.EXHAUST_OUTPORT)
+        self.assertEqual([(pos, t.value) for pos, t in tokens], [(i, i) for i in range(4, 8)])
+        self.assertEqual(self.read("reader-2", 3), range(1, 4))
+        self.assertEqual(self.read("reader-2", 4), range(4, 8))
+
+    def testSpillBinary(self):
+        values = ["\xff\x00", "text", u"unicode", 4, {'data': "\x80"}]
+        self.write(values * 2)
+        self.assertEqual(self.outport.spilled, 6)
+        read = {"reader-1": [], "reader-2": []}
+        for n in [4, 4, 2]:
+            for reader in read:
+                read[reader].extend(self.read(reader, n))
+        for values_read in read.values():
+            self.assertEqual(values_read, values * 2)
+            self.assertEqual([type(v) for v in values_read], [type(v) for v in values * 2])
@@ -0,0 +1,451 @@
+import random
+import unittest
+import pytest
+
+pytest_unittest = pytest.mark.unittest
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port import queue, DISCONNECT
+from calvin.runtime.north.plugins.port.queue.common import QueueFull, QueueEmpty, COMMIT_RESPONSE
+
+from calvin.runtime.north.plugins.port.queue.test.test_fanout_fifo import DummyPort
+
+#
+# Randomized differential tests, queues are driven by random operations and
+# every result is compared with a simple reference model of the queue type.
+#
+
+SEEDS = range(20)
+STEPS = 300
+QUEUE_LENGTH = 4
+
+
+def create_queue(routing, direction="out", **properties):
+    port = DummyPort()
+    port.properties = {'routing': routing, 'direction': direction, 'queue_length': QUEUE_LENGTH}
+    port.properties.update(properties)
+    return queue.get(port)
+
+
+class ReaderModel(object):
+
+    def __init__(self):
+        # Committed and tentative number of read tokens
+        self.read = 0
+        self.tentative = 0
+        # Tokens read but not committed, in sequence order, and tokens not yet read
+        self.pinned = []
+        self.unread = []
+
+    def peek(self):
+        index = self.tentative - self.read
+        if index == len(self.pinned):
+            self.unread.sort()
+            self.pinned.append(self.unread.pop(0))
+        self.tentative += 1
+        return self.pinned[index]
+
+    def commit_upto(self, pos):
+        del self.pinned[:pos - self.read]
+        self.read = pos
+
+    def com_commit(self, seq):
+        if seq >= self.tentative:
+            return COMMIT_RESPONSE.invalid
+        if self.read < self.tentative:
+            if seq == self.read:
+                self.commit_upto(seq + 1)
+                return COMMIT_RESPONSE.handled
+            return COMMIT_RESPONSE.unhandled
+        return None
+
+    def com_commit_upto(self, seq):
+        if seq >= self.tentative:
+            return COMMIT_RESPONSE.invalid
+        if seq < self.read:
+            return COMMIT_RESPONSE.unhandled
+        self.commit_upto(seq + 1)
+        return COMMIT_RESPONSE.handled
+
+    def com_cancel(self, seq):
+        if seq >= self.tentative or seq < self.read:
+            return COMMIT_RESPONSE.invalid
+        self.tentative = seq
+        return COMMIT_RESPONSE.handled
+
+
+class ReadersModel(object):
+
+    """Read side of queues with a queue per reader"""
+
+    def __init__(self, readers):
+        self.readers = {r: ReaderModel() for r in readers}
+
+    def _committed(self):
+        pass
+
+    def peek(self, reader):
+        return self.readers[reader].peek()[2]
+
+    def commit(self, reader):
+        r = self.readers[reader]
+        r.commit_upto(r.tentative)
+        self._committed()
+
+    def cancel(self, reader):
+        r = self.readers[reader]
+        r.tentative = r.read
+
+    def com_commit(self, reader, seq):
+        response = self.readers[reader].com_commit(seq)
+        self._committed()
+        return response
+
+    def com_commit_upto(self, reader, seq):
+        response = self.readers[reader].com_commit_upto(seq)
+        self._committed()
+        return response
+
+    def com_cancel(self, reader, seq):
+        return self.readers[reader].com_cancel(seq)
+
+
+class BroadcastModel(ReadersModel):
+
+    """
+    All tokens to all readers, tokens are (-priority, position, value) so that a reader reads them
+    highest priority first. Only the first `length` tokens not read by all readers are visible,
+    tokens beyond that (up to spill) wait to become visible.
+    """
+
+    def __init__(self, readers, length, spill=0, priority=None):
+        super(BroadcastModel, self).__init__(readers)
+        self.length = length
+        self.spill = spill
+        self.priority = priority or (lambda value: 0)
+        self.written = []
+        self.visible = 0
+
+    def min_read(self):
+        return min(r.read for r in self.readers.values())
+
+    def free_slots(self):
+        return self.length + self.spill - (len(self.written) - self.min_read())
+
+    def slots_available(self, length):
+        return self.free_slots() >= length
+
+    def tokens_available(self, reader, length):
+        return self.visible - self.readers[reader].tentative >= length
+
+    def _committed(self):
+        end = min(len(self.written), self.min_read() + self.length)
+        for entry in self.written[self.visible:end]:
+            for r in self.readers.values():
+                r.unread.append(entry)
+        self.visible = max(self.visible, end)
+
+    def write(self, value):
+        self.written.append((-self.priority(value), len(self.written), value))
+        self._committed()
+
+    def remaining(self, reader):
+        r = self.readers[reader]
+        entries = r.pinned + sorted(r.unread) + self.written[self.visible:]
+        return [[r.read + i, e[2]] for i, e in enumerate(entries)]
+
+
+class DispatchModel(ReadersModel):
+
+    """Each token to one reader, with its own queue of length tokens"""
+
+    def __init__(self, readers, length, policy):
+        super(DispatchModel, self).__init__(readers)
+        self.order = sorted(readers)
+        self.length = length
+        self.policy = policy
+        self.queues = {r: [] for r in readers}
+        self.writes = 0
+
+    def queued(self, reader):
+        return len(self.queues[reader]) - self.readers[reader].read
+
+    def full(self, reader):
+        return self.queued(reader) >= self.length
+
+    def expected_reader(self):
+        if self.policy == "turn":
+            return self.order[self.writes % len(self.order)]
+        return None
+
+    def blocked(self):
+        if self.policy == "turn":
+            return self.full(self.expected_reader())
+        elif self.policy == "random":
+            return any(self.full(r) for r in self.order)
+        return all(self.full(r) for r in self.order)
+
+    def check_reader(self, reader):
+        if self.policy == "turn":
+            return reader == self.expected_reader()
+        elif self.policy == "balanced":
+            return self.queued(reader) == min(self.queued(r) for r in self.order)
+        return True
+
+    def write(self, reader, value):
+        entry = (0, len(self.queues[reader]), value)
+        self.queues[reader].append(entry)
+        self.readers[reader].unread.append(entry)
+        self.writes += 1
+
+    def tokens_available(self, reader, length):
+        return len(self.queues[reader]) - self.readers[reader].tentative >= length
+
+    def remaining(self, reader):
+        r = self.readers[reader]
+        return [[pos, e[2]] for pos, e in enumerate(self.queues[reader])][r.read:]
+
+
+class QueueModelTest(unittest.TestCase):
+
+    def check_reading(self, rnd, q, model, reader):
+        """One random read side operation on reader, compared with the model"""
+        op = rnd.choice(["peek", "peek", "commit", "cancel", "com_commit", "com_commit_upto", "com_cancel"])
+        r = model.readers[reader]
+        if op == "peek":
+            available = model.tokens_available(reader, 1)
+            self.assertEqual(q.tokens_available(1, reader), available)
+            if available:
+                self.assertEqual(q.peek(reader).value, model.peek(reader))
+            else:
+                self.assertRaises(QueueEmpty, q.peek, reader)
+        elif op == "commit":
+            q.commit(reader)
+            model.commit(reader)
+        elif op == "cancel":
+            q.cancel(reader)
+            model.cancel(reader)
+        else:
+            seq = rnd.randint(max(0, r.read - 2), r.tentative + 1)
+            self.assertEqual(getattr(q, op)(reader, seq), getattr(model, op)(reader, seq), "%s %d" % (op, seq))
+        self.assertEqual(q.com_is_committed(reader), r.read == r.tentative)
+
+
+@pytest_unittest
+class TestBroadcastModel(QueueModelTest):
+
+    readers = ["reader-%d" % i for i in range(3)]
+
+    def run_model(self, seed, routing, length=QUEUE_LENGTH, spill=0, priority=None, **properties):
+        rnd = random.Random(seed)
+        q = create_queue(routing, nbr_peers=len(self.readers), **properties)
+        for reader in self.readers:
+            q.add_reader(reader, {})
+        model = BroadcastModel(self.readers, length, spill, priority)
+        for step in xrange(STEPS):
+            if rnd.random() < 0.4:
+                value = {'priority': rnd.randint(0, 3), 'step': step}
+                available = model.slots_available(1)
+                self.assertEqual(q.slots_available(1, None), available)
+                if 'queue_length_max' not in properties:
+                    # An adaptive queue only counts the slots of its current length
+                    self.assertEqual(q.free_slots(None), model.free_slots())
+                if available:
+                    q.write(Token(value), None)
+                    model.write(value)
+                else:
+                    self.assertRaises(QueueFull, q.write, Token(value), None)
+            else:
+                self.check_reading(rnd, q, model, rnd.choice(self.readers))
+        reader = rnd.choice(self.readers)
+        remaining = q.exhaust(reader, DISCONNECT.EXHAUST_PEER_SEND)
+        self.assertEqual([[pos, t.value] for pos, t in remaining], model.remaining(reader))
+
+    def test_fanout_fifo(self):
+        for seed in SEEDS:
+            self.run_model(seed, "default")
+
+    def test_adaptive(self):
+        for seed in SEEDS:
+            self.run_model(seed, "default", length=16, queue_length_max=16)
+
+    def test_spill(self):
+        for seed in SEEDS:
+            self.run_model(seed, "spill", spill=5, spill_length=5)
+
+    def test_priority(self):
+        for seed in SEEDS:
+            self.run_model(seed, "priority", priority=lambda value: value['priority'])
+
+
+@pytest_unittest
+class TestDispatchModel(QueueModelTest):
+
+    readers = ["reader-%d" % i for i in range(3)]
+
+    def run_model(self, seed, routing, policy):
+        rnd = random.Random(seed)
+        q = create_queue(routing, nbr_peers=len(self.readers))
+        for reader in self.readers:
+            q.add_reader(reader, {})
+        model = DispatchModel(self.readers, QUEUE_LENGTH, policy)
+        if policy == "mapped":
+            q.set_config({'port-mapping': {"select-%s" % r: r for r in self.readers}})
+        for step in xrange(STEPS):
+            if rnd.random() < 0.4:
+                if policy == "mapped":
+                    self.write_mapped(rnd, q, model, step)
+                else:
+                    self.write_dispatched(q, model, policy, step)
+            else:
+                reader = rnd.choice(self.readers)
+                self.check_reading(rnd, q, model, reader)
+        for reader in self.readers:
+            remaining = q.exhaust(reader, DISCONNECT.EXHAUST_PEER_SEND)
+            self.assertEqual([[pos, t.value] for pos, t in remaining], model.remaining(reader))
+
+    def write_dispatched(self, q, model, policy, step):
+        available = q.slots_available(1, None)
+        if policy == "random":
+            # The next reader is drawn in advance, the queue is full when that one is
+            self.assertTrue(available or model.blocked())
+        else:
+            self.assertEqual(available, not model.blocked())
+        if available:
+            write_pos = dict(q.write_pos)
+            q.write(Token(step), None)
+            reader = [r for r in self.readers if q.write_pos[r] != write_pos[r]][0]
+            self.assertFalse(model.full(reader))
+            self.assertTrue(model.check_reader(reader), "%s got token %d" % (reader, step))
+            model.write(reader, step)
+
+    def write_mapped(self, rnd, q, model, step):
+        # Slots are available when all readers have slots, the selected reader's slot is used
+        reader = rnd.choice(self.readers)
+        self.assertEqual(q.slots_available(1, None), not any(model.full(r) for r in self.readers))
+        token = Token({"select-%s" % reader: step})
+        if model.full(reader):
+            self.assertRaises(QueueFull, q.write, token, None)
+        else:
+            q.write(token, None)
+            model.write(reader, step)
+
+    def test_round_robin(self):
+        for seed in SEEDS:
+            self.run_model(seed, "round-robin", "turn")
+
+    def test_ordered(self):
+        for seed in SEEDS:
+            self.run_model(seed, "dispatch-ordered", "turn")
+
+    def test_random(self):
+        for seed in SEEDS:
+            self.run_model(seed, "random", "random")
+
+    def test_mapped(self):
+        for seed in SEEDS:
+            self.run_model(seed, "dispatch-mapped", "mapped")
+
+    def test_balanced(self):
+        for seed in SEEDS:
+            self.run_model(seed, "balanced", "balanced")
+
+    def test_balanced_rate(self):
+        for seed in SEEDS:
+            self.run_model(seed, "balanced-rate", "any")
+
+
+# Model peek results for the collect queues, from the tokens at the head of each writer's queue
+def _unordered(model, heads):
+    for i in xrange(model.turn, model.turn + len(model.writers)):
+        writer = model.writers[i % len(model.writers)]
+        if writer in heads:
+            if model.peek_turn is None:
+                model.peek_turn = model.turn
+            model.turn = (i + 1) % len(model.writers)
+            return [writer]
+    return []
+
+
+def _synced(model, heads):
+    return model.writers if len(heads) == len(model.writers) else []
+
+
+def _any(model, heads):
+    return [w for w in model.writers if w in heads]
+
+
+@pytest_unittest
+class TestCollectModel(QueueModelTest):
+
+    writers = ["writer-%d" % i for i in range(3)]
+
+    def run_model(self, seed, routing, select, value):
+        rnd = random.Random(seed)
+        q = create_queue(routing, direction="in", nbr_peers=len(self.writers))
+        q.add_reader("reader", {})
+        for writer in self.writers:
+            q.add_writer(writer, {})
+        model = DummyPort()
+        model.writers = sorted(self.writers)
+        model.queues = {w: ReaderModel() for w in self.writers}
+        model.written = {w: 0 for w in self.writers}
+        model.turn = 0
+        model.peek_turn = None
+        for step in xrange(STEPS):
+            op = rnd.choice(["write", "com_write", "peek", "peek", "commit", "cancel"])
+            if op in ("write", "com_write"):
+                writer = rnd.choice(self.writers)
+                room = model.written[writer] - model.queues[writer].read < QUEUE_LENGTH
+                self.assertEqual(q.slots_available(1, writer), room)
+                self.assertEqual(q.free_slots(writer), QUEUE_LENGTH - (model.written[writer] - model.queues[writer].read))
+                seq = model.written[writer] + (rnd.randint(-1, 1) if op == "com_write" else 0)
+                if seq == model.written[writer] and not room:
+                    self.assertRaises(QueueFull, q.write, Token(step), writer)
+                    continue
+                if op == "write":
+                    q.write(Token(step), writer)
+                else:
+                    expected = [COMMIT_RESPONSE.unhandled, COMMIT_RESPONSE.handled, COMMIT_RESPONSE.invalid][
+                        cmp(seq, model.written[writer]) + 1]
+                    self.assertEqual(q.com_write(Token(step), writer, seq), expected)
+                    if expected != COMMIT_RESPONSE.handled:
+                        continue
+                model.queues[writer].unread.append((0, model.written[writer], step))
+                model.written[writer] += 1
+            elif op == "peek":
+                heads = {w: m for w, m in model.queues.items() if model.written[w] > m.tentative}
+                writers = select(model, heads)
+                self.assertEqual(q.tokens_available(1, "reader"), bool(writers))
+                if not writers:
+                    self.assertRaises(QueueEmpty, q.peek, "reader")
+                    continue
+                self.assertEqual(q.peek("reader").value, value(model, writers))
+            elif op == "commit":
+                q.commit("reader")
+                for m in model.queues.values():
+                    m.commit_upto(m.tentative)
+                model.peek_turn = None
+            else:
+                q.cancel("reader")
+                for m in model.queues.values():
+                    m.tentative = m.read
+                if model.peek_turn is not None:
+                    model.turn = model.peek_turn
+                model.peek_turn = None
+
+    def test_unordered(self):
+        for seed in SEEDS:
+            self.run_model(seed, "collect-unordered", _unordered, lambda m, w: m.queues[w[0]].peek()[2])
+
+    def test_tagged(self):
+        for seed in SEEDS:
+            self.run_model(seed, "collect-tagged", _unordered, lambda m, w: {w[0]: m.queues[w[0]].peek()[2]})
+
+    def test_synced(self):
+        for seed in SEEDS:
+            self.run_model(seed, "collect-all-tagged", _synced, lambda m, w: {x: m.queues[x].peek()[2] for x in w})
+
+    def test_any(self):
+        for seed in SEEDS:
+            self.run_model(seed, "collect-any-tagged", _any, lambda m, w: {x: m.queues[x].peek()[2] for x in w})
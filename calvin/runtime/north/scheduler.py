@@ -20,6 +20,7 @@ import random
 import logging
 
 from monitor import Event_Monitor, VisualizingMonitor
+from taskqueue import TaskQueue
 from calvin.runtime.south.async import async
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities.calvinlogger import get_logger
@@ -43,7 +44,7 @@ class BaseScheduler(object):
         self.node = node
         self.actor_mgr = actor_mgr
         self.done = False
-        self._tasks = []
+        self._tasks = TaskQueue()
         self._scheduled = None
         # FIXME: later
         self._replication_interval = 2
@@ -93,6 +94,10 @@ class BaseScheduler(object):
         """Incoming platform event"""
         pass
 
+    def schedule_actor(self, actor_id):
+        """Actor might be able to fire, e.g. after exhausted tokens were put in its queues"""
+        pass
+
     def register_endpoint(self, endpoint):
         pass
 
@@ -137,17 +142,18 @@ class BaseScheduler(object):
         self.node.rm.replication_loop()
         # Need to only insert task if none before replication interval, otherwise build up more and more tasks
         tt = time.time() + self._replication_interval
-        if not any([t[0] < tt for t in self._tasks if t[1] == self._check_replication]):
+        first = self._tasks.first_time(self._check_replication)
+        if first is None or first >= tt:
             self.insert_task(self._check_replication, self._replication_interval)
-        _log.debug("Next replication loop in %s %d %d" % (str([t[0] - time.time() for t in self._tasks if t[1] == self._check_replication]),
-                    [t[1] == self._check_replication for t in self._tasks].index(True), len(self._tasks)))
+        _log.debug("Next replication loop in %s %d" % (str([t.time - time.time() for t in self._tasks.pending(self._check_replication)]),
+                    len(self._tasks)))
         self.insert_task(self.strategy, 0)
 
     def _check_pressure(self):
         _log.debug("_check_pressure %s" % self._pressure_event_actor_ids)
         self.node.rm.check_pressure(self._pressure_event_actor_ids)
         self._pressure_event_actor_ids = set([])
-        if not [True for t in self._tasks if t[1] == self._check_pressure]:
+        if not self._tasks.pending(self._check_pressure):
             self.insert_task(self._check_pressure, 30)
 
     #
@@ -179,31 +185,27 @@ class BaseScheduler(object):
     ######################################################################
 
     def insert_task(self, what, delay):
-        """Call to insert a task"""
+        """
+        Call to insert a task, returns a handle that can be used with cancel_task.
+        """
         # Insert a task in time order,
-        # if it ends up first in list, re-schedule _process_next
+        # if it ends up first in queue, re-schedule _process_next
         t = time.time() + delay
-        # task is (time, func)
-        task = (t, what)
-        index = len(self._tasks)
-        if index:
-            for i, ti in enumerate(self._tasks):
-                if ti[0] > t:
-                    index = i
-                    break
-        # If list was empty => index = 0
-        # If slot found => index is insertion point
-        # If slot not found => index is length of list <=> append
         # coalesce => don't add a task b/c we already will do that
-        coalesce = (index > 0 and delay == 0 and self._tasks[index-1][1] == what)
-        if coalesce:
-            return
-        self._tasks.insert(index, task)
-        # print "INSERTING TASK AT SLOT", index
-        # print "TASKS:", [(t, f.__name__) for t, f in self._tasks]
+        if delay == 0:
+            for task in self._tasks.pending(what):
+                if task.time <= t:
+                    return task
+        task = self._tasks.insert(t, what)
         # If we're first, reschedule
-        if index == 0:
+        if self._tasks.peek() is task:
             self._schedule_next(delay, self._process_next)
+        return task
+
+    def cancel_task(self, task):
+        """Cancel a task returned by insert_task"""
+        # No need to reschedule, _process_next handles a cancelled first task
+        self._tasks.cancel(task)
 
     # Don't call directly
     def _schedule_next(self, delay, what):
@@ -215,11 +217,13 @@ class BaseScheduler(object):
     def _process_next(self):
         # Get next task from queue and do it unless next task is in the future,
         # in that case, schedule _process_next (this method) at that time
-        _, todo = self._tasks.pop(0)
-        todo()
-        if self._tasks:
-            t, _ = self._tasks[0]
-            delay = max(0, t - time.time())
+        task = self._tasks.peek()
+        if task is not None and task.time <= time.time():
+            self._tasks.pop()
+            task.what()
+        task = self._tasks.peek()
+        if task is not None:
+            delay = max(0, task.time - time.time())
             self._schedule_next(delay, self._process_next)
         else:
             # Queue is empty, set a watchdog to go off in 60s
@@ -285,6 +289,7 @@ class BaseScheduler(object):
                 actor._handle_exhaustion(exhausted, output_ok)
                 done = True
 
+        actor._metrics.add_round(time.time() - start_time)
         return actor_did_fire
 
     def _fire_actor_non_preemptive(self, actor):
@@ -298,6 +303,7 @@ class BaseScheduler(object):
         if not actor._authorized():
             return False
 
+        start_time = time.time()
         #
         # Repeatedly go over the action priority list
         #
@@ -315,6 +321,7 @@ class BaseScheduler(object):
                 actor._handle_exhaustion(exhausted, output_ok)
                 done = True
 
+        actor._metrics.add_round(time.time() - start_time)
         return actor_did_fire
 
 
@@ -329,6 +336,7 @@ class BaseScheduler(object):
         if not actor._authorized():
             return False
 
+        start_time = time.time()
         did_fire, output_ok, exhausted = actor.fire()
         if not did_fire:
             # => handle exhaustion and return
@@ -336,6 +344,7 @@ class BaseScheduler(object):
             # FIXME: Move exhaust handling to scheduler
             actor._handle_exhaustion(exhausted, output_ok)
 
+        actor._metrics.add_round(time.time() - start_time)
         return did_fire
 
 
@@ -367,10 +376,7 @@ class SimpleScheduler(BaseScheduler):
         """Token unsuccessfully sent on endpoint"""
         # We got back NACK on sent token, endpoint should wait before resending
         self.monitor.set_backoff(endpoint)
-        next_slot = self.monitor.next_slot()
-        if next_slot:
-            current = time.time()
-            self.insert_task(self.strategy, max(0, next_slot - current))
+        self._schedule_backoff()
 
     def tunnel_tx_throttle(self, endpoint):
         """Backoff request for endpoint"""
@@ -378,10 +384,22 @@ class SimpleScheduler(BaseScheduler):
         pass
         # FIXME: Under what circumstances is this method called?
 
+    def _schedule_backoff(self):
+        """Make sure strategy runs when the first endpoint in backoff may send again"""
+        next_slot = self.monitor.next_slot()
+        if next_slot is None:
+            return
+        first = self._tasks.first_time(self.strategy)
+        if first is None or first > next_slot:
+            self.insert_task(self.strategy, max(0, next_slot - time.time()))
+
     def schedule_calvinsys(self, actor_id=None):
         """Incoming platform event"""
         self.insert_task(self.strategy, 0)
 
+    def schedule_actor(self, actor_id):
+        self.insert_task(self.strategy, 0)
+
     def register_endpoint(self, endpoint):
         self.monitor.register_endpoint(endpoint)
         # Possibly after reconnect
@@ -408,6 +426,9 @@ class SimpleScheduler(BaseScheduler):
         activity = did_transfer_tokens or bool(did_fire_actor_ids)
         if activity:
             self.insert_task(self.strategy, 0)
+        else:
+            # Endpoints still in backoff after this round are not otherwise rescheduled
+            self._schedule_backoff()
 
     def watchdog(self):
         # Log and try to get back on track....
@@ -430,6 +451,9 @@ class RoundRobinScheduler(SimpleScheduler):
         activity = did_transfer_tokens or bool(did_fire_actor_ids)
         if activity:
             self.insert_task(self.strategy, 0)
+        else:
+            # Endpoints still in backoff after this round are not otherwise rescheduled
+            self._schedule_backoff()
 
 
 ######################################################################
@@ -448,4 +472,190 @@ class NonPreemptiveScheduler(SimpleScheduler):
         activity = did_transfer_tokens or bool(did_fire_actor_ids)
         if activity:
             self.insert_task(self.strategy, 0)
+        else:
+            # Endpoints still in backoff after this round are not otherwise rescheduled
+            self._schedule_backoff()
+
+
+
+######################################################################
+# READY-SET SCHEDULER
+######################################################################
+class ReadySetScheduler(SimpleScheduler):
+
+    """
+    Event driven scheduler that only tries to fire actors that could have become
+    fireable since they were last tried, i.e. actors that received tokens, got
+    free outport slots or had a calvinsys wakeup. In the same way only local
+    endpoints that could have something to transfer are asked to communicate.
+    As a safety net all enabled actors and all endpoints are tried at startup,
+    from the maintenance loop, on watchdog and every 'ready_set_sweep_interval' seconds.
+    """
+
+    def __init__(self, node, actor_mgr):
+        super(ReadySetScheduler, self).__init__(node, actor_mgr)
+        self._ready = set()
+        # Local endpoints with (possibly) tokens to transfer
+        self._pending_endpoints = set()
+        # Tunnel endpoints are always asked to communicate, they are driven by (N)ACKs
+        self._remote_endpoints = []
+        self._sweep = True
+        self._sweep_interval = _conf.get(None, "ready_set_sweep_interval") or 10
+
+    def run(self):
+        self.insert_task(self._periodic_sweep, self._sweep_interval)
+        super(ReadySetScheduler, self).run()
+
+    def _periodic_sweep(self):
+        self._sweep = True
+        self.insert_task(self.strategy, 0)
+        self.insert_task(self._periodic_sweep, self._sweep_interval)
+
+    def _maintenance_loop(self):
+        self._sweep = True
+        super(ReadySetScheduler, self)._maintenance_loop()
+
+    def tunnel_rx(self, endpoint):
+        """Token recieved on endpoint"""
+        self._ready.add(endpoint.port.owner.id)
+        super(ReadySetScheduler, self).tunnel_rx(endpoint)
+
+    def tunnel_tx_ack(self, endpoint):
+        """Token successfully sent on endpoint"""
+        # Slot(s) freed in outport queue
+        self._ready.add(endpoint.port.owner.id)
+        super(ReadySetScheduler, self).tunnel_tx_ack(endpoint)
+
+    def schedule_calvinsys(self, actor_id=None):
+        """Incoming platform event"""
+        if actor_id is None:
+            self._sweep = True
+        else:
+            self._ready.add(actor_id)
+            # Tokens might have been written outside of firing, e.g. by a @threaded action
+            actor = self.actor_mgr.actors.get(actor_id)
+            if actor is not None:
+                self._mark_ports(actor)
+        super(ReadySetScheduler, self).schedule_calvinsys(actor_id)
+
+    def schedule_actor(self, actor_id):
+        self._ready.add(actor_id)
+        super(ReadySetScheduler, self).schedule_actor(actor_id)
+
+    def register_endpoint(self, endpoint):
+        if self._is_local(endpoint):
+            self._pending_endpoints.add(endpoint)
+        else:
+            self._remote_endpoints.append(endpoint)
+        self._mark_endpoint(endpoint)
+        super(ReadySetScheduler, self).register_endpoint(endpoint)
+
+    def unregister_endpoint(self, endpoint):
+        self._pending_endpoints.discard(endpoint)
+        if endpoint in self._remote_endpoints:
+            self._remote_endpoints.remove(endpoint)
+        # Disconnect might leave the actors able to fire, e.g. during exhaustion
+        self._mark_endpoint(endpoint)
+        super(ReadySetScheduler, self).unregister_endpoint(endpoint)
+        self.insert_task(self.strategy, 0)
+
+    @staticmethod
+    def _is_local(endpoint):
+        return getattr(endpoint, 'peer_port', None) is not None
+
+    @staticmethod
+    def _has_tokens(endpoint):
+        try:
+            return endpoint.port.queue.tokens_available(1, endpoint.peer_id)
+        except Exception:
+            # Reader removed, e.g. during exhaustion
+            return False
+
+    def _mark_endpoint(self, endpoint):
+        self._ready.add(endpoint.port.owner.id)
+        if self._is_local(endpoint):
+            self._ready.add(endpoint.peer_port.owner.id)
+
+    def _mark_ports(self, actor):
+        """
+        Actor wrote and/or consumed tokens: its local outport endpoints might have tokens to transfer,
+        and peers sharing a queue with it (see LocalConnection) can read new tokens or write to freed slots.
+        """
+        for port in actor.outports.values():
+            for e in port.endpoints:
+                if not self._is_local(e):
+                    continue
+                if e.is_shared():
+                    self._ready.add(e.peer_port.owner.id)
+                else:
+                    self._pending_endpoints.add(e)
+        for port in actor.inports.values():
+            for e in port.endpoints:
+                if self._is_local(e) and e.is_shared():
+                    self._ready.add(e.peer_port.owner.id)
+
+    def _ready_endpoints(self):
+        if self._sweep:
+            return self.monitor.endpoints
+        return self._remote_endpoints + list(self._pending_endpoints)
+
+    def _ready_actors(self):
+        if self._sweep:
+            self._ready.clear()
+            return self.actor_mgr.enabled_actors()
+        ready, self._ready = self._ready, set()
+        actors = self.actor_mgr.actors
+        return [actor for actor in (actors.get(actor_id) for actor_id in ready)
+                if actor is not None and actor.enabled()]
+
+    def strategy(self):
+        # Communicate, a local endpoint that transferred tokens means that the
+        # reader got tokens and the writer got free slots
+        endpoints = self._ready_endpoints()
+        did_transfer = self.monitor.communicate_endpoints(endpoints)
+        for endpoint in did_transfer:
+            if self._is_local(endpoint):
+                self._mark_endpoint(endpoint)
+        # Keep local endpoints that could not transfer all tokens (reader queue full)
+        self._pending_endpoints = set(e for e in endpoints
+                                      if self._is_local(e) and not e.is_shared() and self._has_tokens(e))
+        # Fire actors in ready set
+        actors = self._ready_actors()
+        self._sweep = False
+        did_fire_actor_ids = self._fire_actors(actors)
+        # An actor that fired might be able to fire again (e.g. preempted after time slot),
+        # its outport endpoints likely have tokens to transfer and its shared queue peers can fire
+        self._ready.update(did_fire_actor_ids)
+        for actor in actors:
+            if actor.id in did_fire_actor_ids:
+                self._mark_ports(actor)
+        activity = bool(did_transfer) or bool(did_fire_actor_ids)
+        if activity:
+            self.insert_task(self.strategy, 0)
+        else:
+            # Endpoints still in backoff after this round are not otherwise rescheduled
+            self._schedule_backoff()
 
+    def watchdog(self):
+        self._sweep = True
+        super(ReadySetScheduler, self).watchdog()
+
+
+# Schedulers selectable with the 'scheduler' config option (or csruntime --scheduler)
+SCHEDULERS = {
+    'simple': SimpleScheduler,
+    'round_robin': RoundRobinScheduler,
+    'non_preemptive': NonPreemptiveScheduler,
+    'ready_set': ReadySetScheduler,
+}
+
+
+def get_scheduler_class(name=None):
+    """Return scheduler class given its name, default is taken from config"""
+    if name is None:
+        name = _conf.get_in_order('scheduler', 'simple')
+    try:
+        return SCHEDULERS[name]
+    except KeyError:
+        _log.error("Unknown scheduler '%s', using 'simple', available: %s" % (name, sorted(SCHEDULERS.keys())))
+        return SimpleScheduler
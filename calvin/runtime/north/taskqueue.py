@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import itertools
+
+
+class Task(object):
+
+    """
+    A scheduled call, returned by TaskQueue.insert and usable as a cancellation handle.
+    """
+
+    __slots__ = ('time', 'what', 'cancelled')
+
+    def __init__(self, time, what):
+        super(Task, self).__init__()
+        self.time = time
+        self.what = what
+        self.cancelled = False
+
+    def active(self):
+        return not self.cancelled
+
+    def __repr__(self):
+        name = getattr(self.what, '__name__', None) or getattr(getattr(self.what, 'func', None), '__name__', '?')
+        return "<Task %s at %f%s>" % (name, self.time, " cancelled" if self.cancelled else "")
+
+
+class TaskQueue(object):
+
+    """
+    Time ordered queue of tasks.
+
+    Insert and pop are O(log n), lookup of pending tasks for a given callable is O(1)
+    (apart from the number of pending tasks for that very callable, which is normally 1).
+    Cancelled tasks are removed lazily from the heap.
+    """
+
+    def __init__(self):
+        super(TaskQueue, self).__init__()
+        self._heap = []
+        # Tie breaker, keeps insertion order for tasks with same time
+        self._counter = itertools.count()
+        # what -> set of (non-cancelled) tasks in queue
+        self._pending = {}
+        self._cancelled = 0
+
+    def __len__(self):
+        return len(self._heap) - self._cancelled
+
+    def __nonzero__(self):
+        return len(self) > 0
+
+    def insert(self, t, what):
+        """Insert callable 'what' to be called at time t, returns the task"""
+        task = Task(t, what)
+        heapq.heappush(self._heap, (t, next(self._counter), task))
+        self._pending.setdefault(what, set()).add(task)
+        return task
+
+    def cancel(self, task):
+        """Cancel a task, cancelling an already popped or cancelled task is a no-op"""
+        if task.cancelled:
+            return
+        tasks = self._pending.get(task.what)
+        if tasks is None or task not in tasks:
+            return
+        task.cancelled = True
+        self._discard_pending(task)
+        self._cancelled += 1
+        # Don't let the heap fill up with dead entries
+        if self._cancelled > 64 and self._cancelled > len(self._heap) / 2:
+            self._heap = [entry for entry in self._heap if not entry[2].cancelled]
+            heapq.heapify(self._heap)
+            self._cancelled = 0
+
+    def _discard_pending(self, task):
+        tasks = self._pending[task.what]
+        tasks.discard(task)
+        if not tasks:
+            del self._pending[task.what]
+
+    def _drop_cancelled(self):
+        heap = self._heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+            self._cancelled -= 1
+
+    def peek(self):
+        """Return the next task without removing it, None if empty"""
+        self._drop_cancelled()
+        return self._heap[0][2] if self._heap else None
+
+    def pop(self):
+        """Remove and return the next task, raises IndexError if empty"""
+        self._drop_cancelled()
+        _, _, task = heapq.heappop(self._heap)
+        self._discard_pending(task)
+        return task
+
+    def pending(self, what):
+        """Return the pending tasks for callable 'what'"""
+        return self._pending.get(what, ())
+
+    def first_time(self, what):
+        """Return earliest time 'what' is scheduled to run or None"""
+        tasks = self._pending.get(what)
+        if not tasks:
+            return None
+        return min(task.time for task in tasks)
+
+    def tasks(self):
+        """Return all pending tasks in time order (expensive, for debugging)"""
+        return [entry[2] for entry in sorted(self._heap) if not entry[2].cancelled]
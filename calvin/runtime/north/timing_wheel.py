@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import math
+import time
+
+from calvin.runtime.south.async import async
+from calvin.utilities import calvinlogger
+
+_log = calvinlogger.get_logger(__name__)
+
+
+class TimingWheel(object):
+    """
+    Timeouts with a resolution of tick seconds, for many timeouts that are mostly cancelled
+    before they expire, e.g. reply timeouts.
+
+    Timeouts are kept in one slot per tick, adding and cancelling a timeout is a dictionary
+    operation. A single DelayedCall expires the slots once per tick while there are timeouts,
+    instead of one DelayedCall per timeout in the reactor.
+    """
+
+    def __init__(self, tick=0.25):
+        super(TimingWheel, self).__init__()
+        self.tick = tick
+        # Slot (tick number) -> {key: callback}
+        self._slots = {}
+        # Key -> slot
+        self._keys = {}
+        self._call = None
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, key, timeout, callback):
+        """ Call callback() in timeout seconds (rounded up to ticks) unless key is cancelled """
+        if key in self._keys:
+            self.cancel(key)
+        slot = int(math.ceil((time.time() + timeout) / self.tick))
+        self._slots.setdefault(slot, {})[key] = callback
+        self._keys[key] = slot
+        if self._call is None:
+            self._call = async.DelayedCall(self.tick, self._expire)
+
+    def cancel(self, key):
+        """ Remove the timeout of key, returns False when it is unknown (e.g. already expired) """
+        try:
+            slot = self._keys.pop(key)
+        except KeyError:
+            return False
+        entries = self._slots[slot]
+        del entries[key]
+        if not entries:
+            del self._slots[slot]
+        return True
+
+    def _expire(self):
+        now = time.time() / self.tick
+        for slot in sorted(s for s in self._slots if s <= now):
+            # The callbacks may add and cancel timeouts
+            entries = self._slots.pop(slot, {})
+            for key in entries:
+                del self._keys[key]
+            for callback in entries.itervalues():
+                try:
+                    callback()
+                except:
+                    _log.exception("Timeout callback failed")
+        self._call = async.DelayedCall(self.tick, self._expire) if self._slots else None
@@ -46,7 +46,9 @@ MODULES = {'defer': {'Deferred':         {'type': 'class', 'comp': defer.Deferre
                                  'LineProtocol': {'type': 'class', 'comp': twistedimpl.server_connection.LineProtocol},
                                  'RawDataProtocol': {'type': 'class', 'comp': twistedimpl.server_connection.LineProtocol}},
            'threads': {'defer_to_thread': {'type': 'function', 'comp': threads.deferToThread},
-                       'call_multiple_in_thread': {'type': 'function', 'comp': threads.callMultipleInThread}},
+                       'call_multiple_in_thread': {'type': 'function', 'comp': threads.callMultipleInThread},
+                       'create_thread_pool': {'type': 'function', 'comp': twistedimpl.threads.create_thread_pool},
+                       'defer_to_thread_pool': {'type': 'function', 'comp': twistedimpl.threads.defer_to_thread_pool}},
            'filedescriptor': {'FD': {'type': 'class', 'comp': twistedimpl.filedescriptor.FD}}}
 
 
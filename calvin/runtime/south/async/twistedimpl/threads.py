@@ -14,10 +14,28 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from twisted.internet import threads
+from twisted.internet import threads, reactor
+from twisted.python.threadpool import ThreadPool
 
 # Some callbacks functionallity
 # Thread function
 defer_to_thread = threads.deferToThread
 call_multiple_in_thread = threads.callMultipleInThread
 
+
+
+def create_thread_pool(max_threads, name=None):
+    """
+    Create a bounded thread pool, started with the reactor and stopped at reactor shutdown.
+    """
+    pool = ThreadPool(minthreads=0, maxthreads=max_threads, name=name)
+    reactor.callWhenRunning(pool.start)
+    reactor.addSystemEventTrigger('during', 'shutdown', pool.stop)
+    return pool
+
+
+def defer_to_thread_pool(pool, f, *args, **kwargs):
+    """
+    Run f(*args, **kwargs) in a thread from pool, returns a deferred fired in the reactor thread.
+    """
+    return threads.deferToThreadPool(reactor, pool, f, *args, **kwargs)
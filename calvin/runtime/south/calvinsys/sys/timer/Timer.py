@@ -58,6 +58,7 @@ class Timer(base_calvinsys_object.BaseCalvinsysObject):
         self._armed = False
         self._triggered = False
         self._repeats = repeats
+        self._task = None
         # Don't start timer on creation unless period is given
         if period is not None:
             self._set_timer(self._timeout)
@@ -65,10 +66,11 @@ class Timer(base_calvinsys_object.BaseCalvinsysObject):
     def _set_timer(self, timeout):
         self._armed = True
         self._next_time = time.time() + timeout
-        self.calvinsys.schedule_timer(self, timeout)
+        self._task = self.calvinsys.schedule_timer(self, timeout)
         
     # Prvate method called by calvinsys
     def _fire(self):
+        self._task = None
         self._triggered = True
         self._armed = False
         self.scheduler_wakeup()
@@ -93,6 +95,9 @@ class Timer(base_calvinsys_object.BaseCalvinsysObject):
     def close(self):
         if self._armed:
             self._armed = False
+            if self._task is not None:
+                self.calvinsys.cancel_timer(self._task)
+        self._task = None
         self._triggered = False
 
     # Serialize/deserialize calvinsys
@@ -106,6 +111,7 @@ class Timer(base_calvinsys_object.BaseCalvinsysObject):
         self._triggered = state["triggered"]
         self._timeout = state["timeout"]
         self._repeats = state["repeats"]
+        self._task = None
         if state["nexttrigger"]:
             timeout = state["nexttrigger"] - time.time()
             self._set_timer(max(timeout, 0))
@@ -123,6 +123,18 @@ class BaseTransport(CalvinCBClass):
         """
         raise NotImplementedError()
 
+    def is_send_paused(self):
+        """
+            Returns if the data sent is backing up, e.g. the socket buffers are full
+        """
+        return False
+
+    def peer_multi_message(self):
+        """
+            Returns if the peer told in the join that it handles MESSAGES frames
+        """
+        return False
+
 
 class BaseServer(CalvinCBClass):
     def __init__(self, rt_id, listen_uri, callbacks):
@@ -111,10 +111,23 @@ class StringProtocol(CalvinCBClass, Int32StringReceiver):
         super(StringProtocol, self).__init__(callbacks)
         self._callback_execute('set_proto', self)
         self.MAX_LENGTH = 1024*1024*20
+        self.send_paused = False
 
     def connectionMade(self):
+        # Registered as producer to be told when the write buffer is full
+        self.transport.registerProducer(self, True)
         self._callback_execute('connected', self)
 
+    def pauseProducing(self):
+        self.send_paused = True
+
+    def resumeProducing(self):
+        self.send_paused = False
+        self._callback_execute('resumed')
+
+    def stopProducing(self):
+        pass
+
     def lengthLimitExceeded(self, length):
         _log.error("String length recieved to big package was dumped, length was %s and max length is %s", length, self.MAX_LENGTH)
 
@@ -156,6 +169,7 @@ class TwistedCalvinTransport(base_transport.CalvinTransportBase):
             proto.callback_register('connected', CalvinCB(self._connected))
             proto.callback_register('disconnected', CalvinCB(self._disconnected))
             proto.callback_register('data', CalvinCB(self._data))
+            proto.callback_register('resumed', CalvinCB(self._resumed))
 
         self._callbacks = callbacks
 
@@ -179,6 +193,9 @@ class TwistedCalvinTransport(base_transport.CalvinTransportBase):
         if self._proto:
             self._proto.sendString(data)
 
+    def is_send_paused(self):
+        return self._proto is not None and self._proto.send_paused
+
     def join(self):
         from twisted.internet._sslverify import OpenSSLCertificateAuthorities
         from OpenSSL import crypto
@@ -190,6 +207,7 @@ class TwistedCalvinTransport(base_transport.CalvinTransportBase):
                      'disconnected': [CalvinCB(self._disconnected)],
                      'connection_failed': [CalvinCB(self._connection_failed)],
                      'data': [CalvinCB(self._data)],
+                     'resumed': [CalvinCB(self._resumed)],
                      'set_proto': [CalvinCB(self._set_proto)]}
 
         self._factory = TCPClientFactory(callbacks) # addr="%s:%s" % (self._host_ip, self._host_port))
@@ -257,6 +275,9 @@ class TwistedCalvinTransport(base_transport.CalvinTransportBase):
         _log.debug("%s, %s, %s" % (self, '_data', data))
         self._callback_execute('data', data)
 
+    def _resumed(self):
+        self._callback_execute('resumed')
+
 
 class TCPClientFactory(protocol.ClientFactory, CalvinCBClass):
     protocol = StringProtocol
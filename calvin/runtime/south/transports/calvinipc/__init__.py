@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2015 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import traceback
+
+factories = {}
+
+
+def register(_id, node_name, callbacks, schemas, formats):
+    ret = {}
+    if 'calvinipc' in schemas:
+        try:
+            import calvinipc_transport
+            f = calvinipc_transport.CalvinTransportFactory(_id, node_name, callbacks)
+            factories[_id] = f
+            ret['calvinipc'] = f
+        except ImportError:
+            traceback.print_exc()
+    return ret
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2015 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import stat
+import tempfile
+import itertools
+
+from calvin.utilities.calvin_callback import CalvinCB
+from calvin.utilities import calvinlogger
+from calvin.runtime.south.transports.lib.twisted import base_transport
+from calvin.runtime.south.transports.base_transport import split_uri
+from calvin.runtime.south.transports.calvinip.twisted.twisted_transport import StringProtocol, \
+    TCPServerFactory, TCPClientFactory
+
+from twisted.internet import error
+from twisted.internet import reactor
+
+_log = calvinlogger.get_logger(__name__)
+
+# Incoming connections have no address, they are numbered instead
+_incoming = itertools.count()
+
+
+def create_uri(host, port):
+    return "%s://%s:%s" % ("calvinipc", host, port)
+
+
+def socket_dir():
+    """
+    Directory of the unix domain sockets, private to the user running the runtimes
+    since anyone that can connect to a socket can join the runtime.
+    """
+    path = os.path.join(tempfile.gettempdir(), "calvinipc-%d" % os.getuid())
+    try:
+        os.mkdir(path, 0700)
+    except OSError:
+        if not os.path.isdir(path):
+            raise
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) != 0700:
+        raise Exception("Socket directory %s is not a private directory of this user" % path)
+    return path
+
+
+def socket_path(host, port):
+    """Path of the unix domain socket of the runtime listening on calvinipc://host:port"""
+    return os.path.join(socket_dir(), "%s-%s.sock" % (host, port))
+
+
+# Server
+class TwistedCalvinServer(base_transport.CalvinServerBase):
+    """
+    """
+
+    def __init__(self, iface='', node_name=None, port=0, callbacks=None, uri=None, *args, **kwargs):
+        super(TwistedCalvinServer, self).__init__(callbacks=callbacks)
+        uri = split_uri(uri)
+        self._node_name = node_name
+        self._port = port
+        self._path = socket_path(uri.hostname, uri.port)
+        self._server = None
+
+    def start(self):
+        callbacks = {'connected': [CalvinCB(self._connected)]}
+        f = TCPServerFactory(callbacks)
+        # Remove socket left by a runtime that was killed
+        if os.path.exists(self._path):
+            os.unlink(self._path)
+        try:
+            self._server = reactor.listenUNIX(self._path, f)
+        except error.CannotListenError:
+            _log.exception("Could not listen on %s", self._path)
+            raise
+        self._callback_execute('server_started', self._port)
+        return self._port
+
+    def stop(self):
+        _log.debug("Stopping server %s", self._server)
+        def fire_callback(args):
+            _log.debug("Server stopped %s", self._server)
+            self._callback_execute('server_stopped')
+        def fire_errback(args):
+            _log.warning("Server did not stop as excpected %s", args)
+            self._callback_execute('server_stopped')
+
+        if self._server:
+            d = self._server.stopListening()
+            self._server = None
+            d.addCallback(fire_callback)
+            d.addErrback(fire_errback)
+
+    def is_listening(self):
+        return self._server is not None
+
+    def _connected(self, proto):
+        self._callback_execute('client_connected', create_uri("incoming", next(_incoming)), proto)
+
+
+# Client
+class TwistedCalvinTransport(base_transport.CalvinTransportBase):
+    def __init__(self, host, port, callbacks=None, proto=None, *args, **kwargs):
+        super(TwistedCalvinTransport, self).__init__(host, port, callbacks=callbacks)
+        self._path = socket_path(host, port)
+        self._proto = proto
+        self._factory = None
+
+        # Server created us already have a proto
+        if proto:
+            proto.callback_register('connected', CalvinCB(self._connected))
+            proto.callback_register('disconnected', CalvinCB(self._disconnected))
+            proto.callback_register('data', CalvinCB(self._data))
+
+        self._callbacks = callbacks
+
+    def is_connected(self):
+        return self._proto is not None
+
+    def disconnect(self):
+        if self._proto:
+            self._proto.transport.loseConnection()
+
+    def send(self, data):
+        if self._proto:
+            self._proto.sendString(data)
+
+    def join(self):
+        if self._proto:
+            raise Exception("Already connected")
+
+        # Own callbacks
+        callbacks = {'connected': [CalvinCB(self._connected)],
+                     'disconnected': [CalvinCB(self._disconnected)],
+                     'connection_failed': [CalvinCB(self._connection_failed)],
+                     'data': [CalvinCB(self._data)],
+                     'set_proto': [CalvinCB(self._set_proto)]}
+
+        self._factory = UNIXClientFactory(callbacks)
+        reactor.connectUNIX(self._path, self._factory)
+
+    def _set_proto(self, proto):
+        _log.debug("%s, %s, %s" % (self, '_set_proto', proto))
+        if self._proto:
+            _log.error("_set_proto: Already connected")
+            return
+        self._proto = proto
+
+    def _connected(self, proto):
+        _log.debug("%s, %s" % (self, 'connected'))
+        self._callback_execute('connected')
+
+    def _disconnected(self, reason):
+        _log.debug("%s, %s, %s" % (self, 'disconnected', reason))
+        self._callback_execute('disconnected', reason)
+
+    def _connection_failed(self, addr, reason):
+        _log.debug("%s, %s, %s" % (self, 'connection_failed', reason))
+        self._callback_execute('connection_failed', reason)
+
+    def _data(self, data):
+        self._callback_execute('data', data)
+
+
+class UNIXClientFactory(TCPClientFactory):
+
+    def clientConnectionFailed(self, connector, reason):
+        _log.info('Connection failed. reason: %s, dest %s', reason, connector.getDestination())
+        self._callback_execute('connection_failed', connector.getDestination().name, reason)
@@ -84,6 +84,8 @@ class CalvinTransportBase(CalvinCBClass):
         self._callback_execute('data', data)
             Called when we have raw data in the transport.
             Always an entire package
+        self._callback_execute('resumed')
+            Called when the transport takes data again after is_send_paused
 
     """
 
@@ -96,7 +98,7 @@ class CalvinTransportBase(CalvinCBClass):
 
         """
         self._rtt = None
-        super(CalvinTransportBase, self).__init__(callbacks, callback_valid_names=['connected', 'disconnected', 'connection_failed', 'data'])
+        super(CalvinTransportBase, self).__init__(callbacks, callback_valid_names=['connected', 'disconnected', 'connection_failed', 'data', 'resumed'])
 
     def is_connected(self):
         """
@@ -117,6 +119,12 @@ class CalvinTransportBase(CalvinCBClass):
         """
         raise NotImplementedError()
 
+    def is_send_paused(self):
+        """
+            returns True when the data sent is backing up
+        """
+        return False
+
     def join(self):
         """
             Called when the client should connect
@@ -15,13 +15,21 @@
 # limitations under the License.
 
 import time
+import zlib
 
 from calvin.utilities.calvin_callback import CalvinCB
 from calvin.utilities import calvinlogger
 from calvin.utilities import calvinuuid
+from calvin.utilities import calvinconfig
 from calvin.runtime.south.transports import base_transport
 
 _log = calvinlogger.get_logger(__name__)
+_conf = calvinconfig.get()
+
+# Compression offered in the join, the peer then compresses large messages
+COMPRESSION = 'zlib'
+# First byte of a zlib stream, never the first byte of a coded message (always a map or an array)
+_ZLIB_HEADER = '\x78'
 
 _join_request_reply = {'cmd': 'JOIN_REPLY', 'id': None, 'sid': None, 'serializer': None}
 _join_request = {'cmd': 'JOIN_REQUEST', 'id': None, 'sid': None, 'serializers': []}
@@ -50,6 +58,13 @@ class CalvinTransport(base_transport.BaseTransport):
         self._coder = None
         self._transport = transport(self._uri.hostname, self._uri.port, callbacks, proto=proto, node_name=self._node_name, server_node_name=server_node_name)
         self._rtt = None  # Init rtt in s
+        # Compress messages of at least threshold bytes when the peer offered compression in the join
+        self._compress = False
+        self._compress_threshold = _conf.get('global', 'link_compression_threshold')
+        level = _conf.get('global', 'link_compression_level')
+        self._compress_level = zlib.Z_DEFAULT_COMPRESSION if level is None else level
+        # Peer told in the join that it handles MESSAGES frames, see CalvinLink
+        self._peer_multi_message = False
 
         if not client_validator:
             self._verify_client = lambda x: True
@@ -62,6 +77,7 @@ class CalvinTransport(base_transport.BaseTransport):
             # Incomming connection timeout if no join
             self._transport.callback_register("disconnected", CalvinCB(self._disconnected))
             self._transport.callback_register("data", CalvinCB(self._data_received))
+            self._transport.callback_register("resumed", CalvinCB(self._send_resumed))
 
     def connect(self, timeout=10):
         if self._transport.is_connected():
@@ -71,6 +87,7 @@ class CalvinTransport(base_transport.BaseTransport):
         self._transport.callback_register("connection_failed", CalvinCB(self._connection_failed))
         self._transport.callback_register("disconnected", CalvinCB(self._disconnected))
         self._transport.callback_register("data", CalvinCB(self._data_received))
+        self._transport.callback_register("resumed", CalvinCB(self._send_resumed))
         # TODO: set timeout
         self._transport.join()
 
@@ -89,6 +106,10 @@ class CalvinTransport(base_transport.BaseTransport):
             self._callback_execute('send_message', self, payload)
             # Send
             raw_payload = tcoder.encode(payload)
+            if self._compress and coder is None and len(raw_payload) >= self._compress_threshold:
+                compressed = zlib.compress(raw_payload, self._compress_level)
+                if len(compressed) < len(raw_payload):
+                    raw_payload = compressed
 
             # _log.debug('raw_send_message %s => %s "%s"' % (self._rt_id, self._remote_rt_id, raw_payload))
             self._callback_execute('raw_send_message', self, raw_payload)
@@ -100,6 +121,14 @@ class CalvinTransport(base_transport.BaseTransport):
             _log.error("Payload = '%s'" % repr(payload))
         return False
 
+    def is_send_paused(self):
+        # Not all transports (e.g. calvinfcm) can tell
+        is_send_paused = getattr(self._transport, 'is_send_paused', None)
+        return is_send_paused is not None and is_send_paused()
+
+    def peer_multi_message(self):
+        return self._peer_multi_message
+
     def _get_join_coder(self):
         return self.get_coders()['json']
 
@@ -112,6 +141,8 @@ class CalvinTransport(base_transport.BaseTransport):
         msg['id'] = self._rt_id
         msg['sid'] = self._get_msg_uuid()
         msg['serializers'] = self.get_coders().keys()
+        msg['compression'] = [COMPRESSION]
+        msg['multi_message'] = True
         self._join_start = time.time()
         self.send(msg, coder=self._get_join_coder())
 
@@ -120,6 +151,8 @@ class CalvinTransport(base_transport.BaseTransport):
         msg['id'] = self._rt_id
         msg['sid'] = sid
         msg['serializer'] = serializer
+        msg['compression'] = [COMPRESSION]
+        msg['multi_message'] = True
         self.send(msg, coder=self._get_join_coder())
 
     def _handle_join(self, data):
@@ -142,6 +175,9 @@ class CalvinTransport(base_transport.BaseTransport):
                     self._coder = self.get_coders()[coder]
                     coder_name = coder
                     break
+            self._compress = self._compression_offered(data_obj)
+            # Absent in joins from peers not handling MESSAGES frames
+            self._peer_multi_message = bool(data_obj.get('multi_message', False))
 
             # Verify remote
             valid = self._verify_client(data_obj)
@@ -161,6 +197,10 @@ class CalvinTransport(base_transport.BaseTransport):
         if valid:
             self._joined(True, False)
 
+    def _compression_offered(self, data_obj):
+        # Absent in joins from peers not decompressing messages
+        return self._compress_threshold is not None and COMPRESSION in data_obj.get('compression', [])
+
     def _joined(self, success, is_orginator, reason=None):
         if not success:
             self._callback_execute('join_failed', self, self._remote_rt_id, self.get_uri(), is_orginator, reason)
@@ -180,6 +220,9 @@ class CalvinTransport(base_transport.BaseTransport):
 
             if data_obj['serializer'] in self.get_coders():
                 self._coder = self.get_coders()[data_obj['serializer']]
+            self._compress = self._compression_offered(data_obj)
+            # Absent in joins from peers not handling MESSAGES frames
+            self._peer_multi_message = bool(data_obj.get('multi_message', False))
 
             if data_obj['id'] is not None:
                 # Request denied
@@ -209,6 +252,9 @@ class CalvinTransport(base_transport.BaseTransport):
             status = "OK"
         self._callback_execute('peer_disconnected', self, self._remote_rt_id, status)
 
+    def _send_resumed(self):
+        self._callback_execute('send_resumed', self)
+
     def _connection_failed(self, reason):
         status = "ERROR"
         if reason.getErrorMessage() == "An error occurred while connecting: 22":
@@ -231,6 +277,8 @@ class CalvinTransport(base_transport.BaseTransport):
         data_obj = None
         # decode
         try:
+            if data[:1] == _ZLIB_HEADER:
+                data = zlib.decompress(data)
             data_obj = self._coder.decode(data)
         except:
             _log.exception("Message decode failed")
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import stat
+import random
+import pytest
+
+from calvin.tests.helpers_twisted import create_callback
+from calvin.runtime.south.transports.calvinipc import calvinipc_transport
+from calvin.runtime.south.transports.calvinipc.twisted import twisted_transport
+
+pytestmark = pytest.mark.unittest
+
+
+def _dummy_inline(*args):
+    pass
+
+if not hasattr(pytest, 'inlineCallbacks'):
+    pytest.inlineCallbacks = _dummy_inline
+
+
+def _uri():
+    return "calvinipc://localhost:%d" % random.randint(20000, 60000)
+
+
+def _factory(rt_id, events):
+    """Factory with a callback (and deferred in events) for each transport callback"""
+    callbacks = {}
+    for name in ('server_started', 'join_finished', 'data_received', 'peer_disconnected',
+                 'peer_connection_failed'):
+        cb, d = create_callback(timeout=2, test_part=name)
+        callbacks[name] = [cb]
+        events[name] = d
+    return calvinipc_transport.CalvinTransportFactory(rt_id, rt_id, callbacks)
+
+
+def test_socket_dir_is_private():
+    path = twisted_transport.socket_dir()
+    info = os.lstat(path)
+    assert stat.S_IMODE(info.st_mode) == 0700
+    assert info.st_uid == os.getuid()
+    assert os.path.dirname(twisted_transport.socket_path("localhost", 5000)) == path
+
+
+def test_socket_dir_refuses_shared_dir(monkeypatch, tmpdir):
+    monkeypatch.setattr(twisted_transport.tempfile, 'gettempdir', lambda: str(tmpdir))
+    shared = tmpdir.mkdir("calvinipc-%d" % os.getuid())
+    shared.chmod(0777)
+    with pytest.raises(Exception):
+        twisted_transport.socket_dir()
+
+
+@pytest.mark.skipif(pytest.inlineCallbacks == _dummy_inline,
+                    reason="No inline twisted plugin enabled, please use --twisted to py.test")
+class TestCalvinIPCTransport(object):
+
+    @pytest.inlineCallbacks
+    def test_join_data_disconnect(self):
+        uri = _uri()
+        server_events, client_events = {}, {}
+        server = _factory("server", server_events)
+        client = _factory("client", client_events)
+
+        server.listen(uri)
+        yield server_events['server_started']
+        assert os.path.exists(twisted_transport.socket_path(*uri.split("//")[1].split(":")))
+
+        tp = client.join(uri)
+        args, _ = yield client_events['join_finished']
+        assert args[1] == "server"
+        args, _ = yield server_events['join_finished']
+        assert args[1] == "client"
+
+        tp.send({'cmd': 'TEST', 'value': 42})
+        args, _ = yield server_events['data_received']
+        assert args[1] == {'cmd': 'TEST', 'value': 42}
+
+        tp.disconnect()
+        args, _ = yield server_events['peer_disconnected']
+        assert args[1] == "client"
+        server.stop_listening(uri)
+
+    @pytest.inlineCallbacks
+    def test_join_without_listener_fails(self):
+        # The network then tries the next uri of the peer, i.e. calvinip
+        events = {}
+        client = _factory("client", events)
+        client.join(_uri())
+        args, _ = yield events['peer_connection_failed']
+        assert args[2] == "ERROR"
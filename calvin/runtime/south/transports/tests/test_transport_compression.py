@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.utilities.calvin_callback import CalvinCB
+from calvin.runtime.south.transports.lib.twisted import twisted_transport
+
+pytestmark = pytest.mark.unittest
+
+
+class WireTransport(object):
+    """ Inner transport handing sent data to the peer """
+
+    def __init__(self, host, port, callbacks, proto=None, **kwargs):
+        self.deliver = None
+        self.sent = []
+
+    def callback_register(self, name, cb):
+        pass
+
+    def send(self, data):
+        self.sent.append(data)
+        self.deliver(data)
+
+
+def _pair(monkeypatch, threshold):
+    monkeypatch.setattr(twisted_transport, '_conf', Mock(get=lambda section, option: {
+        'link_compression_threshold': threshold, 'link_compression_level': 6}[option]))
+    received = []
+    callbacks = {'data_received': [CalvinCB(lambda tp, data: received.append(data))]}
+    server = twisted_transport.CalvinTransport("server", "calvinip://localhost:5000", callbacks, WireTransport,
+                                               proto=Mock())
+    client = twisted_transport.CalvinTransport("client", "calvinip://localhost:5000", callbacks, WireTransport)
+    server._transport.deliver = client._data_received
+    client._transport.deliver = server._data_received
+    client._send_join()
+    return client, server, received
+
+
+def test_large_messages_compressed(monkeypatch):
+    client, server, received = _pair(monkeypatch, 100)
+    small = {'cmd': 'TOKEN_REPLY', 'value': 'ACK'}
+    large = {'cmd': 'ACTOR_NEW', 'state': {'log': ["sensor reading 21.5 C"] * 50}}
+    client.send(small)
+    client.send(large)
+    server.send(large)
+    assert received == [small, large, large]
+    sizes = [len(data) for data in client._transport.sent[1:]]
+    assert sizes[0] < 100 and sizes[1] < len(client._coder.encode(large)) / 5
+    assert server._transport.sent[-1][:1] == '\x78'
+
+
+def test_no_compression_unless_configured(monkeypatch):
+    client, server, received = _pair(monkeypatch, None)
+    large = {'cmd': 'ACTOR_NEW', 'state': {'log': ["sensor reading 21.5 C"] * 50}}
+    client.send(large)
+    assert received == [large]
+    assert client._transport.sent[-1] == client._coder.encode(large)
+
+
+def test_no_compression_to_older_peers(monkeypatch):
+    client, server, received = _pair(monkeypatch, 100)
+    assert client._compress and server._compress
+    # Joins from runtimes not decompressing have no compression list
+    assert not client._compression_offered({'cmd': 'JOIN_REPLY', 'serializer': 'json'})
+
+
+def test_multi_message_in_join(monkeypatch):
+    client, server, received = _pair(monkeypatch, None)
+    assert client.peer_multi_message() and server.peer_multi_message()
+    # Older peers do not tell in the join
+    client._handle_join_reply(client._get_join_coder().encode({'cmd': 'JOIN_REPLY', 'id': "server",
+                                                              'sid': None, 'serializer': 'json'}))
+    assert not client.peer_multi_message()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of the message coders.
+
+Every coder of the message coder factory encodes and decodes a set of messages as
+sent between runtimes:
+
+    token        - TUNNEL_DATA with a TOKEN carrying a sensor reading (legacy token encoding)
+    frame        - the same token as a compact frame, see calvin_frame
+    tokens       - TUNNEL_DATA with a TOKENS run of 16 compact tokens
+    token_reply  - TUNNEL_DATA with a TOKEN_REPLY
+    port_connect - a PORT_CONNECT request with port properties
+    actor_new    - an ACTOR_NEW with a small actor state
+
+Reported per coder and message: encoded size in bytes, and microseconds per encode
+and per decode.
+
+Usage:
+    python -m calvin.tests.benchmarks.bench_coders [rounds [coder ...]]
+"""
+
+import sys
+import time
+import uuid
+
+from calvin.runtime.north.calvin_frame import InternTable, encode_frame
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory
+
+CODERS = ["json", "msgpack", "cbor"]
+
+
+def _id():
+    return str(uuid.uuid4())
+
+
+def messages():
+    tunnel, port, peer_port, node, peer_node = _id(), _id(), _id(), _id(), _id()
+    reading = {'value': 21.5, 'unit': "C", 'timestamp': 1539820800.25}
+
+    def envelope(msg):
+        msg.update({'from_rt_uuid': node, 'to_rt_uuid': peer_node})
+        return msg
+
+    def tunnel_data(payload):
+        return envelope({'cmd': 'TUNNEL_DATA', 'tunnel_id': tunnel, 'value': payload})
+
+    token = {'cmd': 'TOKEN', 'port_id': port, 'peer_port_id': peer_port, 'sequencenbr': 4711,
+             'token': Token(reading).encode()}
+    table = InternTable()
+    table.intern([tunnel, port])
+    table.learn({peer_port: 0})
+    return [
+        ("token", tunnel_data(token)),
+        ("frame", encode_frame({'cmd': 'TUNNEL_DATA', 'tunnel_id': tunnel,
+                                'value': dict(token, token=Token(reading).encode(compact=True))}, table)),
+        ("tokens", tunnel_data({'cmd': 'TOKENS', 'port_id': port, 'peer_port_id': peer_port, 'sequencenbr': 4711,
+                                'tokens': [Token(dict(reading, value=i)).encode(compact=True) for i in range(16)]})),
+        ("token_reply", tunnel_data({'cmd': 'TOKEN_REPLY', 'port_id': port, 'peer_port_id': peer_port,
+                                     'sequencenbr': 4711, 'value': 'ACK'})),
+        ("port_connect", envelope({'cmd': 'PORT_CONNECT', 'msg_uuid': _id(), 'port_id': port, 'tunnel_id': tunnel,
+                                   'port_properties': {'direction': "out", 'routing': "fanout", 'nbr_peers': 1},
+                                   'peer_actor_id': _id(), 'peer_port_name': "token", 'peer_port_id': peer_port,
+                                   'peer_port_properties': {'direction': "in", 'queue_length': 8},
+                                   'token_encodings': ["compact"], 'token_batching': True,
+                                   'token_window': True})),
+        ("actor_new", envelope({'cmd': 'ACTOR_NEW', 'msg_uuid': _id(),
+                                'state': {'actor_type': "std.Counter",
+                                          'actor_state': {'count': 4711, 'name': "counter", 'id': _id(),
+                                                          'inports': {}, 'outports': {'integer': {
+                                                              'id': port, 'name': "integer",
+                                                              'queue': {'fifo': [Token(i).encode() for i in range(8)],
+                                                                        'N': 9, 'readers': [peer_port],
+                                                                        'write_pos': 4719}}}},
+                                          'prev_connections': {}, 'connection_list': None}})),
+    ]
+
+
+def measure(coder, msg, rounds):
+    encoded = coder.encode(msg)
+    start = time.time()
+    for _ in xrange(rounds):
+        coder.encode(msg)
+    encode_time = time.time() - start
+    start = time.time()
+    for _ in xrange(rounds):
+        coder.decode(encoded)
+    decode_time = time.time() - start
+    return len(encoded), encode_time / rounds * 1e6, decode_time / rounds * 1e6
+
+
+def main(args):
+    rounds = int(args[0]) if len(args) > 0 else 2000
+    coders = args[1:] or CODERS
+    print "%d rounds" % rounds
+    print "%8s %14s %8s %10s %10s" % ("coder", "message", "bytes", "enc us", "dec us")
+    for name in coders:
+        coder = message_coder_factory.get(name)
+        for msg_name, msg in messages():
+            size, encode_us, decode_us = measure(coder, msg, rounds)
+            print "%8s %14s %8d %10.1f %10.1f" % (name, msg_name, size, encode_us, decode_us)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of the condition decorator.
+
+Compares firing attempts per second of a 3-in/2-out actor using the condition
+decorator against the one that looked up ports by name on every attempt.
+Failed attempts have no input tokens, successful ones consume one token per
+inport and produce one per outport.
+
+Usage:
+    python -m calvin.tests.benchmarks.bench_condition [attempts]
+"""
+
+import sys
+import time
+import functools
+
+from calvin.actor.actor import Actor, manage, condition, _port_spec, _write_production
+from calvin.runtime.north.calvin_token import Token, ExceptionToken
+from calvin.runtime.north.plugins.port import queue
+
+
+def old_condition(action_input=[], action_output=[]):
+    """The condition decorator resolving ports by name on each attempt"""
+
+    outputs = [_port_spec(spec) for spec in action_output]
+    tokens_produced = len(action_output)
+    tokens_consumed = len(action_input)
+
+    def wrap(action_method):
+
+        name = action_method.__name__
+
+        @functools.wraps(action_method)
+        def condition_wrapper(self):
+            input_ok = all(self.inports[portname].tokens_available(1) for portname in action_input)
+            output_ok = all(self.outports[portname].tokens_available(1) for portname in action_output)
+
+            if not input_ok or not output_ok:
+                self._metrics.action(name).failed += 1
+                if input_ok:
+                    self._metrics.set_blocked()
+                return (False, output_ok, ())
+            if self._metrics.blocked_since is not None:
+                self._metrics.clear_blocked()
+            exhausted_ports = set()
+            exception = False
+            args = []
+            for portname in action_input:
+                port = self.inports[portname]
+                token, exhaust = port.read()
+                is_exception_token = isinstance(token, ExceptionToken)
+                exception = exception or is_exception_token
+                args.append(token if is_exception_token else token.value)
+                if exhaust:
+                    exhausted_ports.add(port)
+            start_time = time.time()
+            production = action_method(self, *args) or ()
+            time_spent = time.time() - start_time
+            _write_production(self, action_method, outputs, production)
+            self._metrics.action(name).add_firing(tokens_consumed, tokens_produced, time_spent)
+            return (True, True, exhausted_ports)
+
+        return condition_wrapper
+    return wrap
+
+
+class SumDiff(Actor):
+
+    """Three inports, two outports"""
+
+    inport_properties = {'a': {}, 'b': {}, 'c': {}}
+    outport_properties = {'sum': {}, 'diff': {}}
+
+    @manage([])
+    def init(self):
+        pass
+
+    @condition(['a', 'b', 'c'], ['sum', 'diff'])
+    def compute(self, a, b, c):
+        return (a + b + c, a - b - c)
+
+    action_priority = (compute, )
+
+
+class OldSumDiff(SumDiff):
+
+    @old_condition(['a', 'b', 'c'], ['sum', 'diff'])
+    def compute(self, a, b, c):
+        return (a + b + c, a - b - c)
+
+    action_priority = (compute, )
+
+
+def create(actor_class, length):
+    actor = actor_class("bench." + actor_class.__name__, name=actor_class.__name__)
+    actor.init()
+    for port in actor.inports.values():
+        port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': length, 'direction': "in"}, {}))
+        port.queue.add_reader(port.id, {})
+    for port in actor.outports.values():
+        port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': length, 'direction': "out"}, {}))
+        port.queue.add_reader("reader", {})
+    return actor
+
+
+def failed(actor_class, attempts):
+    actor = create(actor_class, 4)
+    action = actor.compute
+    start = time.time()
+    for _ in xrange(attempts):
+        action()
+    return attempts / (time.time() - start)
+
+
+def successful(actor_class, attempts, length=256):
+    actor = create(actor_class, length)
+    action = actor.compute
+    elapsed = 0.0
+    done = 0
+    while done < attempts:
+        # Fill the inports, fire until empty and drain the outports, only firing is timed
+        for port in actor.inports.values():
+            for i in xrange(length):
+                port.queue.write(Token(i), None)
+        start = time.time()
+        for _ in xrange(length):
+            action()
+        elapsed += time.time() - start
+        for port in actor.outports.values():
+            for _ in xrange(length):
+                port.queue.peek("reader")
+            port.queue.commit("reader")
+        done += length
+    return done / elapsed
+
+
+def main(args):
+    attempts = int(args[0]) if args else 200000
+    print "%12s %16s %16s" % ("attempts", "before /sec", "after /sec")
+    print "%12s %16.0f %16.0f" % ("failed", failed(OldSumDiff, attempts), failed(SumDiff, attempts))
+    print "%12s %16.0f %16.0f" % ("successful", successful(OldSumDiff, attempts), successful(SumDiff, attempts))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of the port queues.
+
+Every queue class in the queue package is driven through rounds of write, peek,
+cancel and commit with different numbers of peers (readers for fanout queues,
+writers for collect queues), and through exhaust of a full queue. For each it
+reports the time per queue operation and the number of objects allocated, and
+not freed again, per operation (i.e. garbage collector tracked objects, a
+growing number means the queue keeps allocating for its steady state).
+
+The functional behaviour is checked by the randomized tests in
+calvin/runtime/north/plugins/port/queue/test/test_queue_model.py.
+
+Usage:
+    python -m calvin.tests.benchmarks.bench_queue [rounds [peers ...]]
+"""
+
+import gc
+import sys
+import time
+
+from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.plugins.port import queue, DISCONNECT
+from calvin.runtime.north.plugins.port.queue.common import QueueFull
+
+QUEUE_LENGTH = 16
+
+
+def create(name, peers):
+    properties = {'queue_length': QUEUE_LENGTH, 'nbr_peers': peers, 'spill_length': QUEUE_LENGTH}
+    collect = name.startswith('collect')
+    properties['direction'] = "in" if collect else "out"
+    q = getattr(getattr(queue, name), queue._MODULES[name])(properties, {})
+    ids = ["peer-%d" % i for i in range(peers)]
+    if collect:
+        q.add_reader("reader", {})
+        for writer in ids:
+            q.add_writer(writer, {})
+        return q, ids, ["reader"]
+    for reader in ids:
+        q.add_reader(reader, {})
+    if name == 'fanout_mapped_fifo':
+        q.set_config({'port-mapping': {reader: reader for reader in ids}})
+    return q, [None], ids
+
+
+def token(name, i, writer, ids):
+    if name == 'fanout_mapped_fifo':
+        # Mapped tokens select their reader
+        return Token({ids[i % len(ids)]: i})
+    return Token({'priority': i % 3, 'data': i})
+
+
+def run_round(name, q, writers, readers, ids, counter):
+    """Fill the queue, then let each reader peek all, cancel, peek again and commit, returns nbr of operations"""
+    ops = 0
+    for writer in writers:
+        for _ in xrange(QUEUE_LENGTH):
+            ops += 1
+            if not q.slots_available(1, writer):
+                break
+            ops += 1
+            try:
+                q.write(token(name, next(counter), writer, ids), writer)
+            except QueueFull:
+                break
+    for reader in readers:
+        for again in (False, True):
+            while q.tokens_available(1, reader):
+                q.peek(reader)
+                ops += 2
+            ops += 1
+            if again:
+                q.commit(reader)
+            else:
+                q.cancel(reader)
+    return ops
+
+
+def measure(name, peers, rounds):
+    q, writers, readers = create(name, peers)
+    counter = iter(xrange(sys.maxint))
+    ids = readers if writers == [None] else writers
+    # Warm up so that lazily created state is not counted
+    run_round(name, q, writers, readers, ids, counter)
+    gc.collect()
+    gc.disable()
+    try:
+        objects = gc.get_count()[0]
+        ops = 0
+        start = time.time()
+        for _ in xrange(rounds):
+            ops += run_round(name, q, writers, readers, ids, counter)
+        elapsed = time.time() - start
+        objects = gc.get_count()[0] - objects
+    finally:
+        gc.enable()
+    # Exhaust a full queue for each peer
+    exhaust_time = 0.0
+    exhausts = 0
+    for _ in xrange(max(1, rounds / 10)):
+        q, writers, readers = create(name, peers)
+        ids = readers if writers == [None] else writers
+        for writer in writers:
+            for _ in xrange(QUEUE_LENGTH):
+                if not q.slots_available(1, writer):
+                    break
+                q.write(token(name, next(counter), writer, ids), writer)
+        start = time.time()
+        for peer in ids:
+            q.exhaust(peer, DISCONNECT.EXHAUST_PEER_SEND)
+        exhaust_time += time.time() - start
+        exhausts += len(ids)
+    return elapsed / ops * 1e9, float(objects) / ops, exhaust_time / exhausts * 1e6
+
+
+def main(args):
+    rounds = int(args[0]) if len(args) > 0 else 200
+    peer_counts = [int(a) for a in args[1:]] or [1, 4, 16]
+    print "queue length %d, %d rounds, peers are readers (fanout) or writers (collect)" % (QUEUE_LENGTH, rounds)
+    print "%28s %6s %10s %10s %12s" % ("queue", "peers", "ns/op", "objs/op", "exhaust us")
+    for name in sorted(queue._MODULES):
+        for peers in peer_counts:
+            ns, objs, exhaust = measure(name, peers, rounds)
+            print "%28s %6d %10.0f %10.3f %12.1f" % (name, peers, ns, objs, exhaust)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
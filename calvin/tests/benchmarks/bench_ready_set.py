@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Compare the ready-set scheduler with the other schedulers on a short pipeline
+running next to a large number of idle (enabled, but never fireable) actors.
+
+Usage:
+    python -m calvin.tests.benchmarks.bench_ready_set [idle_actors [tokens]]
+"""
+
+import sys
+
+from calvin.tests.benchmarks import harness
+
+
+def pipeline_with_idle(scheduler_class, idle, tokens):
+    rt = harness.Runtime(scheduler_class)
+    src = rt.new(harness.BenchSource, "src", count=tokens)
+    relay = rt.new(harness.BenchRelay, "relay")
+    snk = rt.new(harness.BenchSink, "snk")
+    rt.connect(src, 'token', relay, 'token')
+    rt.connect(relay, 'token', snk, 'token')
+    for i in range(idle / 2):
+        # Pairs of actors connected in a loop without tokens
+        a = rt.new(harness.BenchIdle, "idle_a%d" % i)
+        b = rt.new(harness.BenchIdle, "idle_b%d" % i)
+        rt.connect(a, 'token', b, 'token')
+        rt.connect(b, 'token', a, 'token')
+    wall, cpu = rt.run(lambda: len(snk.latencies) >= tokens)
+    return wall, cpu
+
+
+def main(args):
+    idle = int(args[0]) if len(args) > 0 else 1000
+    tokens = int(args[1]) if len(args) > 1 else 1000
+    print "pipeline of 3 actors, %d idle actors, %d tokens" % (idle, tokens)
+    print "%16s %14s %16s" % ("scheduler", "tokens/sec", "cpu us/token")
+    for name in ['simple', 'round_robin', 'non_preemptive', 'ready_set']:
+        wall, cpu = pipeline_with_idle(harness.SCHEDULERS[name], idle, tokens)
+        print "%16s %14.0f %16.1f" % (name, tokens / wall, cpu / tokens * 1e6)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Scheduler benchmark suite.
+
+Runs a set of representative graphs on each scheduler, all actors on a single
+runtime connected with local endpoints (no reactor). With --tunnel connections
+use tunnel endpoints over a stub transport instead, with --latency seconds delay,
+with --batch sending runs of tokens per message and with --window using windowed
+flow control instead of ACK/NACK per token:
+
+    pipeline  - source, a chain of relays and a sink
+    fanout    - one source feeding many sinks (fanout fifo)
+    fanin     - many sources feeding one sink (collect-unordered)
+    timers    - a pipeline next to many actors woken by periodic timers
+
+Reported per graph and scheduler:
+    tokens/sec       - tokens delivered to sinks per wall clock second
+    p50/p99 ms       - latency from source action to sink action
+    overhead us/tok  - cpu time not spent inside firing actions, per token
+    msgs/tok         - tunnel messages (tokens and replies) per token, with --tunnel
+
+Usage:
+    python -m calvin.tests.benchmarks.bench_scheduler [-s scheduler]... [-t tokens] [--shared | --tunnel [--latency s] [--batch] [--window]] [graph ...]
+"""
+
+import sys
+import argparse
+
+from calvin.tests.benchmarks import harness
+
+
+def pipeline(rt, tokens, length=8):
+    src = rt.new(harness.BenchSource, "src", count=tokens)
+    snk = rt.new(harness.BenchSink, "snk")
+    prev = src
+    for i in range(length):
+        relay = rt.new(harness.BenchRelay, "relay%d" % i)
+        rt.connect(prev, 'token', relay, 'token')
+        prev = relay
+    rt.connect(prev, 'token', snk, 'token')
+    return [snk], tokens
+
+
+def fanout(rt, tokens, width=32):
+    src = rt.new(harness.BenchSource, "src", count=tokens)
+    sinks = []
+    for i in range(width):
+        snk = rt.new(harness.BenchSink, "snk%d" % i)
+        rt.connect(src, 'token', snk, 'token')
+        sinks.append(snk)
+    # Every sink gets every token
+    return sinks, tokens * width
+
+
+def fanin(rt, tokens, width=32):
+    snk = rt.new(harness.BenchSink, "snk")
+    for i in range(width):
+        src = rt.new(harness.BenchSource, "src%d" % i, count=tokens / width)
+        rt.connect(src, 'token', snk, 'token', routing='collect-unordered')
+    return [snk], (tokens / width) * width
+
+
+def timers(rt, tokens, count=500, period=0.01):
+    sinks, expected = pipeline(rt, tokens, length=2)
+    for i in range(count):
+        ticker = rt.new(harness.BenchTicker, "ticker%d" % i)
+        rt.timer(ticker, period)
+    return sinks, expected
+
+
+GRAPHS = [
+    ('pipeline', pipeline),
+    ('fanout', fanout),
+    ('fanin', fanin),
+    ('timers', timers),
+]
+
+
+def run_graph(graph, scheduler_class, tokens, shared=False, tunnel=False, latency=0.0, batch=False, window=False):
+    rt = harness.Runtime(scheduler_class, shared=shared, tunnel=tunnel, latency=latency, batch=batch, window=window)
+    sinks, expected = graph(rt, tokens)
+    wall, cpu = rt.run(lambda: sum(len(snk.latencies) for snk in sinks) >= expected)
+    latencies = [l for snk in sinks for l in snk.latencies]
+    return {
+        'throughput': expected / wall,
+        'p50': harness.percentile(latencies, 50) * 1e3,
+        'p99': harness.percentile(latencies, 99) * 1e3,
+        'overhead': max(0.0, cpu - rt.action_time) / expected * 1e6,
+        'messages': float(rt.tunnel.sent) / expected if tunnel else 0.0,
+    }
+
+
+def main(args):
+    argparser = argparse.ArgumentParser(description="Scheduler benchmarks")
+    argparser.add_argument('-s', '--scheduler', action='append', dest='schedulers',
+                           choices=sorted(harness.SCHEDULERS.keys()),
+                           help="Scheduler(s) to benchmark, default all")
+    argparser.add_argument('-t', '--tokens', type=int, default=2000,
+                           help="Number of tokens produced per graph")
+    argparser.add_argument('--shared', action='store_true',
+                           help="Connect one to one connections with a shared queue (shared_local_queues)")
+    argparser.add_argument('--tunnel', action='store_true',
+                           help="Connect via tunnel endpoints over a stub transport")
+    argparser.add_argument('--latency', type=float, default=0.0,
+                           help="Stub transport delivery delay in seconds (with --tunnel)")
+    argparser.add_argument('--batch', action='store_true',
+                           help="Send runs of tokens in one message (with --tunnel)")
+    argparser.add_argument('--window', action='store_true',
+                           help="Windowed flow control with cumulative ACKs (with --tunnel)")
+    argparser.add_argument('graphs', nargs='*', choices=[[]] + [name for name, _ in GRAPHS],
+                           help="Graph(s) to run, default all")
+    args = argparser.parse_args(args)
+    schedulers = args.schedulers or sorted(harness.SCHEDULERS.keys())
+    graphs = [(name, graph) for name, graph in GRAPHS if not args.graphs or name in args.graphs]
+
+    print "%10s %16s %12s %10s %10s %16s %9s" % ("graph", "scheduler", "tokens/sec", "p50 ms", "p99 ms",
+                                                  "overhead us/tok", "msgs/tok")
+    for name, graph in graphs:
+        for sched_name in schedulers:
+            r = run_graph(graph, harness.SCHEDULERS[sched_name], args.tokens, args.shared, args.tunnel, args.latency,
+                          args.batch, args.window)
+            print "%10s %16s %12.0f %10.2f %10.2f %16.1f %9.2f" % (
+                name, sched_name, r['throughput'], r['p50'], r['p99'], r['overhead'], r['messages'])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Microbenchmark of the scheduler task queue.
+
+Compares insert/pop cost of the heap based TaskQueue against the sorted list
+that BaseScheduler used to keep, with a large number of pending (timer) tasks.
+
+Usage:
+    python -m calvin.tests.benchmarks.bench_taskqueue [pending ...]
+"""
+
+import sys
+import time
+import random
+from functools import partial
+
+from calvin.runtime.north.taskqueue import TaskQueue
+
+
+class ListQueue(object):
+
+    """The old BaseScheduler task list, linear insert"""
+
+    def __init__(self):
+        self._tasks = []
+
+    def insert(self, t, what):
+        task = (t, what)
+        index = len(self._tasks)
+        if index:
+            for i, ti in enumerate(self._tasks):
+                if ti[0] > t:
+                    index = i
+                    break
+        self._tasks.insert(index, task)
+        return task
+
+    def pop(self):
+        return self._tasks.pop(0)
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+def _timer(i):
+    pass
+
+
+def measure(queue_class, pending, ops=2000):
+    rnd = random.Random(4711)
+    q = queue_class()
+    for i in range(pending):
+        q.insert(rnd.uniform(0, 100.0), partial(_timer, i))
+    # Steady state: each pop is followed by a re-armed timer, like a periodic sys.timer
+    times = [rnd.uniform(0, 100.0) for _ in range(ops)]
+    start = time.time()
+    for t in times:
+        q.pop()
+        q.insert(t, _timer)
+    elapsed = time.time() - start
+    return elapsed / ops * 1e6
+
+
+def main(args):
+    sizes = [int(a) for a in args] or [100, 1000, 10000, 50000]
+    print "%10s %18s %18s" % ("pending", "list us/op", "heap us/op")
+    for n in sizes:
+        print "%10d %18.2f %18.2f" % (n, measure(ListQueue, n), measure(TaskQueue, n))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,298 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+Helpers for running a scheduler in-process without a reactor, network or storage.
+
+Actors are plain benchmark actors defined here, connected with local endpoints
+or with tunnel endpoints over a stub tunnel that delivers via the task queue.
+The reactor is replaced by a loop that pops tasks from the scheduler task queue,
+sleeping (or skipping ahead) until the next task is due.
+"""
+
+import time
+from functools import partial
+from mock import Mock
+
+from calvin.actor.actor import Actor, manage, condition, stateguard
+from calvin.runtime.north import scheduler
+from calvin.runtime.north.plugins.port import queue
+from calvin.runtime.north.plugins.port.endpoint import LocalOutEndpoint, LocalInEndpoint
+from calvin.runtime.north.plugins.port.endpoint import TunnelOutEndpoint, TunnelInEndpoint
+from calvin.runtime.north.calvin_token import COMPACT_ENCODING
+from calvin.runtime.north.plugins.port.connection.local import create_shared_queue
+
+
+class BenchSource(Actor):
+
+    """Produce 'count' tokens (timestamps) as fast as possible"""
+
+    outport_properties = {'token': {}}
+    inport_properties = {}
+
+    @manage([])
+    def init(self, count=1000):
+        self.remaining = count
+
+    @stateguard(lambda self: self.remaining > 0)
+    @condition([], ['token'])
+    def produce(self):
+        self.remaining -= 1
+        return (time.time(), )
+
+    action_priority = (produce, )
+
+
+class BenchRelay(Actor):
+
+    """Pass tokens through"""
+
+    inport_properties = {'token': {}}
+    outport_properties = {'token': {}}
+
+    @manage([])
+    def init(self):
+        pass
+
+    @condition(['token'], ['token'])
+    def relay(self, token):
+        return (token, )
+
+    action_priority = (relay, )
+
+
+class BenchSink(Actor):
+
+    """Consume tokens, record latency from timestamp in token"""
+
+    inport_properties = {'token': {}}
+    outport_properties = {}
+
+    @manage([])
+    def init(self):
+        self.latencies = []
+
+    @condition(['token'], [])
+    def consume(self, token):
+        self.latencies.append(time.time() - token)
+
+    action_priority = (consume, )
+
+
+class BenchIdle(Actor):
+
+    """An enabled actor that never has any input, i.e. never fires"""
+
+    inport_properties = {'token': {}}
+    outport_properties = {'token': {}}
+
+    @manage([])
+    def init(self):
+        pass
+
+    @condition(['token'], ['token'])
+    def relay(self, token):
+        return (token, )
+
+    action_priority = (relay, )
+
+
+class BenchTicker(Actor):
+
+    """Fire once each time the runtime timer has triggered, like an actor using sys.timer"""
+
+    inport_properties = {}
+    outport_properties = {}
+
+    @manage([])
+    def init(self):
+        self.triggered = False
+        self.ticks = 0
+
+    @stateguard(lambda self: self.triggered)
+    @condition([], [])
+    def tick(self):
+        self.triggered = False
+        self.ticks += 1
+
+    action_priority = (tick, )
+
+
+class ActorManagerStub(object):
+
+    def __init__(self):
+        self.actors = {}
+
+    def add(self, actor):
+        self.actors[actor.id] = actor
+        return actor
+
+    def enabled_actors(self):
+        return [actor for actor in self.actors.values() if actor.enabled()]
+
+    def migratable_actors(self):
+        return []
+
+    def denied_actors(self):
+        return []
+
+
+class StubTunnel(object):
+
+    """
+    Stands in for a tunnel to a peer runtime, TOKEN(S), TOKEN(S)_REPLY and TOKEN_WINDOW messages
+    are delivered to the peer endpoint by a task after 'latency' seconds.
+    """
+
+    def __init__(self, sched, latency=0.0):
+        self.sched = sched
+        self.latency = latency
+        # (outport id, inport id) -> tunnel endpoint, for each direction
+        self.out_endpoints = {}
+        self.in_endpoints = {}
+        self.sent = 0
+
+    def add(self, out_endpoint, in_endpoint):
+        self.out_endpoints[(out_endpoint.port.id, out_endpoint.peer_id)] = out_endpoint
+        self.in_endpoints[(in_endpoint.peer_id, in_endpoint.port.id)] = in_endpoint
+
+    def send(self, payload):
+        self.sent += 1
+        self.sched.insert_task(partial(self._deliver, payload), self.latency)
+
+    def _deliver(self, payload):
+        key = (payload['port_id'], payload['peer_port_id'])
+        if payload['cmd'] == 'TOKEN':
+            self.in_endpoints[key].recv_token(payload)
+        elif payload['cmd'] == 'TOKENS':
+            self.in_endpoints[key].recv_tokens(payload)
+        elif payload['cmd'] == 'TOKEN_REPLY':
+            self.out_endpoints[key].reply(payload['sequencenbr'], payload['value'])
+        elif payload['cmd'] == 'TOKENS_REPLY':
+            self.out_endpoints[key].reply_many(payload['sequencenbr'], payload['count'], payload['value'])
+        elif payload['cmd'] == 'TOKEN_WINDOW':
+            self.out_endpoints[key].reply_window(payload['sequencenbr'], payload['credit'], payload['value'])
+
+
+class Runtime(object):
+
+    """A scheduler driven by a fake reactor"""
+
+    def __init__(self, scheduler_class, shared=False, tunnel=False, latency=0.0, batch=False, window=False):
+        self.node = Mock()
+        # Connect with shared queues where possible (see 'shared_local_queues')
+        self.shared = shared
+        self.am = ActorManagerStub()
+        self.sched = scheduler_class(self.node, self.am)
+        self.node.sched = self.sched
+        # Connect via tunnel endpoints over a stub tunnel instead of local endpoints
+        self.tunnel = StubTunnel(self.sched, latency) if tunnel else None
+        # Tunnel endpoints send runs of tokens in TOKENS messages
+        self.batch = batch
+        # Tunnel endpoints use windowed flow control
+        self.window = window
+        # No reactor, the loop in run() does the job of async.DelayedCall
+        self.sched._schedule_next = lambda delay, what: None
+        # Disable replication and maintenance loops
+        self.sched._check_replication = lambda: None
+        # CPU time spent in actions that fired
+        self.action_time = 0.0
+
+    def new(self, actor_class, name, **kwargs):
+        actor = actor_class("bench." + actor_class.__name__, name=name)
+        actor.init(**kwargs)
+        actor.setup_complete()
+        actor.fire = partial(self._timed_fire, actor.fire)
+        return self.am.add(actor)
+
+    def _timed_fire(self, fire):
+        start = time.clock()
+        result = fire()
+        if result[0]:
+            self.action_time += time.clock() - start
+        return result
+
+    def timer(self, actor, period):
+        """Trigger actor every period seconds, the way sys.timer does via schedule_calvinsys"""
+        def _trigger():
+            actor.triggered = True
+            self.sched.schedule_calvinsys(actor_id=actor.id)
+            self.sched.insert_task(_trigger, period)
+        self.sched.insert_task(_trigger, period)
+
+    def connect(self, src, src_port, dst, dst_port, queue_length=4, routing=None):
+        """
+        Connect src.src_port to dst.dst_port, routing applies to the inport (collect-*),
+        ports connected more than once get a fanout/collect queue shared by all peers.
+        """
+        outport = src.outports[src_port]
+        inport = dst.inports[dst_port]
+        if routing:
+            inport.properties['routing'] = routing
+        outport.properties['queue_length'] = queue_length
+        inport.properties['queue_length'] = queue_length
+        shared_queue = create_shared_queue(inport, outport) if self.shared and not self.tunnel else None
+        if shared_queue is not None:
+            outport.set_queue(shared_queue)
+            inport.set_queue(shared_queue)
+        else:
+            outport.set_queue(queue.get(outport, peer_port=inport))
+            inport.set_queue(queue.get(inport, peer_port=outport))
+        if self.tunnel:
+            eout = TunnelOutEndpoint(outport, self.tunnel, self.node.id, inport.id, inport.properties, self.sched,
+                                     token_encoding=COMPACT_ENCODING, token_batching=self.batch,
+                                     token_window=self.window)
+            ein = TunnelInEndpoint(inport, self.tunnel, self.node.id, outport.id, outport.properties, self.sched,
+                                   token_window=self.window)
+            self.tunnel.add(eout, ein)
+        else:
+            eout = LocalOutEndpoint(outport, inport, self.sched)
+            ein = LocalInEndpoint(inport, outport, self.sched)
+        outport.attach_endpoint(eout)
+        inport.attach_endpoint(ein)
+        eout.register(self.sched)
+        ein.register(self.sched)
+
+    def run(self, done, timeout=600.0):
+        """
+        Run the scheduler until done() returns True.
+        Returns (wall time, cpu time) spent, action time is available in self.action_time.
+        """
+        tasks = self.sched._tasks
+        self.action_time = 0.0
+        self.sched.insert_task(self.sched.strategy, 0)
+        start, start_cpu = time.time(), time.clock()
+        while not done():
+            task = tasks.peek()
+            if task is None:
+                raise Exception("Scheduler starved")
+            delay = task.time - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            tasks.pop().what()
+            if time.time() - start > timeout:
+                raise Exception("Timeout")
+        return time.time() - start, time.clock() - start_cpu
+
+
+SCHEDULERS = scheduler.SCHEDULERS
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100.0))]
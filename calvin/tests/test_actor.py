@@ -20,7 +20,9 @@ from mock import Mock
 from calvin.tests import DummyNode, TestPort
 from calvin.runtime.north.actormanager import ActorManager
 from calvin.runtime.north.plugins.port.endpoint import LocalOutEndpoint, LocalInEndpoint
-from calvin.actor.actor import Actor
+from calvin.actor.actor import Actor, manage, condition, threaded, _port_spec
+from calvin.runtime.north.calvin_token import Token
+from twisted.internet import defer
 from calvin.runtime.north.plugins.port import queue
 from calvin.runtime.north.calvinsys import get_calvinsys
 
@@ -215,3 +217,205 @@ def test_requirements(actor):
     actor.requirements_add([6, 7], extend=True)
     assert actor.requirements_get()[:-1] == [4, 5, 6, 7]
     assert actor.requirements_get()[-1]['op'] == 'port_property_match'
+
+
+class ThreadedDouble(Actor):
+
+    inport_properties = {'token': {}}
+    outport_properties = {'token': {}}
+
+    @manage([])
+    def init(self):
+        pass
+
+    @condition(['token'], ['token'])
+    @threaded
+    def double(self, token):
+        return (2 * token, )
+
+    action_priority = (double, )
+
+
+def _threaded_actor(monkeypatch, deferred):
+    get_calvinsys()._node = Mock()
+    defer_to_thread_pool = Mock(return_value=deferred)
+    monkeypatch.setattr('calvin.actor.actor.threads.defer_to_thread_pool', defer_to_thread_pool)
+    monkeypatch.setattr('calvin.actor.actor._get_action_pool', Mock())
+    actor = ThreadedDouble('test.ThreadedDouble')
+    actor.init()
+    inport, outport = actor.inports['token'], actor.outports['token']
+    inport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+    inport.queue.add_reader(inport.id, {})
+    outport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+    outport.queue.add_reader("reader", {})
+    return actor, defer_to_thread_pool
+
+
+def test_threaded_action(monkeypatch):
+    deferred = defer.Deferred()
+    actor, defer_to_thread_pool = _threaded_actor(monkeypatch, deferred)
+    inport, outport = actor.inports['token'], actor.outports['token']
+    inport.queue.write(Token(1), None)
+    inport.queue.write(Token(2), None)
+
+    # Token consumed and action started in thread pool
+    assert actor.fire()[0]
+    assert defer_to_thread_pool.call_args[0][3:] == (actor, 1)
+    assert not outport.queue.tokens_available(1, "reader")
+    # Actor does not fire while action is in progress
+    assert not actor.fire()[0]
+    assert defer_to_thread_pool.call_count == 1
+
+    deferred.callback(((2, ), 0.5))
+    assert outport.queue.peek("reader").value == 2
+    # Time spent in the worker thread
+    metrics = actor.metrics()['actions']['double']
+    assert (metrics['fired'], metrics['produced'], metrics['time']) == (1, 1, 0.5)
+    get_calvinsys()._node.sched.schedule_calvinsys.assert_called_with(actor_id=actor.id)
+    assert actor.fire()[0]
+    assert defer_to_thread_pool.call_args[0][3:] == (actor, 2)
+
+
+def test_threaded_action_defers_exhaustion(monkeypatch):
+    deferred = defer.Deferred()
+    actor, _ = _threaded_actor(monkeypatch, deferred)
+    delayed_call = Mock()
+    monkeypatch.setattr('calvin.actor.actor.async.DelayedCall', delayed_call)
+    actor.inports['token'].queue.write(Token(1), None)
+    actor.fire()
+    exhaust_cb = Mock()
+    actor.exhaust(exhaust_cb)
+
+    # Production not written yet, not exhausted
+    did_fire, output_ok, exhausted = actor.fire()
+    actor._handle_exhaustion(exhausted, output_ok)
+    assert not delayed_call.called
+    idle = Mock()
+    actor.after_threaded_action(idle)
+    assert not idle.called
+
+    deferred.callback(((2, ), 0.5))
+    assert idle.called
+    did_fire, output_ok, exhausted = actor.fire()
+    actor._handle_exhaustion(exhausted, output_ok)
+    assert delayed_call.call_args[0][:2] == (0, exhaust_cb)
+
+
+def test_threaded_action_done_after_destroy(monkeypatch):
+    deferred = defer.Deferred()
+    actor, _ = _threaded_actor(monkeypatch, deferred)
+    actor.inports['token'].queue.write(Token(1), None)
+    actor.fire()
+    actor._will_end()
+
+    # Late result is dropped
+    deferred.callback(((2, ), 0.5))
+    assert not actor.outports['token'].queue.tokens_available(1, "reader")
+    assert not get_calvinsys()._node.sched.schedule_calvinsys.called
+
+
+def test_metrics(actor):
+    inport, outport = actor.inports['token'], actor.outports['token']
+    outport.queue.add_reader("reader", {})
+    assert not actor.fire()[0]
+    inport.queue.write(Token(1), None)
+    assert actor.fire()[0]
+    metrics = actor.metrics()
+    action = metrics['actions']['donothing']
+    assert (action['fired'], action['failed'], action['consumed'], action['produced']) == (1, 1, 1, 1)
+    # Fill outport, actor is blocked
+    for i in range(3):
+        outport.queue.write(Token(i), None)
+    inport.queue.write(Token(2), None)
+    assert not actor.fire()[0]
+    assert actor._metrics.blocked_since is not None
+    outport.queue.peek("reader")
+    outport.queue.commit("reader")
+    assert actor.fire()[0]
+    assert actor._metrics.blocked_since is None
+    assert actor.metrics()['blocked_time'] > 0
+    actor.reset_metrics()
+    assert actor.metrics()['actions']['donothing']['fired'] == 0
+
+
+def test_action_dispatch(actor):
+    inport, outport = actor.inports['token'], actor.outports['token']
+    outport.queue.add_reader("reader", {})
+    assert not actor.fire()[0]
+    assert actor._action_dispatch
+    # Port state applied (e.g. migration) changes port id, resolved ports must be dropped
+    inport._set_state({'name': 'token', 'id': "new_id"})
+    assert not actor._action_dispatch
+    inport.queue.add_reader("new_id", {})
+    inport.queue.write(Token(1), None)
+    assert actor.fire()[0]
+    assert outport.queue.peek("reader").value == 1
+
+
+class BatchSum(Actor):
+
+    inport_properties = {'token': {}}
+    outport_properties = {'sum': {}, 'token': {}}
+
+    @manage([])
+    def init(self):
+        pass
+
+    @condition([('token', 2, 4)], ['sum', ('token', 0, 4)])
+    def add(self, values):
+        return (sum(values), values)
+
+    action_priority = (add, )
+
+
+def test_batch_condition():
+    get_calvinsys()._node = Mock()
+    actor = BatchSum('test.BatchSum')
+    actor.init()
+    inport = actor.inports['token']
+    inport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 8, 'direction': "in"}, {}))
+    inport.queue.add_reader(inport.id, {})
+    for name in ('sum', 'token'):
+        outport = actor.outports[name]
+        outport.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 8, 'direction': "out"}, {}))
+        outport.queue.add_reader("reader", {})
+
+    inport.queue.write(Token(1), None)
+    # Needs at least two tokens
+    assert not actor.fire()[0]
+    # Ports resolved once, as for unbatched conditions
+    assert len(actor._action_dispatch) == 1
+    for i in range(2, 7):
+        inport.queue.write(Token(i), None)
+    # Reads up to four tokens
+    assert actor.fire()[0]
+    assert actor.fire()[0]
+    assert not actor.fire()[0]
+    sums = actor.outports['sum'].queue
+    assert [sums.peek("reader").value for _ in range(2)] == [1 + 2 + 3 + 4, 5 + 6]
+    tokens = actor.outports['token'].queue
+    assert [tokens.peek("reader").value for _ in range(6)] == [1, 2, 3, 4, 5, 6]
+    action = actor.metrics()['actions']['add']
+    assert (action['fired'], action['consumed'], action['produced']) == (2, 6, 8)
+
+
+@pytest.mark.parametrize("action_input,action_output", [
+    ([('token', 0)], []),
+    ([('token', 0, 4)], []),
+    ([('token', )], []),
+    ([('token', 1, 2, 3)], []),
+    ([('token', 3, 2)], []),
+    ([], [('token', 0)]),
+    ([], [('token', 2, 1)]),
+    ([], [('token', )]),
+])
+def test_condition_invalid_port_spec(action_input, action_output):
+    with pytest.raises(Exception):
+        condition(action_input, action_output)
+
+
+def test_condition_port_spec():
+    assert _port_spec('token') == ('token', 1, 1, False)
+    assert _port_spec(('token', 2), inport=True) == ('token', 2, 2, True)
+    # An outport may produce no tokens
+    assert _port_spec(('token', 0, 3)) == ('token', 0, 3, True)
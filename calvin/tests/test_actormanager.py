@@ -17,6 +17,7 @@
 import unittest
 import pytest
 from mock import Mock, patch
+from twisted.internet import defer
 
 from calvin.tests import DummyNode
 from calvin.runtime.north.actormanager import ActorManager
@@ -146,6 +147,24 @@ class ActorManagerTests(unittest.TestCase):
         self.assertEqual(cb.kwargs['ports'], actor.connections(self.am.node.id))
         self.am.node.control.log_actor_migrate.assert_called_once_with(actor_id, peer_node.id)
 
+    def test_migrate_waits_for_threaded_action(self):
+        callback_mock = Mock()
+        actor, actor_id = self._new_actor('std.Constantify', {'constant': 42})
+        actor.outports['out'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+        actor.inports['in'].set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "in"}, {}))
+        actor._threaded_action = defer.Deferred()
+        actor.serialize = Mock(return_value={})
+        self.am.node.proto = Mock()
+
+        self.am._migrate_disconnected(actor, actor._type, {}, "peer", True, callback=callback_mock)
+        assert not actor.serialize.called
+        assert actor_id in self.am.actors
+
+        actor._threaded_action.callback(None)
+        assert actor.serialize.called
+        assert actor_id not in self.am.actors
+        assert self.am.node.proto.actor_new.called
+
     def test_connect(self):
         actor, actor_id = self._new_actor('std.Constantify', {'constant': 42})
         connection_list = [['1', '2', '3', '4'], ['5', '6', '7', '8']]
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.runtime.north.calvin_frame import InternTable, encode_frame, decode_frame
+from calvin.runtime.north.calvin_network import CalvinLink
+from calvin.runtime.north.calvin_proto import CalvinProto
+
+pytestmark = pytest.mark.unittest
+
+
+def _tables():
+    """ Tables of the outport's side and of the inport's side after a port connect """
+    out_table, in_table = InternTable(), InternTable()
+    in_table.learn(out_table.intern(["tunnel", "outport"]))
+    out_table.learn(in_table.intern(["tunnel", "inport"]))
+    return out_table, in_table
+
+
+def _transport(multi_message=False):
+    return Mock(get_rtt=Mock(return_value=0.1), is_send_paused=Mock(return_value=False),
+                peer_multi_message=Mock(return_value=multi_message))
+
+
+def _msg(payload):
+    return {'cmd': 'TUNNEL_DATA', 'tunnel_id': "tunnel", 'value': payload}
+
+
+@pytest.mark.parametrize("payload,inport_sends", [
+    ({'cmd': 'TOKEN', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3,
+      'token': [0, 5]}, False),
+    ({'cmd': 'TOKENS', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3,
+      'tokens': [[0, 5], [0, 6]]}, False),
+    ({'cmd': 'TOKEN_REPLY', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3,
+      'value': 'ABORT'}, True),
+    ({'cmd': 'TOKENS_REPLY', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3,
+      'count': 2, 'value': 'NACK'}, True),
+    ({'cmd': 'TOKEN_WINDOW', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3,
+      'credit': 4, 'value': 'ACK'}, True),
+])
+def test_encode_decode(payload, inport_sends):
+    out_table, in_table = _tables()
+    sender, receiver = (in_table, out_table) if inport_sends else (out_table, in_table)
+    frame = encode_frame(_msg(dict(payload)), sender)
+    assert all(isinstance(f, int) for f in frame[:5])
+    assert decode_frame(frame, receiver) == _msg(payload)
+
+
+def test_not_interned():
+    payload = {'cmd': 'TOKEN', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3, 'token': 5}
+    out_table, in_table = _tables()
+    # Before the peer has told its numbers, and for the wrong direction
+    assert encode_frame(_msg(payload), InternTable()) is None
+    assert encode_frame(_msg(payload), in_table) is None
+    # Messages not in the frame layout
+    assert encode_frame(_msg(dict(payload, extra=1)), out_table) is None
+    assert encode_frame(_msg(dict(payload, cmd='TOKEN_REPLY', value='MAYBE')), in_table) is None
+    assert encode_frame(_msg("data"), out_table) is None
+
+
+def test_link_sends_frames():
+    out_table, in_table = _tables()
+    link = CalvinLink("node", "peer", _transport())
+    link.interned = out_table
+    payload = {'cmd': 'TOKEN', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3, 'token': 5}
+    link.send(_msg(dict(payload)))
+    frame = link.transport.send.call_args[0][0]
+    peer_link = CalvinLink("peer", "node", _transport())
+    peer_link.interned = in_table
+    assert peer_link.decode_frame(frame) == dict(_msg(payload), from_rt_uuid="node", to_rt_uuid="peer")
+    # Other messages and routed messages are sent as before
+    link.send({'cmd': 'REPLY', 'value': {}})
+    assert link.transport.send.call_args[0][0]['from_rt_uuid'] == "node"
+    link.send(_msg(dict(payload)), dest_peer_id="other")
+    assert link.transport.send.call_args[0][0]['to_rt_uuid'] == "other"
+
+
+def test_link_collects_messages(monkeypatch):
+    delayed = []
+    monkeypatch.setattr("calvin.runtime.north.calvin_network.async.DelayedCall",
+                        lambda delay, cb: delayed.append(cb) or Mock())
+    link = CalvinLink("node", "peer", _transport())
+    link.send_buffer = 3
+    # Until the peer has told it handles MESSAGES frames
+    link.send({'cmd': 'REPLY', 'value': 0})
+    assert link.transport.send.call_count == 1
+    link.multi_message = True
+    for value in range(4):
+        link.send({'cmd': 'REPLY', 'value': value})
+    # Sent when the buffer is full, the rest at the end of the reactor turn
+    frame = link.transport.send.call_args[0][0]
+    assert frame['cmd'] == 'MESSAGES'
+    assert [msg['value'] for msg in frame['messages']] == [0, 1, 2]
+    assert len(delayed) == 2
+    delayed[-1]()
+    assert link.transport.send.call_args[0][0]['value'] == 3
+    assert link.transport.send.call_count == 3
+
+
+def test_receive_messages_and_frames():
+    out_table, in_table = _tables()
+    peer_link = CalvinLink("peer", "node", _transport())
+    peer_link.interned = in_table
+    network = Mock(frame_received=lambda tp_link, frame: peer_link.decode_frame(frame))
+    proto = CalvinProto(Mock(id="peer", quitting=False), network)
+    tunnel = Mock()
+    proto.tunnels = {"node": {"tunnel": tunnel}}
+    payload = {'cmd': 'TOKEN', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': 3, 'token': 5}
+    frame = encode_frame(_msg(dict(payload)), out_table)
+    msg = dict(_msg(dict(payload, sequencenbr=4)), from_rt_uuid="node", to_rt_uuid="peer")
+    proto.recv_handler(None, {'cmd': 'MESSAGES', 'messages': [frame, msg]})
+    assert [c[0][0]['sequencenbr'] for c in tunnel.recv_handler.call_args_list] == [3, 4]
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, call
+
+from calvin.requests.calvinresponse import CalvinResponse
+from calvin.runtime.north import calvin_network
+from calvin.runtime.north.calvin_network import CalvinLink, CalvinNetwork
+from calvin.runtime.south.transports.calvinip.twisted.twisted_transport import StringProtocol, TwistedCalvinTransport
+from calvin.runtime.south.transports.lib.twisted.twisted_transport import CalvinTransport
+from calvin.utilities.calvin_callback import CalvinCB
+
+pytestmark = pytest.mark.unittest
+
+
+@pytest.fixture
+def delayed(monkeypatch):
+    calls = []
+    monkeypatch.setattr("calvin.runtime.north.calvin_network.async.DelayedCall",
+                        lambda delay, cb: calls.append(cb) or Mock())
+    return calls
+
+
+def _token(seq):
+    return {'cmd': 'TUNNEL_DATA', 'tunnel_id': "tunnel",
+            'value': {'cmd': 'TOKEN', 'port_id': "outport", 'peer_port_id': "inport", 'sequencenbr': seq, 'token': 1}}
+
+
+def _transport(paused=False, multi_message=False):
+    return Mock(get_rtt=Mock(return_value=0.1), is_send_paused=Mock(return_value=paused),
+                peer_multi_message=Mock(return_value=multi_message))
+
+
+def _sent(link):
+    return [(c[0][0]['cmd'], c[0][0]['value'].get('sequencenbr')) for c in link.transport.send.call_args_list]
+
+
+def test_control_ahead_of_bulk(delayed):
+    transport = _transport()
+    link = CalvinLink("node", "peer", transport)
+    link.send(_token(0))
+    transport.is_send_paused.return_value = True
+    link.send(_token(1))
+    link.send({'cmd': 'ACTOR_NEW', 'value': {}})
+    link.send({'cmd': 'PORT_CONNECT', 'value': {}})
+    link.send({'cmd': 'TUNNEL_DATA', 'tunnel_id': "tunnel",
+               'value': {'cmd': 'TOKEN_REPLY', 'port_id': "outport", 'peer_port_id': "inport",
+                         'sequencenbr': 0, 'value': 'ACK'}})
+    assert _sent(link) == [('TUNNEL_DATA', 0), ('PORT_CONNECT', None), ('TUNNEL_DATA', 0)]
+    # Bulk is held in order until the transport takes data again, also when no longer congested
+    transport.is_send_paused.return_value = False
+    link.send(_token(2))
+    assert len(_sent(link)) == 3
+    link.send_resumed()
+    assert _sent(link)[3:] == [('TUNNEL_DATA', 1), ('ACTOR_NEW', None), ('TUNNEL_DATA', 2)]
+    assert not delayed
+
+
+def test_replaced_link_takes_held(delayed):
+    transport = _transport(paused=True)
+    link = CalvinLink("node", "peer", transport)
+    link.send(_token(0))
+    new_transport = _transport()
+    new_link = CalvinLink("node", "peer", new_transport, old_link=link)
+    assert _sent(new_link) == [('TUNNEL_DATA', 0)]
+    assert not transport.send.called
+
+
+def test_resumed_transport_sends_held():
+    network = CalvinNetwork(Mock())
+    callbacks = {'send_resumed': [CalvinCB(network._send_resumed)]}
+    proto = StringProtocol({})
+    proto.transport = Mock()
+    transport = CalvinTransport("node", "calvinip://localhost:5000", callbacks, TwistedCalvinTransport, proto=proto)
+    transport._coder = transport.get_coders()['json']
+    link = network._links["peer"] = CalvinLink("node", "peer", transport)
+    proto.pauseProducing()
+    link.send(_token(0))
+    assert not proto.transport.write.called
+    # Twisted resumes the protocol when the socket buffers have room
+    proto.resumeProducing()
+    assert proto.transport.write.called
+
+
+def test_close_flushes(delayed):
+    transport = _transport(multi_message=True)
+    link = CalvinLink("node", "peer", transport)
+    link.send_buffer = 4
+    link.send(_token(0))
+    link.send(_token(1))
+    assert not transport.send.called
+    flush_call = link._flush_call
+    link.close()
+    frame = transport.send.call_args[0][0]
+    assert [msg['value']['sequencenbr'] for msg in frame['messages']] == [0, 1]
+    assert transport.mock_calls.index(call.disconnect()) > transport.mock_calls.index(call.send(frame))
+    assert flush_call.cancel.called and link._flush_call is None
+
+
+def test_reply_timeouts(monkeypatch, delayed):
+    monkeypatch.setattr(calvin_network, '_reply_timeouts', Mock(cancel=Mock(return_value=True)))
+    transport = _transport()
+    link = CalvinLink("node", "peer", transport)
+    replies = []
+    for _ in range(2):
+        link.send_with_reply(replies.append, {'cmd': 'PORT_CONNECT'})
+    first, second = [c[0][0]['msg_uuid'] for c in transport.send.call_args_list]
+    assert isinstance(first, (int, long)) and second == first + 1
+    # The replacing link handles the replies and timeouts of the replaced link
+    new_link = CalvinLink("node", "peer", transport, old_link=link)
+    new_link.reply_handler({'msg_uuid': first, 'value': CalvinResponse(True).encode()})
+    calvin_network._reply_timeouts.cancel.assert_called_with(first)
+    timeout = calvin_network._reply_timeouts.add.call_args[0]
+    assert timeout[:2] == (second, calvin_network.REPLY_TIMEOUT)
+    timeout[2]()
+    assert [r.status for r in replies] == [200, 504]
+    assert not link.replies and not new_link.replies
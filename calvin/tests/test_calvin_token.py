@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from calvin.runtime.north.calvin_token import Token, ExceptionToken, EOSToken
+from calvin.runtime.north.calvin_token import _TOKEN_CLASSES
+
+pytestmark = pytest.mark.unittest
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("token", [Token(5), Token({'a': [1, 2]}), ExceptionToken("Oops"), EOSToken()])
+def test_encode_decode(token, compact):
+    decoded = Token.decode(token.encode(compact=compact))
+    assert type(decoded) is type(token)
+    assert decoded.value == token.value
+
+
+def test_encode_default_is_legacy():
+    # Peers that have not advertised the compact encoding only understand the dict form
+    assert Token(5).encode() == {'type': 'Token', 'data': 5}
+    assert EOSToken().encode(compact=True) == [EOSToken.type_tag, "End of stream"]
+
+
+@pytest.mark.parametrize("data,token_class,value", [
+    ({'type': 'Token', 'data': 5}, Token, 5),
+    ({'type': 'EOSToken', 'data': "End of stream"}, EOSToken, "End of stream"),
+    ({'type': 'Unknown', 'data': 5}, ExceptionToken, 5),
+    ({}, ExceptionToken, "Bad Token"),
+])
+def test_decode_legacy(data, token_class, value):
+    token = Token.decode(data)
+    assert type(token) is token_class
+    assert token.value == value
+
+
+@pytest.mark.parametrize("data,value", [
+    ([17, 5], 5),
+    ([len(_TOKEN_CLASSES), 5], 5),
+    ([-1, 5], 5),
+    ([True, 5], 5),
+    ([1.0, 5], 5),
+    (["0", 5], 5),
+    ([0], "Bad Token"),
+    (None, "Bad Token"),
+])
+def test_decode_bad(data, value):
+    token = Token.decode(data)
+    assert type(token) is ExceptionToken
+    assert token.value == value
+
+
+def test_slots():
+    with pytest.raises(AttributeError):
+        Token(1).extra = 2
+    with pytest.raises(AttributeError):
+        EOSToken().extra = 2
@@ -74,6 +74,10 @@ def test_get_calvincontrol_returns_xxx():
     ("DELETE /actor/{actor_id} HTTP/1", ["actor_id"], "handle_del_actor"),
     ("GET /actor/{actor_id}/report HTTP/1", ["actor_id"], "handle_get_actor_report"),
     ("POST /actor/{actor_id}/report HTTP/1", ["actor_id"], "handle_post_actor_report"),
+    ("GET /actor/{actor_id}/metrics HTTP/1", ["actor_id"], "handle_get_actor_metrics"),
+    ("DELETE /actor/{actor_id}/metrics HTTP/1", ["actor_id"], "handle_del_actor_metrics"),
+    ("GET /actors/metrics HTTP/1", None, "handle_get_actors_metrics"),
+    ("DELETE /actors/metrics HTTP/1", None, "handle_del_actors_metrics"),
     ("POST /actor/{actor_id}/migrate HTTP/1", ["actor_id"], "handle_actor_migrate"),
     ("POST /actor/{actor_id}/disable HTTP/1", ["actor_id"], "handle_actor_disable"),
     ("GET /actor/{actor_id}/port/{port_id} HTTP/1", ["actor_id", "port_id"], "handle_get_port"),
@@ -156,3 +160,22 @@ def test_send_streamhader():
     connection.connection_lost = False
     control.send_streamheader(handle, connection)
     assert connection.send.called
+
+
+def test_actor_metrics_status():
+    from calvin.requests import calvinresponse
+    control = calvincontrol()
+    control.node.am.list_actors.return_value = ["actor-1"]
+    control.node.am.actor_metrics.return_value = {"actor-1": {}}
+    handle, connection = Mock(), Mock()
+
+    control._actor_metrics(handle, connection, "actor-1", False)
+    assert control.send_response.call_args[1]['status'] == calvinresponse.OK
+    control._actor_metrics(handle, connection, "actor-2", False)
+    assert control.send_response.call_args[1]['status'] == calvinresponse.NOT_FOUND
+    # Other failures are not reported as a missing actor
+    control.node.am.actor_metrics.side_effect = Exception("failed")
+    control._actor_metrics(handle, connection, "actor-1", False)
+    assert control.send_response.call_args[1]['status'] == calvinresponse.INTERNAL_ERROR
+    control._actor_metrics(handle, connection, None, True)
+    assert control.send_response.call_args[1]['status'] == calvinresponse.INTERNAL_ERROR
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.Tools import csruntime
+from calvin.runtime.north import calvin_node
+
+pytestmark = pytest.mark.unittest
+
+
+def _conf(**values):
+    conf = Mock()
+    conf.get = lambda section, option: values.get(option)
+    return conf
+
+
+def test_start_workers(monkeypatch):
+    start_worker_node = Mock()
+    monkeypatch.setattr(calvin_node, 'start_worker_node', start_worker_node)
+    monkeypatch.setattr(csruntime, '_conf', _conf())
+    attributes = {'indexed_public': {'node_name': {'name': 'rt'}}}
+
+    processes = csruntime.start_workers(3, "myhost", 5000, 5001, "http", attributes)
+
+    assert len(processes) == 2
+    calls = [c[0] for c in start_worker_node.call_args_list]
+    assert [c[0] for c in calls] == [["calvinipc://myhost:5002", "calvinip://myhost:5002"],
+                                     ["calvinipc://myhost:5004", "calvinip://myhost:5004"]]
+    assert [c[1] for c in calls] == ["http://myhost:5003", "http://myhost:5005"]
+    # Storage proxied through the primary runtime
+    assert [c[2] for c in calls] == ["calvinipc://myhost:5000"] * 2
+    assert [c[3]['indexed_public']['node_name']['name'] for c in calls] == ["rt-1", "rt-2"]
+    # Primary runtime attributes are left as is
+    assert attributes['indexed_public']['node_name']['name'] == 'rt'
+
+
+def test_start_workers_keeps_storage_proxy(monkeypatch):
+    start_worker_node = Mock()
+    monkeypatch.setattr(calvin_node, 'start_worker_node', start_worker_node)
+    monkeypatch.setattr(csruntime, '_conf', _conf(storage_type='proxy', storage_proxy="calvinip://other:5000"))
+    csruntime.start_workers(2, "myhost", 5000, 5001, "https", {'indexed_public': {'node_name': {'name': 'rt'}}})
+    assert start_worker_node.call_args[0][1] == "https://myhost:5003"
+    assert start_worker_node.call_args[0][2] == "calvinip://other:5000"
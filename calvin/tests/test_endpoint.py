@@ -19,9 +19,10 @@ import unittest
 from mock import Mock
 
 from calvin.actor.actorport import InPort, OutPort
-from calvin.runtime.north.calvin_token import Token
+from calvin.runtime.north.calvin_token import Token, COMPACT_ENCODING
 from calvin.runtime.north.plugins.port.endpoint import LocalInEndpoint, LocalOutEndpoint, TunnelInEndpoint, TunnelOutEndpoint
-from calvin.runtime.north.plugins.port import queue
+from calvin.runtime.north.plugins.port import queue, DISCONNECT
+from calvin.runtime.north.plugins.port.connection.local import create_shared_queue
 
 pytestmark = pytest.mark.unittest
 
@@ -71,6 +72,71 @@ class TestLocalEndpoint(unittest.TestCase):
         assert self.local_out.get_peer() == ('local', self.port.id)
 
 
+class TestSharedLocalEndpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.port = InPort("port", Mock())
+        self.peer_port = OutPort("peer_port", Mock())
+        self.local_in = LocalInEndpoint(self.port, self.peer_port)
+        self.local_out = LocalOutEndpoint(self.peer_port, self.port)
+        shared_queue = create_shared_queue(self.port, self.peer_port)
+        self.port.set_queue(shared_queue)
+        self.peer_port.set_queue(shared_queue)
+        self.peer_port.attach_endpoint(self.local_out)
+        self.port.attach_endpoint(self.local_in)
+
+    def test_create(self):
+        assert self.local_out.is_shared() and self.local_in.is_shared()
+        # Not when already connected
+        assert create_shared_queue(self.port, self.peer_port) is None
+        # Not for other routings
+        port = InPort("port", Mock(), {'routing': 'collect-unordered'})
+        assert create_shared_queue(port, OutPort("peer_port", Mock())) is None
+
+    def test_get_peers(self):
+        assert self.peer_port.get_peers() == [('local', self.port.id)]
+        assert self.port.get_peers() == [('local', self.peer_port.id)]
+        assert self.peer_port.queue.get_peers(self.peer_port.direction) == set([self.port.id])
+        assert self.port.queue.get_peers(self.port.direction) == set([self.peer_port.id])
+
+    def test_communicate(self):
+        # Room for both queues worth of tokens
+        for i in range(8):
+            self.peer_port.write_token(Token(i))
+        assert not self.peer_port.tokens_available(1)
+        assert not self.local_out.communicate()
+        assert self.port.tokens_available(8)
+        assert self.port.read()[0].value == 0
+        assert self.peer_port.tokens_available(1)
+
+    def test_split_on_disconnect(self):
+        for i in range(3):
+            self.peer_port.write_token(Token(i))
+        self.port.read()
+        self.peer_port.disconnect(terminate=DISCONNECT.TEMPORARY)
+        self.port.disconnect(terminate=DISCONNECT.TEMPORARY)
+        assert self.peer_port.queue is not self.port.queue
+        # Unread tokens stay with the inport, the outport has nothing left to send
+        assert [self.port.read()[0].value for _ in range(2)] == [1, 2]
+        assert self.peer_port.tokens_available(4)
+        # Reconnect with a queue each, sequence numbers continue
+        self.local_in = LocalInEndpoint(self.port, self.peer_port)
+        self.local_out = LocalOutEndpoint(self.peer_port, self.port)
+        self.peer_port.attach_endpoint(self.local_out)
+        self.port.attach_endpoint(self.local_in)
+        self.peer_port.write_token(Token(3))
+        assert self.local_out.communicate()
+        assert self.port.read()[0].value == 3
+
+    def test_split_on_new_queue(self):
+        self.peer_port.write_token(Token(0))
+        self.peer_port.set_queue(queue.fanout_fifo.FanoutFIFO({'queue_length': 4, 'direction': "out"}, {}))
+        assert not self.local_out.is_shared()
+        self.peer_port.write_token(Token(1))
+        assert self.local_out.communicate()
+        assert [self.port.read()[0].value for _ in range(2)] == [0, 1]
+
+
 class TestTunnelEndpoint(unittest.TestCase):
 
     def setUp(self):
@@ -126,6 +192,180 @@ class TestTunnelEndpoint(unittest.TestCase):
         expected_reply['value'] = 'ACK'
         self.tunnel.send.assert_called_with(expected_reply)
 
+    def test_recv_tokens(self):
+        payload = {
+            'port_id': self.peer_port.id,
+            'peer_port_id': self.port.id,
+            'sequencenbr': 0,
+            'tokens': [[Token.type_tag, i] for i in range(3)]
+        }
+        self.tunnel_in.recv_tokens(payload)
+        assert self.scheduler.tunnel_rx.called
+        assert [self.port.queue.fifo[i].value for i in range(3)] == [0, 1, 2]
+        self.tunnel.send.assert_called_once_with({
+            'cmd': 'TOKENS_REPLY',
+            'port_id': self.peer_port.id,
+            'peer_port_id': self.port.id,
+            'sequencenbr': 0,
+            'count': 3,
+            'value': 'ACK'
+        })
+
+        # Resent tokens are acked again, only one more fits in the queue (length 4)
+        payload['tokens'] = [[Token.type_tag, i] for i in range(1, 5)]
+        payload['sequencenbr'] = 1
+        self.tunnel_in.recv_tokens(payload)
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['count'], reply['value']) == (1, 3, 'NACK')
+        assert self.scheduler.trigger_pressure_event.called
+
+        # Not following the tokens in the queue
+        self.scheduler.reset_mock()
+        payload['sequencenbr'] = 10
+        self.tunnel_in.recv_tokens(payload)
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['count'], reply['value']) == (10, 0, 'NACK')
+        assert not self.scheduler.tunnel_rx.called
+
+    def test_batched_communicate(self):
+        tunnel_out = TunnelOutEndpoint(self.peer_port, self.tunnel, self.node_id, self.port.id, {}, self.scheduler,
+                                       token_batching=True)
+        self.peer_port.attach_endpoint(tunnel_out)
+        for i in range(3):
+            self.peer_port.write_token(Token(i))
+        assert tunnel_out.communicate() is True
+        assert self.tunnel.send.call_count == 1
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['cmd'], msg['sequencenbr'], len(msg['tokens'])) == ('TOKENS', 0, 3)
+        # Two tokens received, the third NACKed
+        tunnel_out.reply_many(0, 2, 'NACK')
+        assert self.peer_port.queue.read_pos[self.port.id] == 2
+        assert self.peer_port.queue.tentative_read_pos[self.port.id] == 2
+        assert not tunnel_out.bulk
+        self.peer_port.write_token(Token(3))
+        # After a NACK one token at a time
+        assert tunnel_out.communicate() is True
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['cmd'], msg['sequencenbr']) == ('TOKEN', 2)
+        tunnel_out.reply(2, 'ACK')
+        assert tunnel_out.communicate() is True
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['cmd'], msg['sequencenbr'], msg['tokens']) == ('TOKENS', 3, [{'type': 'Token', 'data': 3}])
+        tunnel_out.reply_many(3, 1, 'ACK')
+        assert self.peer_port.queue.com_is_committed(self.port.id)
+
+    def test_recv_tokens_window(self):
+        tunnel_in = TunnelInEndpoint(self.port, self.tunnel, self.peer_node_id, self.peer_port.id, {}, self.scheduler,
+                                     token_window=True)
+        self.port.attach_endpoint(tunnel_in)
+        assert tunnel_in.use_monitor()
+        tunnel_in.recv_token({'port_id': self.peer_port.id, 'peer_port_id': self.port.id, 'sequencenbr': 0,
+                              'token': [Token.type_tag, 0]})
+        # Cumulative ACK with credit for the free slots
+        self.tunnel.send.assert_called_once_with({
+            'cmd': 'TOKEN_WINDOW',
+            'port_id': self.peer_port.id,
+            'peer_port_id': self.port.id,
+            'sequencenbr': 1,
+            'credit': 3,
+            'value': 'ACK'
+        })
+        # A full queue waits with the ACK until the actor has consumed half the queue
+        self.tunnel.reset_mock()
+        payload = {
+            'port_id': self.peer_port.id,
+            'peer_port_id': self.port.id,
+            'sequencenbr': 1,
+            'tokens': [[Token.type_tag, i] for i in range(1, 4)]
+        }
+        tunnel_in.recv_tokens(payload)
+        self.port.queue.peek(self.port.id)
+        self.port.queue.commit(self.port.id)
+        assert tunnel_in.communicate() is False
+        assert not self.tunnel.send.called
+        self.port.queue.peek(self.port.id)
+        self.port.queue.commit(self.port.id)
+        tunnel_in.communicate()
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['cmd'], reply['sequencenbr'], reply['credit'], reply['value']) == ('TOKEN_WINDOW', 4, 2, 'ACK')
+        # More than the free slots are NACKed at once
+        payload['sequencenbr'] = 4
+        tunnel_in.recv_tokens(payload)
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['credit'], reply['value']) == (6, 0, 'NACK')
+        # Out of sequence, NACKed with what is expected
+        payload['sequencenbr'] = 10
+        tunnel_in.recv_tokens(payload)
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['sequencenbr'], reply['value']) == (6, 'NACK')
+
+    def test_first_tokens_window_invalid(self):
+        tunnel_in = TunnelInEndpoint(self.port, self.tunnel, self.peer_node_id, self.peer_port.id, {}, self.scheduler,
+                                     token_window=True)
+        self.port.attach_endpoint(tunnel_in)
+        tunnel_out = TunnelOutEndpoint(self.peer_port, self.tunnel, self.node_id, self.port.id, {}, self.scheduler,
+                                       token_batching=True, token_window=True)
+        self.peer_port.attach_endpoint(tunnel_out)
+        for i in range(3):
+            self.peer_port.write_token(Token(i))
+        assert tunnel_out.communicate() is True
+        # The first message after connecting starts past what the inport queue has
+        tunnel_in.recv_tokens({'port_id': self.peer_port.id, 'peer_port_id': self.port.id, 'sequencenbr': 2,
+                               'tokens': [[Token.type_tag, 2]]})
+        assert not self.scheduler.tunnel_rx.called
+        reply = self.tunnel.send.call_args[0][0]
+        assert (reply['cmd'], reply['sequencenbr'], reply['credit'], reply['value']) == ('TOKEN_WINDOW', 0, 4, 'NACK')
+        # No tokens are committed on the sender's side
+        tunnel_out.reply_window(reply['sequencenbr'], reply['credit'], reply['value'])
+        assert self.peer_port.queue.read_pos[self.port.id] == 0
+        assert tunnel_out.communicate() is True
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['cmd'], msg['sequencenbr'], len(msg['tokens'])) == ('TOKENS', 0, 3)
+
+    def test_window_communicate(self):
+        tunnel_out = TunnelOutEndpoint(self.peer_port, self.tunnel, self.node_id, self.port.id, {}, self.scheduler,
+                                       token_batching=True, token_window=True)
+        self.peer_port.attach_endpoint(tunnel_out)
+        for i in range(3):
+            self.peer_port.write_token(Token(i))
+        # Window not known, one token until the peer replies
+        assert tunnel_out.communicate() is True
+        assert tunnel_out.communicate() is False
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['cmd'], msg['sequencenbr'], len(msg['tokens'])) == ('TOKENS', 0, 1)
+        tunnel_out.reply_window(1, 2, 'ACK')
+        assert self.scheduler.tunnel_tx_ack.called
+        assert self.peer_port.queue.read_pos[self.port.id] == 1
+        assert tunnel_out.communicate() is True
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['sequencenbr'], len(msg['tokens'])) == (1, 2)
+        # Never beyond the window
+        self.peer_port.write_token(Token(3))
+        assert tunnel_out.communicate() is False
+        # Token 2 did not fit, resent when the peer has room, without backoff
+        tunnel_out.reply_window(2, 0, 'NACK')
+        assert self.peer_port.queue.read_pos[self.port.id] == 2
+        assert self.peer_port.queue.tentative_read_pos[self.port.id] == 2
+        assert not self.scheduler.tunnel_tx_nack.called
+        assert tunnel_out.communicate() is False
+        tunnel_out.reply_window(2, 4, 'ACK')
+        assert tunnel_out.communicate() is True
+        msg = self.tunnel.send.call_args[0][0]
+        assert (msg['sequencenbr'], [t['data'] for t in msg['tokens']]) == (2, [2, 3])
+        tunnel_out.reply_window(4, 2, 'ACK')
+        assert self.peer_port.queue.com_is_committed(self.port.id)
+
+    def test_out_of_order_acks(self):
+        for i in range(3):
+            self.peer_port.write_token(Token(i))
+        self.tunnel_out.communicate()
+        self.tunnel_out.reply(2, 'ACK')
+        self.tunnel_out.reply(1, 'ACK')
+        assert self.peer_port.queue.read_pos[self.port.id] == 0
+        self.tunnel_out.reply(0, 'ACK')
+        assert self.peer_port.queue.read_pos[self.port.id] == 3
+        assert not self.tunnel_out.sequencenbrs_acked
+
     def test_get_peer(self):
         assert self.tunnel_in.get_peer() == (self.peer_node_id, self.peer_port.id)
         assert self.tunnel_out.get_peer() == (self.node_id, self.port.id)
@@ -172,6 +412,17 @@ class TestTunnelEndpoint(unittest.TestCase):
         assert self.tunnel_out.port.queue.tentative_read_pos[self.port.id] == 1
         assert self.tunnel_out.port.queue.read_pos[self.port.id] == 1
 
+    def test_token_encoding(self):
+        self.tunnel_out.port.write_token(Token(1))
+        self.tunnel_out._send_one_token()
+        assert self.tunnel.send.call_args[0][0]['token'] == {'type': 'Token', 'data': 1}
+        # Compact only when negotiated with the peer
+        tunnel_out = TunnelOutEndpoint(self.peer_port, self.tunnel, self.node_id, self.port.id, {}, self.scheduler,
+                                       token_encoding=COMPACT_ENCODING)
+        self.tunnel_out.port.write_token(Token(2))
+        tunnel_out._send_one_token()
+        assert self.tunnel.send.call_args[0][0]['token'] == [Token.type_tag, 2]
+
     def test_bulk_communicate(self):
         self.tunnel_out.port.write_token(Token(1))
         self.tunnel_out.port.write_token(Token(2))
@@ -179,6 +430,47 @@ class TestTunnelEndpoint(unittest.TestCase):
         self.tunnel_out.communicate()
         assert self.tunnel.send.call_count == 2
 
+    def test_communicate_conflating(self):
+        self.peer_port.properties['routing'] = "latest"
+        self.peer_port.replace_queue(queue.get(self.peer_port))
+        self.peer_port.queue.add_reader(self.port.id, {})
+        for i in range(3):
+            self.peer_port.write_token(Token(i))
+        assert self.tunnel_out.communicate() is True
+        assert self.tunnel.send.call_count == 1
+        # Only one token in flight
+        assert self.tunnel_out.communicate() is False
+        for i in range(3, 6):
+            self.peer_port.write_token(Token(i))
+        self.tunnel_out.reply(0, 'ACK')
+        assert self.tunnel_out.communicate() is True
+        token = self.tunnel.send.call_args[0][0]
+        # Tokens 1 and 2 were superseded while token 0 was in flight
+        assert (token['sequencenbr'], token['token']['data']) == (1, 3)
+        assert self.peer_port.queue.dropped == 2
+
+    def test_communicate_priority(self):
+        self.peer_port.properties['routing'] = "priority"
+        self.peer_port.replace_queue(queue.get(self.peer_port))
+        self.peer_port.queue.add_reader(self.port.id, {})
+        self.peer_port.write_token(Token({'priority': 0, 'data': "bulk"}))
+        self.tunnel_out.bulk = True
+        self.tunnel_out.communicate()
+        self.peer_port.write_token(Token({'priority': 0, 'data': "bulk"}))
+        self.peer_port.write_token(Token({'priority': 9, 'data': "alarm"}))
+        self.tunnel_out.communicate()
+        sent = [(c[0][0]['sequencenbr'], c[0][0]['token']['data']['data']) for c in self.tunnel.send.call_args_list]
+        assert sent == [(0, "bulk"), (1, "alarm"), (2, "bulk")]
+        # Retransmits after a NACK keep the sequence numbers of the tokens
+        self.tunnel_out.reply(0, 'ACK')
+        self.tunnel_out.reply(1, 'NACK')
+        self.peer_port.write_token(Token({'priority': 9, 'data': "alarm"}))
+        self.tunnel_out.communicate()
+        self.tunnel_out.reply(1, 'ACK')
+        self.tunnel_out.communicate()
+        sent = [(c[0][0]['sequencenbr'], c[0][0]['token']['data']['data']) for c in self.tunnel.send.call_args_list[3:]]
+        assert sent == [(1, "alarm"), (2, "bulk"), (3, "alarm")]
+
     def test_communicate(self):
         self.tunnel_out.port.write_token(Token(1))
         self.tunnel_out.port.write_token(Token(2))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from calvin.runtime.north.plugins.coders.messages import message_coder_factory, cbor_coder
+from calvin.tests.benchmarks.bench_coders import messages
+
+pytestmark = pytest.mark.unittest
+
+
+@pytest.mark.parametrize("name", ["json", "msgpack", "cbor"])
+def test_encode_decode(name):
+    coder = message_coder_factory.get(name)
+    assert message_coder_factory.get(name) is coder
+    for _, msg in messages():
+        assert coder.decode(coder.encode(msg)) == msg
+
+
+def test_default_prio_list(monkeypatch):
+    monkeypatch.setattr(cbor_coder, 'ACCELERATED', True)
+    assert message_coder_factory._default_prio_list()[0] == "cbor"
+    monkeypatch.setattr(cbor_coder, 'ACCELERATED', False)
+    assert message_coder_factory._default_prio_list()[0] == "json"
+    assert "json" in message_coder_factory.get_prio_list()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock, patch
+
+from calvin.runtime.north.taskqueue import TaskQueue
+from calvin.runtime.north import scheduler
+
+pytestmark = pytest.mark.unittest
+
+
+def f1():
+    pass
+
+
+def f2():
+    pass
+
+
+def test_time_order():
+    q = TaskQueue()
+    q.insert(3.0, f1)
+    q.insert(1.0, f2)
+    q.insert(2.0, f1)
+    assert [q.pop().time for _ in range(3)] == [1.0, 2.0, 3.0]
+    assert not q
+
+
+def test_same_time_keeps_insertion_order():
+    q = TaskQueue()
+    q.insert(1.0, f1)
+    q.insert(1.0, f2)
+    assert q.pop().what is f1
+    assert q.pop().what is f2
+
+
+def test_pending_and_first_time():
+    q = TaskQueue()
+    assert q.first_time(f1) is None
+    q.insert(5.0, f1)
+    q.insert(2.0, f1)
+    q.insert(1.0, f2)
+    assert len(q.pending(f1)) == 2
+    assert q.first_time(f1) == 2.0
+    q.pop()
+    q.pop()
+    assert q.first_time(f1) == 5.0
+    q.pop()
+    assert not q.pending(f1)
+
+
+def test_cancel():
+    q = TaskQueue()
+    t1 = q.insert(1.0, f1)
+    t2 = q.insert(2.0, f2)
+    q.cancel(t1)
+    assert len(q) == 1
+    assert not t1.active()
+    assert not q.pending(f1)
+    assert q.peek() is t2
+    assert q.pop() is t2
+    # Cancel after pop is harmless
+    q.cancel(t2)
+    assert len(q) == 0
+    assert q.peek() is None
+
+
+def test_cancel_compacts_heap():
+    q = TaskQueue()
+    tasks = [q.insert(float(i), f1) for i in range(200)]
+    for t in tasks[:150]:
+        q.cancel(t)
+    assert len(q) == 50
+    assert len(q._heap) < 200
+    assert q.pop() is tasks[150]
+
+
+class TestSchedulerTasks(object):
+
+    def setup_method(self, method):
+        self.patcher = patch('calvin.runtime.north.scheduler.async')
+        self.async = self.patcher.start()
+        self.sched = scheduler.SimpleScheduler(Mock(), Mock())
+
+    def teardown_method(self, method):
+        self.patcher.stop()
+
+    def test_insert_coalesce(self):
+        t1 = self.sched.insert_task(self.sched.strategy, 0)
+        t2 = self.sched.insert_task(self.sched.strategy, 0)
+        assert t1 is t2
+        assert len(self.sched._tasks) == 1
+        assert self.async.DelayedCall.call_count == 1
+
+    def test_insert_reschedules_when_first(self):
+        self.sched.insert_task(f1, 10)
+        assert self.async.DelayedCall.call_count == 1
+        self.sched.insert_task(f2, 20)
+        assert self.async.DelayedCall.call_count == 1
+        self.sched.insert_task(f2, 0)
+        assert self.async.DelayedCall.call_count == 2
+
+    def test_process_next_skips_cancelled(self):
+        func = Mock()
+        task = self.sched.insert_task(func, 0)
+        self.sched.cancel_task(task)
+        self.sched._process_next()
+        assert not func.called
+        # Empty queue => watchdog
+        assert self.sched._tasks.pending(self.sched.watchdog)
+
+    def test_process_next_runs_due_task(self):
+        func = Mock()
+        self.sched.insert_task(func, 0)
+        self.sched.insert_task(f1, 100)
+        self.sched._process_next()
+        assert func.called
+        assert len(self.sched._tasks) == 1
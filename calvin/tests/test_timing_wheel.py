@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.runtime.north import timing_wheel
+
+pytestmark = pytest.mark.unittest
+
+
+class Clock(object):
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        self.calls = []
+        monkeypatch.setattr(timing_wheel.time, 'time', lambda: self.now)
+        monkeypatch.setattr(timing_wheel.async, 'DelayedCall', lambda delay, cb: self.calls.append(cb) or Mock())
+
+    def advance(self, seconds):
+        """ Advance time, running the wheel's ticks on the way """
+        end = self.now + seconds
+        while self.calls and self.now < end:
+            self.now = min(end, self.now + 0.25)
+            self.calls.pop(0)()
+        self.now = end
+
+
+def test_expire_and_cancel(monkeypatch):
+    clock = Clock(monkeypatch)
+    wheel = timing_wheel.TimingWheel(tick=0.25)
+    expired = []
+    for key in range(3):
+        wheel.add(key, 10.0, lambda key=key: expired.append(key))
+    wheel.add(3, 5.0, lambda: expired.append(3))
+    # A single call in the reactor for all timeouts
+    assert len(clock.calls) == 1
+    assert wheel.cancel(1)
+    assert not wheel.cancel(1)
+    clock.advance(5.0)
+    assert expired == [3]
+    clock.advance(5.0)
+    assert sorted(expired) == [0, 2, 3]
+    assert len(wheel) == 0
+    # Stops ticking when empty and starts again when a timeout is added
+    assert not clock.calls
+    wheel.add(4, 1.0, lambda: expired.append(4))
+    clock.advance(1.0)
+    assert expired[-1] == 4
+
+
+def test_callbacks_may_cancel(monkeypatch):
+    clock = Clock(monkeypatch)
+    wheel = timing_wheel.TimingWheel(tick=0.25)
+    expired = []
+    wheel.add(0, 1.0, lambda: expired.append(wheel.cancel(1)))
+    wheel.add(1, 1.0, lambda: expired.append(wheel.cancel(0)))
+    wheel.add(2, 1.0, lambda: 1 / 0)
+    clock.advance(1.0)
+    assert expired == [False, False]
+    assert len(wheel) == 0
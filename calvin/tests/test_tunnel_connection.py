@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2018 Ericsson AB
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from mock import Mock
+
+from calvin.actor.actorport import OutPort
+from calvin.runtime.north.calvin_token import COMPACT_ENCODING
+from calvin.runtime.north.calvin_frame import InternTable
+from calvin.runtime.north.plugins.port.connection.common import PURPOSE
+from calvin.runtime.north.plugins.port.connection.tunnel import TunnelConnection
+
+pytestmark = pytest.mark.unittest
+
+
+def _connection_request(payload, link=None):
+    port = OutPort("out", Mock())
+    peer_port_meta = Mock(node_id="peer_node", port_id="peer_port", properties={'direction': "in"})
+    tunnel = Mock(id="tunnel")
+    node = Mock()
+    node.network.link_get.return_value = link
+    node.pm.connections_data = {'TunnelConnection': Mock(tunnels={"peer_node": tunnel})}
+    payload.update({'tunnel_id': "tunnel"})
+    connection = TunnelConnection(node, PURPOSE.CONNECT, port, peer_port_meta, None, None, payload=payload)
+    reply = connection.connection_request()
+    return reply, port.endpoints[0]
+
+
+def test_connection_request_negotiates_compact_tokens():
+    reply, endpoint = _connection_request({'token_encodings': [COMPACT_ENCODING]})
+    assert reply.data['token_encoding'] == COMPACT_ENCODING
+    assert endpoint.compact_tokens
+
+
+@pytest.mark.parametrize("payload", [{}, {'token_encodings': ["unknown"]}])
+def test_connection_request_without_compact_tokens(payload):
+    # Peers not advertising the compact encoding get tokens in the default encoding
+    reply, endpoint = _connection_request(payload)
+    assert reply.data['token_encoding'] is None
+    assert not endpoint.compact_tokens
+
+
+def test_connection_request_negotiates_token_batching():
+    reply, endpoint = _connection_request({'token_batching': True})
+    assert reply.data['token_batching'] is True
+    assert endpoint.token_batching
+    # Older peers do not send TOKENS messages
+    reply, endpoint = _connection_request({})
+    assert reply.data['token_batching'] is False
+    assert not endpoint.token_batching
+
+
+def test_connection_request_negotiates_token_window():
+    reply, endpoint = _connection_request({'token_window': True})
+    assert reply.data['token_window'] is True
+    assert endpoint.token_window
+    # Older peers ACK each token and back off on NACK
+    reply, endpoint = _connection_request({})
+    assert reply.data['token_window'] is False
+    assert not endpoint.token_window
+
+
+def test_connection_request_interns_ids():
+    link = Mock(interned=InternTable())
+    reply, endpoint = _connection_request({'interned': {"tunnel": 0, "peer_port": 1}}, link)
+    assert reply.data['interned'] == {"tunnel": 0, endpoint.port.id: 1}
+    assert link.interned.peer_numbers == {"tunnel": 0, "peer_port": 1}
+    # Older peers, and peers on routed links, get no numbers
+    reply, endpoint = _connection_request({}, link)
+    assert 'interned' not in reply.data
+    reply, endpoint = _connection_request({'interned': {"tunnel": 0, "peer_port": 1}})
+    assert 'interned' not in reply.data
@@ -94,13 +94,21 @@ class CalvinConfig(object):
                 'storage_sql': {},  # For SQL, should have the kwargs to connect + db-name. Defaults to insecure local
                 'capabilities_blacklist': [],
                 'remote_coder_negotiator': 'static',
-                'static_coder': ['json', 'msgpack'],
+                'static_coder': None,  # Coders in priority order, None is the fastest available first
                 'display_plugin': 'stdout_impl',
                 'stdout_plugin': 'defaultimpl',
                 'transports': ['calvinip'],
                 'control_proxy': None,
                 'fcm_server_secret': None,
                 'compiled_actors_path': None,
+                'scheduler': 'simple',  # simple, round_robin, non_preemptive or ready_set
+                'action_thread_pool_size': 4,  # Max threads running @threaded actions
+                'shared_local_queues': False,  # Local 1:1 connections share one queue, no token copying
+                'queue_growth_budget': 65536,  # Token slots queues with queue_length_max may grow by, in total
+                'link_send_buffer': 0,  # Max messages a link collects and sends as one frame, 0 sends each by itself
+                'link_send_delay': 0.0,  # Max seconds a collected message waits, 0 is until the end of the reactor turn
+                'link_compression_threshold': None,  # Min bytes of messages compressed on links, None is no compression
+                'link_compression_level': 6,  # zlib level 1 (fastest) to 9 (smallest)
                 "calvinsys_paths": ['calvin/runtime/south/calvinsys', 'calvinextras/calvinsys']
             },
             'testing': {